@@ -0,0 +1,549 @@
+"""
+Benchmarks for the helpers in PPTAutomationHelper, runs on Linux without Office.
+
+Generates synthetic PPTX / XLSX fixtures (slides, charts with embedded excels, linked OLE objects,
+media payloads, M query sections), times the helpers over size sweeps and writes a JSON report
+that can be compared against a previous run:
+
+    python PPTAutomationBenchmark.py --slides 10 50 --media-mb 0 20 --output bench.json
+    python PPTAutomationBenchmark.py --slides 10 50 --media-mb 0 20 --compare bench.json
+
+The time to import the helper module in a fresh interpreter is measured as well (`import_helper`),
+it should stay in the tens of milliseconds, see `--import-budget-ms`.
+
+Fixtures are structurally minimal (no slide masters / themes), they carry the parts the helpers
+work on, not everything PowerPoint needs to open them.
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import datetime as dt
+from collections.abc import Callable
+
+import PPTAutomationHelper as helper
+
+_CONTENT_TYPES = {
+    "presentation": "application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml",
+    "slide": "application/vnd.openxmlformats-officedocument.presentationml.slide+xml",
+    "chart": "application/vnd.openxmlformats-officedocument.drawingml.chart+xml",
+    "workbook": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml",
+    "worksheet": "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml",
+}
+_REL_TYPES = {
+    "document": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument",
+    "slide": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide",
+    "chart": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/chart",
+    "package": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/package",
+    "oleObject": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/oleObject",
+    "image": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image",
+    "worksheet": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet",
+    "customXml": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/customXml",
+}
+_XMLNS = (
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:c="http://schemas.openxmlformats.org/drawingml/2006/chart" '
+    'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+)
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# Link target prefix used by the fixtures, `modify_ppt_links` is benchmarked remapping it
+LINK_ROOT = "C:/Shared Drive/Reports"
+
+def _rels_xml(rels: list[tuple[str, str, str, bool]]) -> str:
+    """
+    rels: (rId, type, target, is_external)
+    """
+    items = "".join(
+        f'<Relationship Id="{rid}" Type="{_REL_TYPES[rel_type]}" Target="{target}"' + (' TargetMode="External"/>' if external else "/>")
+        for rid, rel_type, target, external in rels
+    )
+    return f'{_XML_DECLARATION}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{items}</Relationships>'
+
+def _content_types_xml(defaults: dict[str, str], overrides: dict[str, str]) -> str:
+    items = "".join(f'<Default Extension="{ext}" ContentType="{ct}"/>' for ext, ct in defaults.items())
+    items += "".join(f'<Override PartName="/{name}" ContentType="{ct}"/>' for name, ct in overrides.items())
+    return f'{_XML_DECLARATION}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">{items}</Types>'
+
+def _chart_xml(categories: list[str], series: list[tuple[str, list[float]]]) -> str:
+    def str_cache(values: list[str]) -> str:
+        return f'<c:strCache><c:ptCount val="{len(values)}"/>' + "".join(
+            f'<c:pt idx="{i}"><c:v>{v}</c:v></c:pt>' for i, v in enumerate(values)) + "</c:strCache>"
+
+    def num_cache(values: list[float]) -> str:
+        return f'<c:numCache><c:formatCode>General</c:formatCode><c:ptCount val="{len(values)}"/>' + "".join(
+            f'<c:pt idx="{i}"><c:v>{v}</c:v></c:pt>' for i, v in enumerate(values)) + "</c:numCache>"
+
+    last_row = len(categories) + 1
+    sers = ""
+    for idx, (name, values) in enumerate(series):
+        col = helper._column_letter(idx + 2)
+        sers += (
+            f'<c:ser><c:idx val="{idx}"/><c:order val="{idx}"/>'
+            f'<c:tx><c:strRef><c:f>Sheet1!${col}$1</c:f>{str_cache([name])}</c:strRef></c:tx>'
+            f'<c:cat><c:strRef><c:f>Sheet1!$A$2:$A${last_row}</c:f>{str_cache(categories)}</c:strRef></c:cat>'
+            f'<c:val><c:numRef><c:f>Sheet1!${col}$2:${col}${last_row}</c:f>{num_cache(values)}</c:numRef></c:val>'
+            f'</c:ser>'
+        )
+
+    return (
+        f'{_XML_DECLARATION}<c:chartSpace {_XMLNS}><c:chart><c:plotArea><c:barChart>'
+        f'<c:barDir val="col"/><c:grouping val="clustered"/>{sers}'
+        f'</c:barChart></c:plotArea></c:chart>'
+        f'<c:externalData r:id="rId1"><c:autoUpdate val="0"/></c:externalData></c:chartSpace>'
+    )
+
+def _sheet_xml(categories: list[str], series: list[tuple[str, list[float]]]) -> str:
+    rows = [["Category"] + [name for name, _ in series]]
+    rows += [[category] + [values[i] for _, values in series] for i, category in enumerate(categories)]
+    cells = ""
+    for r, row in enumerate(rows, start=1):
+        cells += f'<row r="{r}">'
+        for c, value in enumerate(row, start=1):
+            ref = f"{helper._column_letter(c)}{r}"
+            if isinstance(value, str):
+                cells += f'<c r="{ref}" t="inlineStr"><is><t>{value}</t></is></c>'
+            else:
+                cells += f'<c r="{ref}"><v>{value}</v></c>'
+        cells += "</row>"
+
+    return (
+        f'{_XML_DECLARATION}<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'<dimension ref="A1:{helper._column_letter(len(rows[0]))}{len(rows)}"/><sheetData>{cells}</sheetData></worksheet>'
+    )
+
+def _workbook_parts(extra_parts: dict[str, str | bytes], sheet_xml: str, content_types: dict[str, str] | None = None) -> dict[str, str | bytes]:
+    workbook_rels = [("rId1", "worksheet", "worksheets/sheet1.xml", False)]
+    return {
+        "[Content_Types].xml": _content_types_xml(
+            {"rels": "application/vnd.openxmlformats-package.relationships+xml", "xml": "application/xml"},
+            {"xl/workbook.xml": _CONTENT_TYPES["workbook"], "xl/worksheets/sheet1.xml": _CONTENT_TYPES["worksheet"], **(content_types or {})}
+        ),
+        "_rels/.rels": _rels_xml([("rId1", "document", "xl/workbook.xml", False)]),
+        "xl/workbook.xml": (
+            f'{_XML_DECLARATION}<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            f'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": _rels_xml(workbook_rels),
+        "xl/worksheets/sheet1.xml": sheet_xml,
+        **extra_parts,
+    }
+
+def _zip_bytes(parts: dict[str, str | bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zfw:
+        for name, contents in parts.items():
+            zfw.writestr(name, contents)
+    return buffer.getvalue()
+
+def _table_xml(rows: int, cols: int) -> str:
+    cell = '<a:tc><a:txBody><a:bodyPr/><a:p><a:r><a:t>{}</a:t></a:r></a:p></a:txBody></a:tc>'
+    grid = "".join('<a:gridCol w="914400"/>' for _ in range(cols))
+    trs = "".join(f'<a:tr h="370840">{"".join(cell.format(f"{i}-{j}") for j in range(cols))}</a:tr>' for i in range(rows))
+    return (
+        '<p:graphicFrame><p:nvGraphicFramePr><p:cNvPr id="2" name="Table"/><p:cNvGraphicFramePr/><p:nvPr/></p:nvGraphicFramePr>'
+        '<p:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/></p:xfrm><a:graphic>'
+        '<a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/table">'
+        f'<a:tbl><a:tblGrid>{grid}</a:tblGrid>{trs}</a:tbl></a:graphicData></a:graphic></p:graphicFrame>'
+    )
+
+def make_deck(
+        path: str, *, slides: int = 10, charts_per_slide: int = 1, links_per_slide: int = 2,
+        media_bytes: int = 0, table_shape: tuple[int, int] = (10, 6), points: int = 12, seed: int = 0
+    ) -> str:
+    """
+    Writes a synthetic PPTX with `slides` slides, each holding a table (shape 0), `charts_per_slide` charts
+    with embedded excels and `links_per_slide` OLE objects linked to excels under `LINK_ROOT`. `media_bytes`
+    of incompressible image payload is spread across the slides.
+    """
+    rng = random.Random(seed)
+    parts: dict[str, str | bytes] = {}
+    overrides = {"ppt/presentation.xml": _CONTENT_TYPES["presentation"]}
+    presentation_rels = []
+    chart_count = 0
+    media_per_slide = media_bytes // slides if slides else 0
+
+    for s in range(1, slides + 1):
+        shapes = [_table_xml(*table_shape)]
+        slide_rels = []
+        for _ in range(charts_per_slide):
+            chart_count += 1
+            categories = [f"Cat {i}" for i in range(points)]
+            series = [(f"Series {k}", [round(rng.uniform(0, 100), 2) for _ in range(points)]) for k in range(3)]
+            stale = [(name, [round(v * 0.5, 2) for v in values]) for name, values in series]
+
+            # PPT carries stale caches, the embedded excel chart the current ones
+            parts[f"ppt/charts/chart{chart_count}.xml"] = _chart_xml(categories, stale)
+            parts[f"ppt/charts/_rels/chart{chart_count}.xml.rels"] = _rels_xml(
+                [("rId1", "package", f"../embeddings/Microsoft_Excel_Worksheet{chart_count}.xlsx", False)])
+            parts[f"ppt/embeddings/Microsoft_Excel_Worksheet{chart_count}.xlsx"] = _zip_bytes(_workbook_parts(
+                {"xl/charts/chart1.xml": _chart_xml(categories, series)}, _sheet_xml(categories, series),
+                {"xl/charts/chart1.xml": _CONTENT_TYPES["chart"]}
+            ))
+            overrides[f"ppt/charts/chart{chart_count}.xml"] = _CONTENT_TYPES["chart"]
+
+            rid = f"rId{len(slide_rels) + 1}"
+            slide_rels.append((rid, "chart", f"../charts/chart{chart_count}.xml", False))
+            shapes.append(
+                f'<p:graphicFrame><p:nvGraphicFramePr><p:cNvPr id="{len(shapes) + 2}" name="Chart"/><p:cNvGraphicFramePr/><p:nvPr/></p:nvGraphicFramePr>'
+                f'<p:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/></p:xfrm><a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/chart">'
+                f'<c:chart r:id="{rid}"/></a:graphicData></a:graphic></p:graphicFrame>'
+            )
+
+        for k in range(links_per_slide):
+            rid = f"rId{len(slide_rels) + 1}"
+            target = "file:///" + f"{LINK_ROOT}/Book{s}-{k}.xlsx".replace(" ", "%20").replace("/", "\\") + "!Sheet1!R1C1:R10C5"
+            slide_rels.append((rid, "oleObject", target, True))
+            shapes.append(
+                f'<p:graphicFrame><p:nvGraphicFramePr><p:cNvPr id="{len(shapes) + 2}" name="Object"/><p:cNvGraphicFramePr/><p:nvPr/></p:nvGraphicFramePr>'
+                f'<p:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/></p:xfrm><a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/presentationml/2006/ole">'
+                f'<p:oleObj r:id="{rid}" progId="Excel.Sheet.12"><p:link/></p:oleObj></a:graphicData></a:graphic></p:graphicFrame>'
+            )
+
+        if media_per_slide:
+            rid = f"rId{len(slide_rels) + 1}"
+            parts[f"ppt/media/image{s}.png"] = rng.randbytes(media_per_slide)
+            slide_rels.append((rid, "image", f"../media/image{s}.png", False))
+
+        parts[f"ppt/slides/slide{s}.xml"] = (
+            f'{_XML_DECLARATION}<p:sld {_XMLNS}><p:cSld><p:spTree><p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+            f'<p:grpSpPr/>{"".join(shapes)}</p:spTree></p:cSld></p:sld>'
+        )
+        parts[f"ppt/slides/_rels/slide{s}.xml.rels"] = _rels_xml(slide_rels)
+        overrides[f"ppt/slides/slide{s}.xml"] = _CONTENT_TYPES["slide"]
+        presentation_rels.append((f"rId{s}", "slide", f"slides/slide{s}.xml", False))
+
+    sld_ids = "".join(f'<p:sldId id="{255 + s}" r:id="rId{s}"/>' for s in range(1, slides + 1))
+    parts["ppt/presentation.xml"] = f'{_XML_DECLARATION}<p:presentation {_XMLNS}><p:sldIdLst>{sld_ids}</p:sldIdLst></p:presentation>'
+    parts["ppt/_rels/presentation.xml.rels"] = _rels_xml(presentation_rels)
+    parts["_rels/.rels"] = _rels_xml([("rId1", "document", "ppt/presentation.xml", False)])
+
+    content_types = _content_types_xml({
+        "rels": "application/vnd.openxmlformats-package.relationships+xml", "xml": "application/xml",
+        "png": "image/png", "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }, overrides)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zfw:
+        zfw.writestr("[Content_Types].xml", content_types)
+        for name, contents in parts.items():
+            zfw.writestr(name, contents, compress_type=zipfile.ZIP_STORED if name.startswith("ppt/media/") else zipfile.ZIP_DEFLATED)
+
+    return path
+
+def _data_mashup(sections: dict[str, str]) -> bytes:
+    """
+    MS-QDEFF stream holding the given 'Formulas/*.m' sections
+    """
+    pkg_parts = _zip_bytes({
+        "[Content_Types].xml": '<?xml version="1.0" encoding="utf-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>',
+        "Config/Package.xml": '<?xml version="1.0" encoding="utf-8"?><Package/>',
+        **{f"Formulas/{name}": text for name, text in sections.items()},
+    })
+    permissions = b'<?xml version="1.0" encoding="utf-8"?><PermissionList/>'
+    metadata = b"\x00" * 4 + b'<?xml version="1.0" encoding="utf-8"?><LocalPackageMetadataFile/>' + b"\x00" * 4
+    bindings = b""
+    return (0).to_bytes(4, "little") + b"".join(len(part).to_bytes(4, "little") + part for part in (pkg_parts, permissions, metadata, bindings))
+
+def mquery_sections(sections: int, queries_per_section: int = 5) -> dict[str, str]:
+    return {
+        f"Section{n}.m": f"section Section{n};\r\n" + "".join(
+            f'\r\nshared Query{n}_{q} = let\r\n    Source = Csv.Document(File.Contents("{LINK_ROOT}\\data{n}_{q}.csv"), [Delimiter=","]),\r\n'
+            f'    Promoted = Table.PromoteHeaders(Source)\r\nin\r\n    Promoted;\r\n'
+            for q in range(queries_per_section)
+        )
+        for n in range(1, sections + 1)
+    }
+
+def make_workbook(path: str, *, sections: int = 1, queries_per_section: int = 5, mashups: int = 1) -> str:
+    """
+    Writes a synthetic XLSX with `mashups` customXml DataMashup parts, each holding `sections` M query sections
+    """
+    custom_xml = {}
+    for m in range(1, mashups + 1):
+        encoded = base64.b64encode(_data_mashup(mquery_sections(sections, queries_per_section))).decode("ascii")
+        custom_xml[f"customXml/item{m}.xml"] = (
+            f'<?xml version="1.0" encoding="utf-16"?><DataMashup xmlns="http://schemas.microsoft.com/DataMashup">{encoded}</DataMashup>'
+        ).encode("utf-16")
+
+    categories = [f"Cat {i}" for i in range(10)]
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zfw:
+        for name, contents in _workbook_parts(custom_xml, _sheet_xml(categories, [("Value", list(range(10)))])).items():
+            zfw.writestr(name, contents)
+
+    return path
+
+def _peak_rss() -> int:
+    """
+    Peak resident set size of the current process, in bytes
+    """
+    # Linux carries ru_maxrss over from the parent across fork / exec, VmHWM starts afresh with the process image
+    with contextlib.suppress(OSError):
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+
+    try:
+        import resource
+    except ImportError:  # Windows
+        return helper._backend("psutil", "the benchmark memory measurements").Process().memory_info().peak_wset
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+def _child_env() -> dict:
+    dirs = {os.path.dirname(os.path.abspath(helper.__file__)), os.path.dirname(os.path.abspath(__file__))}
+    return {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [*dirs, os.environ.get("PYTHONPATH")]))}
+
+def _run_in_child(suite: str, suite_args: list, operation: str, args: tuple) -> dict:
+    """
+    Runs one benchmark call in this (fresh) interpreter, see `_measure`
+    """
+    benchmarks = {"deck": _deck_benchmarks, "workbook": _workbook_benchmarks}[suite](*suite_args)
+    before = _peak_rss()
+    benchmarks[operation][1](*args)
+    return {"peak_memory_bytes": _peak_rss(), "baseline_memory_bytes": before}
+
+def _measure(setup: Callable[[], tuple], func: Callable[..., object], repeat: int, child: tuple[str, list, str]) -> dict:
+    """
+    Runs `setup` (untimed) and `func(*setup())` `repeat` times for the wall time, and once more in a fresh
+    interpreter for the peak memory. The peak resident set size of that process is reported, so that native
+    allocations (lxml trees, zlib buffers, mmaps, ...) count, not only the Python heap, along with its peak
+    before the call (interpreter, imports and benchmark setup).
+
+    `child` is the (suite, suite arguments, operation) the child process rebuilds the benchmark from.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+
+    code = (
+        "import json, sys\n"
+        "import PPTAutomationBenchmark\n"
+        "print(json.dumps(PPTAutomationBenchmark._run_in_child(*json.loads(sys.argv[1]))))\n"
+    )
+    spec = json.dumps([*child, list(setup())])
+    output = subprocess.run([sys.executable, "-c", code, spec], env=_child_env(), capture_output=True, text=True, check=True)
+    return {"wall_seconds": {"min": min(timings), "median": statistics.median(timings)}, **json.loads(output.stdout.strip().splitlines()[-1])}
+
+# Optional backends the helper module must not import at load time
+_LAZY_BACKENDS = ("win32com", "pythoncom", "xlwings", "pptx", "pandas", "numpy")
+
+def _measure_import(repeat: int) -> dict:
+    """
+    Imports PPTAutomationHelper in fresh interpreters, records the wall time, the peak resident memory and the
+    optional backends that got imported along with it (expected to be none)
+    """
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import PPTAutomationHelper\n"
+        "seconds = time.perf_counter() - start\n"
+        f"loaded = sorted({{name.split('.')[0] for name in sys.modules}} & set({_LAZY_BACKENDS!r}))\n"
+        "from PPTAutomationBenchmark import _peak_rss\n"
+        "print(json.dumps([seconds, _peak_rss(), loaded]))\n"
+    )
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], env=_child_env(), capture_output=True, text=True, check=True)
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    timings = [seconds for seconds, _, _ in runs]
+    return {
+        "wall_seconds": {"min": min(timings), "median": statistics.median(timings)},
+        "peak_memory_bytes": max(peak for _, peak, _ in runs), "backends_loaded": runs[-1][2],
+    }
+
+def _deck_benchmarks(workdir: str, fixture: str, table_shape: tuple[int, int]) -> dict[str, tuple[Callable[[], tuple], Callable[..., object]]]:
+    def fresh_copy() -> tuple:
+        path = os.path.join(workdir, "run.pptx")
+        shutil.copyfile(fixture, path)
+        return (path,)
+
+    def fresh_extract() -> tuple:
+        extract_path = os.path.join(workdir, "extract")
+        shutil.rmtree(extract_path, ignore_errors=True)
+        helper.extract_ppt(fixture, extract_path)
+        return (extract_path,)
+
+    def fresh_output() -> tuple:
+        return (os.path.join(workdir, "rendered.pptx"),)
+
+    import pandas as pd
+    table_df = pd.DataFrame([[f"{i}/{j}" for j in range(table_shape[1])] for i in range(table_shape[0] - 1)])
+    template = helper.PPTTemplate(fixture)
+    return {
+        "modify_ppt_links": (fresh_copy, lambda path: helper.modify_ppt_links(path, LINK_ROOT, "D:/Moved Drive/Reports", overwrite=True)),
+        "toggle_update_links_popup": (fresh_copy, lambda path: helper.toggle_update_links_popup(path, auto_update=True, overwrite=True)),
+        "update_ppt_table": (fresh_copy, lambda path: helper.update_ppt_table(path, table_df, slide_id=0, shape_id=0, start_coord=(0, 0))),
+        "render_template": (fresh_output, lambda path: template.render(path, tables=[{"table_df": table_df, "slide_id": 0, "shape_id": 0, "start_coord": (0, 0)}])),
+        "update_ppt_plot_cache": (fresh_extract, lambda path: helper.update_ppt_plot_cache(path, force=True)),
+        "rezip_ppt": (fresh_extract, lambda path: helper.rezip_ppt(path, os.path.join(workdir, "rezipped.pptx"))),
+    }
+
+def _workbook_benchmarks(workdir: str, fixture: str, sections: int) -> dict[str, tuple[Callable[[], tuple], Callable[..., object]]]:
+    # Modified copies of every section for update_mqueries, identical ones for the no-op case
+    mquery_paths, unchanged_paths = [], []
+    for dirname, paths in (("mquery", mquery_paths), ("mquery_unchanged", unchanged_paths)):
+        os.makedirs(os.path.join(workdir, dirname), exist_ok=True)
+        for name, text in mquery_sections(sections).items():
+            paths.append(os.path.join(workdir, dirname, name))
+            with open(paths[-1], "w", encoding="utf-8", newline="") as f:
+                f.write(text.replace(LINK_ROOT, "D:/Moved Drive/Reports") if dirname == "mquery" else text)
+
+    def fresh_copy() -> tuple:
+        path = os.path.join(workdir, "run.xlsx")
+        shutil.copyfile(fixture, path)
+        return (path,)
+
+    def fresh_output() -> tuple:
+        output_path = os.path.join(workdir, "extracted")
+        shutil.rmtree(output_path, ignore_errors=True)
+        return (output_path,)
+
+    return {
+        "extract_mqueries": (fresh_output, lambda output_path: helper.extract_mqueries(fixture, output_path)),
+        "update_mqueries": (fresh_copy, lambda path: helper.update_mqueries(path, mquery_paths, overwrite=True)),
+        "update_mqueries_unchanged": (fresh_copy, lambda path: helper.update_mqueries(path, unchanged_paths, overwrite=True)),
+    }
+
+def run_benchmarks(
+        *, slides: list[int], media_mb: list[float], charts_per_slide: int, links_per_slide: int,
+        mquery_sections_sweep: list[int], mashups: int, table_shape: tuple[int, int], repeat: int,
+        operations: list[str] | None = None, log: Callable[[str], None] = print
+    ) -> dict:
+    """
+    Runs the deck benchmarks over every (slides, media_mb) combination and the workbook benchmarks over
+    every section count. Returns the report as a dict.
+    """
+    results = []
+    if not operations or "import_helper" in operations:
+        measurement = _measure_import(repeat)
+        results.append({"operation": "import_helper", "params": {}, **measurement})
+        log(f"{'import_helper':<28} {json.dumps(measurement['backends_loaded'])} {measurement['wall_seconds']['median'] * 1000:10.2f} ms")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_slides in slides:
+            for n_media_mb in media_mb:
+                params = {
+                    "slides": n_slides, "charts_per_slide": charts_per_slide, "links_per_slide": links_per_slide,
+                    "media_mb": n_media_mb, "table_shape": list(table_shape),
+                }
+                fixture = make_deck(
+                    os.path.join(workdir, "fixture.pptx"), slides=n_slides, charts_per_slide=charts_per_slide,
+                    links_per_slide=links_per_slide, media_bytes=int(n_media_mb * 1024 * 1024), table_shape=table_shape
+                )
+                params["fixture_bytes"] = os.path.getsize(fixture)
+                for operation, (setup, func) in _deck_benchmarks(workdir, fixture, table_shape).items():
+                    if operations and operation not in operations:
+                        continue
+                    measurement = _measure(setup, func, repeat, ("deck", [workdir, fixture, list(table_shape)], operation))
+                    results.append({"operation": operation, "params": params, **measurement})
+                    log(f"{operation:<28} {json.dumps(params)} {measurement['wall_seconds']['median'] * 1000:10.2f} ms")
+
+        for n_sections in mquery_sections_sweep:
+            params = {"mquery_sections": n_sections, "mashups": mashups}
+            fixture = make_workbook(os.path.join(workdir, "fixture.xlsx"), sections=n_sections, mashups=mashups)
+            params["fixture_bytes"] = os.path.getsize(fixture)
+            for operation, (setup, func) in _workbook_benchmarks(workdir, fixture, n_sections).items():
+                if operations and operation not in operations:
+                    continue
+                measurement = _measure(setup, func, repeat, ("workbook", [workdir, fixture, n_sections], operation))
+                results.append({"operation": operation, "params": params, **measurement})
+                log(f"{operation:<28} {json.dumps(params)} {measurement['wall_seconds']['median'] * 1000:10.2f} ms")
+
+    return {
+        "meta": {
+            "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 1.2) -> list[str]:
+    """
+    Lists the benchmarks whose median wall time (or peak memory) grew by more than `threshold` times
+    over `baseline`. Benchmarks are matched on operation and params.
+    """
+    def key(result: dict) -> str:
+        return json.dumps([result["operation"], result["params"]], sort_keys=True)
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        previous = baseline_results.get(key(result))
+        if previous is None:
+            continue
+
+        time_ratio = result["wall_seconds"]["median"] / max(previous["wall_seconds"]["median"], 1e-9)
+        memory_ratio = result["peak_memory_bytes"] / max(previous["peak_memory_bytes"], 1)
+        print(f"{result['operation']:<28} {json.dumps(result['params'])} time x{time_ratio:.2f} memory x{memory_ratio:.2f}")
+        if time_ratio > threshold or memory_ratio > threshold:
+            regressions.append(f"{result['operation']} {json.dumps(result['params'])}: time x{time_ratio:.2f}, memory x{memory_ratio:.2f}")
+
+    return regressions
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, nargs="+", default=[5, 25])
+    parser.add_argument("--media-mb", type=float, nargs="+", default=[0, 10])
+    parser.add_argument("--charts-per-slide", type=int, default=2)
+    parser.add_argument("--links-per-slide", type=int, default=2)
+    parser.add_argument("--mquery-sections", type=int, nargs="+", default=[1, 20])
+    parser.add_argument("--mashups", type=int, default=1, help="customXml DataMashup parts per workbook")
+    parser.add_argument("--table-shape", type=int, nargs=2, default=[10, 6], metavar=("ROWS", "COLS"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--operations", nargs="*", default=None, help="only run these operations")
+    parser.add_argument("--output", default="", help="write the JSON report to this file")
+    parser.add_argument("--compare", default="", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="ratio over the baseline counted as a regression")
+    parser.add_argument("--import-budget-ms", type=float, default=100, help="fail if importing the helper takes longer")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        slides=args.slides, media_mb=args.media_mb, charts_per_slide=args.charts_per_slide,
+        links_per_slide=args.links_per_slide, mquery_sections_sweep=args.mquery_sections, mashups=args.mashups,
+        table_shape=tuple(args.table_shape), repeat=args.repeat, operations=args.operations
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+    # The helper module must load fast and without pulling in the Office / pandas backends
+    failures = []
+    for result in report["results"]:
+        if result["operation"] == "import_helper":
+            import_ms = result["wall_seconds"]["median"] * 1000
+            if import_ms > args.import_budget_ms:
+                failures.append(f"import_helper: {import_ms:.1f} ms, over the {args.import_budget_ms:g} ms budget")
+            if result["backends_loaded"]:
+                failures.append(f"import_helper: imported optional backends {result['backends_loaded']}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            failures += compare_reports(json.load(f), report, args.threshold)
+
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return int(bool(failures))
+
+if __name__ == "__main__":
+    sys.exit(main())
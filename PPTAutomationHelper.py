@@ -11,383 +11,2157 @@ Helper functions:
     8. Rezip extracted zip to PPT
     9. Update PPT Plot 'cache' (deps: lxml)
     10. Update excel embedded into PPT (deps: xlwings)
-    11. Update PPT table (deps: python-pptx)
+    11. Update PPT tables (deps: lxml, pandas)
+    12. PPT session, queue many edits and save once (deps: lxml)
+    13. Update PPT chart data without excel (deps: lxml, pandas)
+    14. Batch run helpers over many files in parallel (also available as a CLI, see `main`)
+    15. Per phase timings and counts of the helpers (see `set_instrumentation_sink`)
+    16. Pool of warm Excel / PowerPoint instances for the refresh helpers (deps: pywin32, xlwings)
+    17. Index of the external links of many decks / workbooks, to find the files affected by a change (see `LinkIndex`)
+    18. Deduplicating backup store, with retention and restore (see `BackupStore`)
+    19. Render many decks from one template held in memory (see `PPTTemplate`)
+    20. Memory mapped package reader with an index of the parts and relationships (see `PackageReader`)
+
+Only lxml is needed at import time. pywin32, xlwings, python-pptx and numpy are loaded on first use by the
+helpers that need them, calling one of those without its dependency installed raises `BackendUnavailableError`.
 
 """
 
-import glob
+from __future__ import annotations
+
 import urllib
+import urllib.parse
+import glob
 import zipfile
 import os
 import shutil
 import tempfile
 import datetime as dt
-import win32com.client
 import lxml.etree
-import pptx
-import pandas as pd
-import xlwings as xw
 import gzip
 import base64
 import re
 import io
+import struct
+import posixpath
+import time
+import json
+import sys
+import argparse
+import concurrent.futures
+import copy
+import hashlib
+import contextlib
+import contextvars
+import functools
+import logging
+import threading
+import abc
+import queue
+import signal
+import itertools
+import importlib
+import zlib
+import collections
+import csv
+import sqlite3
+import mmap
+from collections.abc import Callable, Mapping
+from typing import BinaryIO, NamedTuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import types
+    import numpy as np
+    import pandas as pd
+    import xlwings as xw
+
+# XML namespaces and relationship types used across the OOXML parts we touch
+_NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "c": "http://schemas.openxmlformats.org/drawingml/2006/chart",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "pr": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "ct": "http://schemas.openxmlformats.org/package/2006/content-types",
+    "x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+}
+_RT_PACKAGE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/package"
+
+# Optional backends, imported on first use so that the zip / XML helpers load fast and run anywhere lxml does
+_BACKEND_PACKAGES = {
+    "win32com.client": "pywin32",
+    "pythoncom": "pywin32",
+    "win32process": "pywin32",
+    "xlwings": "xlwings",
+    "pptx": "python-pptx",
+    "numpy": "numpy",
+}
+
+class BackendUnavailableError(ImportError):
+    """
+    Raised when a helper needs an optional backend (COM, xlwings, python-pptx, ...) that can't be imported here
+    """
+
+def _backend(module_name: str, feature: str) -> types.ModuleType:
+    """
+    Imports the backend module `feature` depends on, raising `BackendUnavailableError` if it isn't available
+    """
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        package = _BACKEND_PACKAGES.get(module_name, module_name)
+        raise BackendUnavailableError(
+            f"{feature} requires '{module_name}' (pip install {package}), which could not be imported: {e}",
+            name=module_name
+        ) from e
+
+# Instrumentation. Helpers report timed phase spans (unzip, parse, replace, deflate / write, backup, COM) along
+# with byte, part and replacement counters to a sink. Disabled by default, in which case spans are a shared no-op.
+_SINK: Callable[[dict], None] | None = None
+_CURRENT_SPAN: contextvars.ContextVar["_Span | None"] = contextvars.ContextVar("_CURRENT_SPAN", default=None)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+    def add(self, **counters: float) -> None:
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """
+    Timed phase. On exit, a record with the phase name, its parent phase, the duration, the fields and the
+    counters collected while it was the current span is sent to the sink. Counters are rolled up into the parent.
+    """
+    __slots__ = ("phase", "fields", "counters", "parent", "_start", "_token")
+
+    def __init__(self, phase: str, fields: dict) -> None:
+        self.phase = phase
+        self.fields = fields
+        self.counters: dict[str, float] = {}
+        self.parent: _Span | None = None
+
+    def __enter__(self) -> "_Span":
+        self.parent = _CURRENT_SPAN.get()
+        self._token = _CURRENT_SPAN.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        seconds = time.perf_counter() - self._start
+        _CURRENT_SPAN.reset(self._token)
+        if self.parent is not None:
+            self.parent.add(**self.counters)
+
+        record = {
+            "phase": self.phase, "parent": self.parent.phase if self.parent is not None else None,
+            "seconds": round(seconds, 6), **self.fields,
+            **{key: round(value, 6) if isinstance(value, float) else value for key, value in self.counters.items()}
+        }
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc_value}"
+
+        sink = _SINK
+        if sink is not None:
+            sink(record)
+
+    def add(self, **counters: float) -> None:
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+def _span(phase: str, **fields) -> "_Span | _NullSpan":
+    """
+    `with _span("write", path=path) as span: ... span.add(bytes_written=n)`, a no-op unless a sink is set
+    """
+    return _NULL_SPAN if _SINK is None else _Span(phase, fields)
+
+def _count(**counters: float) -> None:
+    """
+    Adds to the counters of the current span, if any
+    """
+    if _SINK is not None:
+        span = _CURRENT_SPAN.get()
+        if span is not None:
+            span.add(**counters)
+
+def _instrumented(func: Callable) -> Callable:
+    """
+    Wraps a public helper in a span named after it. The first argument is recorded as the path if it is one.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _SINK is None:
+            return func(*args, **kwargs)
+        path = args[0] if args and isinstance(args[0], str) else None
+        with _Span(func.__name__, {"path": path}):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+class LoggingSink:
+    """
+    Sends each span record to a logger as 'phase=... seconds=... key=value ...'
+    """
+
+    def __init__(self, logger: logging.Logger | None = None, level: int = logging.INFO) -> None:
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def __call__(self, record: dict) -> None:
+        self.logger.log(self.level, " ".join(f"{key}={value}" for key, value in record.items() if value is not None))
+
+class JsonLinesSink:
+    """
+    Appends each span record as a JSON line to a path or an open text file. Thread safe.
+    """
+
+    def __init__(self, path_or_file) -> None:
+        self._owned = isinstance(path_or_file, (str, os.PathLike))
+        self._file = open(path_or_file, "a", encoding="utf-8") if self._owned else path_or_file
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict) -> None:
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._owned:
+            self._file.close()
+
+class MemorySink:
+    """
+    Collects span records in memory, handy in tests and notebooks
+    """
+
+    def __init__(self) -> None:
+        self.records: list[dict] = []
+
+    def __call__(self, record: dict) -> None:
+        self.records.append(record)
+
+    def phases(self, phase: str) -> list[dict]:
+        return [record for record in self.records if record["phase"] == phase]
+
+    def clear(self) -> None:
+        self.records.clear()
+
+def set_instrumentation_sink(sink: Callable[[dict], None] | None) -> Callable[[dict], None] | None:
+    """
+    Sets the callable receiving span records (`LoggingSink`, `JsonLinesSink`, `MemorySink` or any callable taking
+    a dict), None disables instrumentation. Returns the previous sink.
+    """
+    global _SINK
+    previous, _SINK = _SINK, sink
+    return previous
+
+@contextlib.contextmanager
+def instrument(sink: Callable[[dict], None] | None = None):
+    """
+    Enables instrumentation for the duration of the `with` block, collecting into a `MemorySink` by default.
+
+    ```
+    with instrument() as sink:
+        modify_ppt_links(ppt_path, "C:/Old Share/data.xlsx", "C:/New Share/data.xlsx")
+    print(sink.records)
+    ```
+    """
+    sink = MemorySink() if sink is None else sink
+    previous = set_instrumentation_sink(sink)
+    try:
+        yield sink
+    finally:
+        set_instrumentation_sink(previous)
 
 def _create_file_backup(path: str) -> str:
     """
-    Given an input path, it adds a timestamp portion to the filename and stores a backup
+    Snapshots the file into its backup store before it is modified (see `BackupStore`), returns the snapshot id
+    """
+    return backup_store_for(path).backup(path)
+
+def _search_and_replace(search_for: str, replace_with: str) -> Callable[[bytes], tuple[bytes, int]]:
+    """
+    Returns a part transform (see `_rewrite_zip`) that searches for the given string and replaces it
+    with the provided string.
+    """
+    search_bytes, replace_bytes = search_for.encode("utf-8"), replace_with.encode("utf-8")
+
+    def transform(contents: bytes) -> tuple[bytes, int]:
+        count = contents.count(search_bytes)
+        _count(replacements=count)
+        return (contents.replace(search_bytes, replace_bytes) if count else contents), count
+
+    return transform
+
+def _normalize_link(path: str) -> str:
+    """
+    Path as it appears in the link targets of the relationship parts, e.g. 'C:/My Share' -> 'file:///C:\\My%20Share'
+    """
+    return "file:///" + path.replace(" ", "%20").replace("/", "\\")
+
+@functools.lru_cache(maxsize=8)
+def _trie_regex(keys: tuple[bytes, ...]) -> re.Pattern:
+    """
+    Single regex matching any of `keys`, built from a trie of the keys so that matching costs one pass over
+    the input whatever the number of keys. The longest key wins when several match at the same position.
+    """
+    trie: dict = {}
+    for key in keys:
+        node = trie
+        for byte in key:
+            node = node.setdefault(byte, {})
+        node[None] = None
+
+    def pattern(node: dict) -> bytes:
+        branches = [re.escape(bytes([byte])) + pattern(child) for byte, child in sorted((k, v) for k, v in node.items() if k is not None)]
+        if not branches:
+            return b""
+        body = branches[0] if len(branches) == 1 else b"(?:" + b"|".join(branches) + b")"
+        return b"(?:" + body + b")?" if None in node else body
+
+    return re.compile(pattern(trie))
+
+class _LinkRemapper:
+    """
+    Part transform (see `_rewrite_zip`) replacing the links of a whole mapping in a single pass over the part.
+    `hits` counts the replacements made per mapping entry, keyed by the search strings of the mapping.
+    """
+
+    def __init__(self, mapping: Mapping[str, str]) -> None:
+        self.hits = dict.fromkeys(mapping, 0)
+        self._targets: dict[bytes, tuple[str, bytes]] = {}
+        for search_str, replace_with in mapping.items():
+            search_bytes = _normalize_link(search_str).encode("utf-8")
+            replace_bytes = _normalize_link(replace_with).encode("utf-8")
+            if self._targets.get(search_bytes, (search_str, replace_bytes))[1] != replace_bytes:
+                raise ValueError(f"conflicting replacements for '{search_str}' in the link mapping")
+            self._targets.setdefault(search_bytes, (search_str, replace_bytes))
+        self._pattern = _trie_regex(tuple(sorted(self._targets))) if self._targets else None
+
+    def __call__(self, contents: bytes) -> tuple[bytes, int]:
+        if self._pattern is None:
+            return contents, 0
+
+        def replace(match: re.Match) -> bytes:
+            search_str, replace_bytes = self._targets[match.group()]
+            self.hits[search_str] += 1
+            return replace_bytes
+
+        new_contents, count = self._pattern.subn(replace, contents)
+        _count(replacements=count)
+        return (new_contents if count else contents), count
+
+def _link_transforms(search_str: str | Mapping[str, str], replace_with: str = "") -> list[tuple[str, Callable[[bytes], tuple[bytes, int]]]]:
+    """
+    Part transforms used to modify PPT links, see `modify_ppt_links`.
+    """
+    if isinstance(search_str, Mapping):
+        return [(r"ppt/[^/]+/_rels/[^/]+\.rels", _LinkRemapper(search_str))]
+
+    # Replace all spaces with '%20' in the search and replace strings
+    return [(r"ppt/[^/]+/_rels/[^/]+\.rels", _search_and_replace(_normalize_link(search_str), _normalize_link(replace_with)))]
+
+def read_link_mapping(csv_path: str) -> dict[str, str]:
+    """
+    Reads a link mapping for `modify_ppt_links` from a CSV with one (old path, new path) pair per row.
+    An 'old,new' header row, blank rows and rows starting with '#' are skipped.
+    """
+    mapping = {}
+    with open(csv_path, encoding="utf-8-sig", newline="") as f:
+        for row_number, row in enumerate(csv.reader(f), 1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            if row_number == 1 and [cell.strip().lower() for cell in row[:2]] == ["old", "new"]:
+                continue
+            if len(row) < 2:
+                raise ValueError(f"{csv_path}, row {row_number}: expected two columns (old path, new path)")
+            mapping[row[0].strip()] = row[1].strip()
+
+    return mapping
+
+def _popup_transforms(auto_update: bool) -> list[tuple[str, Callable[[bytes], tuple[bytes, int]]]]:
+    """
+    Part transforms used to toggle the PPT links update popup, see `toggle_update_links_popup`.
+    """
+
+    # Search and replace string - CHARTS
+    search_str = f'<c:autoUpdate val="{int(not auto_update)}"/>'
+    replace_with = f'<c:autoUpdate val="{int(auto_update)}"/>'
+    chart_transform = _search_and_replace(search_str, replace_with)
+
+    # Search and replace string - TABLES
+    search_str = '<p:link' + (' updateAutomatic="1"' if not auto_update else '') + '/>'
+    replace_with = '<p:link' + (' updateAutomatic="1"' if auto_update else '') + '/>'
+    table_transform = _search_and_replace(search_str, replace_with)
+
+    return [(r"ppt/charts/[^/]+\.xml", chart_transform), (r"ppt/slides/[^/]+\.xml", table_transform)]
+
+def _copy_zipinfo(zinfo: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    """
+    Returns a fresh ZipInfo carrying over the name, timestamps and attributes of `zinfo` so that it
+    can be written to another archive. Sizes and CRC are carried over as well, ZIP64 extras are dropped
+    since zipfile adds them back on its own when required.
+    """
+    clone = zipfile.ZipInfo(zinfo.filename, zinfo.date_time)
+    clone.compress_type = zinfo.compress_type
+    clone.comment = zinfo.comment
+    clone.create_system = zinfo.create_system
+    clone.create_version = zinfo.create_version
+    clone.extract_version = zinfo.extract_version
+    clone.internal_attr = zinfo.internal_attr
+    clone.external_attr = zinfo.external_attr
+    clone.flag_bits = zinfo.flag_bits & ~0x08
+    clone.CRC = zinfo.CRC
+    clone.compress_size = zinfo.compress_size
+    clone.file_size = zinfo.file_size
+
+    # Strip ZIP64 (0x0001) fields out of the extra data
+    extra, pos = b"", 0
+    while pos + 4 <= len(zinfo.extra):
+        header_id, size = struct.unpack("<HH", zinfo.extra[pos:pos + 4])
+        if header_id != 1:
+            extra += zinfo.extra[pos:pos + 4 + size]
+        pos += 4 + size
+    clone.extra = extra
+
+    return clone
+
+def _copy_zip_member_raw(zfr: zipfile.ZipFile, zinfo: zipfile.ZipInfo, zfw: zipfile.ZipFile) -> None:
+    """
+    Copies a member from `zfr` into `zfw` as is, i.e. the compressed stream is moved over without being
+    decompressed or recompressed.
+
+    zipfile has no public API for this, hence we parse the local file header ourselves and register
+    the entry with the writer the same way `ZipFile.open(..., mode='w')` does.
+    """
+    _write_raw_member(zfw, _copy_zipinfo(zinfo), _raw_member_chunks(zfr, zinfo))
+
+def _raw_member_chunks(zfr: zipfile.ZipFile, zinfo: zipfile.ZipInfo):
+    """
+    Yields the compressed stream of a member of `zfr` in chunks, so that large media parts are never held
+    in memory as a whole
+    """
+    zfr.fp.seek(zinfo.header_offset)
+    fheader = struct.unpack(zipfile.structFileHeader, zfr.fp.read(zipfile.sizeFileHeader))
+    if fheader[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad magic number for file header: {zinfo.filename}")
+    zfr.fp.seek(fheader[zipfile._FH_FILENAME_LENGTH] + fheader[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+
+    remaining = zinfo.compress_size
+    while remaining > 0:
+        chunk = zfr.fp.read(min(remaining, 1 << 20))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated member: {zinfo.filename}")
+        yield chunk
+        remaining -= len(chunk)
+
+def _write_raw_member(zfw: zipfile.ZipFile, zinfo: zipfile.ZipInfo, chunks) -> None:
+    """
+    Writes a member whose compressed stream is already at hand (`zinfo` carrying its compression type,
+    CRC and sizes), registering it with the writer the same way `ZipFile.open(..., mode='w')` does.
+    """
+    zfw._writecheck(zinfo)
+    zfw._didModify = True
+    zinfo.header_offset = zfw.fp.tell()
+    zfw.fp.write(zinfo.FileHeader())
+    for chunk in chunks:
+        zfw.fp.write(chunk)
+
+    zfw.filelist.append(zinfo)
+    zfw.NameToInfo[zinfo.filename] = zinfo
+    zfw.start_dir = zfw.fp.tell()
+
+# Compression policy of the parts we (re)compress, see `_part_compression`. Media and nested packages are
+# compressed already and are stored, XML (the bulk of a deck) gets a fast deflate level.
+_STORED_EXTENSIONS = frozenset({
+    ".png", ".jpg", ".jpeg", ".jfif", ".gif", ".wdp", ".mp4", ".m4v", ".mov", ".mp3", ".m4a", ".wma", ".wmv",
+    ".xlsx", ".xlsm", ".xlsb", ".docx", ".pptx", ".zip", ".gz",
+})
+_XML_EXTENSIONS = frozenset({".xml", ".rels", ".vml"})
+_XML_COMPRESS_LEVEL = 1
+_CONTENT_TYPES_PART = "[Content_Types].xml"
+
+def _part_compression(part_name: str) -> tuple[int, int]:
+    """
+    (compress_type, compress_level) for a part, going by its extension
     """
-    existing_path = list(os.path.split(path))
-    file_extension_pos = existing_path[-1].rfind(".")
-    existing_path[-1] = f"{existing_path[-1][:file_extension_pos]}-{int(dt.datetime.today().timestamp())}{existing_path[-1][file_extension_pos:]}"
-    backup_path = os.path.join(*existing_path)
-    shutil.copy2(path, backup_path)
-    return backup_path
+    extension = posixpath.splitext(part_name)[1].lower()
+    if extension in _STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED, 0
+    if extension in _XML_EXTENSIONS:
+        return zipfile.ZIP_DEFLATED, _XML_COMPRESS_LEVEL
+    return zipfile.ZIP_DEFLATED, zlib.Z_DEFAULT_COMPRESSION
+
+def _compress_part(contents: bytes, compress_type: int, compress_level: int) -> tuple[int, bytes]:
+    """
+    CRC and compressed stream of a part, runs on the `_ArchiveWriter` threads (zlib releases the GIL)
+    """
+    crc = zlib.crc32(contents)
+    if compress_type == zipfile.ZIP_STORED:
+        return crc, contents
 
-def _search_and_replace(search_for: str, replace_with: str, file_paths: list[str]) -> int:
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+    return crc, compressor.compress(contents) + compressor.flush()
+
+class _ArchiveWriter:
     """
-    Search for the given string and replace with provided string on all given file paths.
+    Writes members to `zfw` in the order they are added. New contents are compressed concurrently on a
+    thread pool following `_part_compression`, raw copies from another archive are streamed across as is.
+
+    Members are written out in order as soon as they are ready, at most `window` members (and roughly
+    `window_bytes` of contents) are held in memory at once.
     """
 
-    print(f"'{search_for}' would be replaced with '{replace_with}'")
-    counts = 0
-    for file in file_paths:
-        with open(file, "r", encoding="utf-8") as f:
-            temp = f.read()
+    def __init__(self, zfw: zipfile.ZipFile, max_workers: int | None = None, window_bytes: int = 64 << 20) -> None:
+        self.zfw = zfw
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.window = 2 * self.max_workers
+        self.window_bytes = window_bytes
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers)
+        self._pending: collections.deque = collections.deque()
+        self._pending_bytes = 0
+
+    def __enter__(self) -> "_ArchiveWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self._executor.shutdown(cancel_futures=True)
+
+    def write(self, zinfo: zipfile.ZipInfo, contents: bytes) -> None:
+        """
+        Adds a member with new contents, `zinfo` provides the name, timestamps and attributes
+        """
+        compress_type, compress_level = _part_compression(zinfo.filename)
+        future = self._executor.submit(_compress_part, contents, compress_type, compress_level)
+        self._pending.append((zinfo, compress_type, len(contents), future))
+        self._pending_bytes += len(contents)
+        self._drain(self.window, self.window_bytes)
+
+    def copy(self, zfr: zipfile.ZipFile, zinfo: zipfile.ZipInfo) -> None:
+        """
+        Adds a member of `zfr` as is, see `_copy_zip_member_raw`
+        """
+        self._pending.append((zinfo, None, zfr, None))
+        self._drain(self.window, self.window_bytes)
+
+    def flush(self) -> None:
+        self._drain(0, 0)
+
+    def _drain(self, window: int, window_bytes: int) -> None:
+        while self._pending and (len(self._pending) > window or self._pending_bytes > window_bytes):
+            zinfo, compress_type, source, future = self._pending.popleft()
+            if future is None:
+                _copy_zip_member_raw(source, zinfo, self.zfw)
+                continue
+
+            crc, payload = future.result()
+            self._pending_bytes -= source
+            zinfo.compress_type = compress_type
+            zinfo.CRC = crc
+            zinfo.file_size = source
+            zinfo.compress_size = len(payload)
+            _write_raw_member(self.zfw, zinfo, [payload])
+
+def _write_package(zfr: zipfile.ZipFile, zfw: zipfile.ZipFile, updated_parts: dict[str, bytes | None]) -> None:
+    """
+    Writes every member of `zfr` to `zfw` in the original order ('[Content_Types].xml' first). Members present
+    in `updated_parts` are written (compressed in parallel, see `_ArchiveWriter`) with the new contents, or dropped
+    if the new contents are None. Everything else is copied over raw.
+    """
+    parts_copied, parts_deflated, bytes_deflated = 0, 0, 0
+    start = zfw.fp.tell()
+    with _ArchiveWriter(zfw) as writer:
+        for ITEM in sorted(zfr.infolist(), key=lambda ITEM: ITEM.filename != _CONTENT_TYPES_PART):
+            if ITEM.filename in updated_parts:
+                if updated_parts[ITEM.filename] is None:
+                    continue
+                zinfo = _copy_zipinfo(ITEM)
+                zinfo.flag_bits &= 0x800
+                writer.write(zinfo, updated_parts[ITEM.filename])
+                parts_deflated += 1
+                bytes_deflated += len(updated_parts[ITEM.filename])
+            else:
+                writer.copy(zfr, ITEM)
+                parts_copied += 1
 
-        counts += temp.count(search_for)
-        temp = temp.replace(search_for, replace_with)
+    _count(parts_copied=parts_copied, parts_deflated=parts_deflated, bytes_deflated=bytes_deflated, bytes_written=zfw.fp.tell() - start)
 
-        with open(file, "w", encoding="utf-8") as f:
-            f.write(temp)
+def _write_package_to_stream(zfr: zipfile.ZipFile, f: BinaryIO, updated_parts: dict[str, bytes | None], path: str = "") -> None:
+    """
+    Writes the updated package to a binary file object, which doesn't need to be seekable.
+    """
+    with _span("write", path=path or None), zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED) as zfw:
+        _write_package(zfr, zfw, updated_parts)
+
+def _source_name(source: str | bytes | BinaryIO) -> str | None:
+    """
+    Path of a package source for spans and messages, None for bytes and file objects
+    """
+    return source if isinstance(source, str) else None
+
+def _check_output(source: str | bytes | BinaryIO, output: str | BinaryIO | None) -> None:
+    """
+    Packages that aren't read from a path have nowhere to be written back to
+    """
+    if output is None and not isinstance(source, str):
+        raise ValueError("`output` is required when the input is bytes or a file object")
+
+@contextlib.contextmanager
+def _output_file(output: str | BinaryIO):
+    """
+    Binary file to write `output` through. A path is written to a temp file next to it, which is renamed over
+    the path once the block completes (so the path is never left half written), file objects are used as is.
+
+    The file keeps the permissions of the file it replaces, a new file gets the default ones (umask applied).
+    """
+    if not isinstance(output, str):
+        yield output
+        return
+
+    # Not mkstemp, its files are readable by the owner only and would make shared decks private once renamed
+    directory, name = os.path.split(os.path.abspath(output))
+    while True:
+        tmp_path = os.path.join(directory, f".{name}.{os.urandom(4).hex()}.tmp")
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if os.path.exists(output):
+                shutil.copymode(output, tmp_path)
+            yield f
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, output)
+
+def _save_package(
+        zfr: zipfile.ZipFile, source: str | bytes | BinaryIO, output: str | BinaryIO | None,
+        updated_parts: dict[str, bytes | None], overwrite: bool = True
+    ) -> None:
+    """
+    Writes the package read by `zfr` with `updated_parts` applied to `output`, a path or a binary file object.
+    Without an `output`, the `source` path is replaced (backed up first unless `overwrite`). Closes `zfr`.
+    """
+    _check_output(source, output)
+    if output is None and not overwrite:
+        _create_file_backup(source)
+
+    destination = source if output is None else output
+    with _output_file(destination) as f:
+        _write_package_to_stream(zfr, f, updated_parts, _source_name(destination))
+        # Closed before the rename, Windows doesn't allow replacing a file that is open
+        zfr.close()
+
+def _rewrite_zip(
+        source: str | bytes | BinaryIO, transforms: list[tuple[str, Callable[[bytes], tuple[bytes, int]]]],
+        output: str | BinaryIO | None = None
+    ) -> list[int]:
+    """
+    Single pass rewrite of the archive at `source`, into `output` if given.
+
+    `transforms` is a list of `(part_pattern, transform)` pairs. Every part whose name fully matches
+    `part_pattern` is passed through `transform`, which returns the new contents along with a count of
+    the changes made. Only the parts that actually changed are recompressed, all other entries are
+    streamed across raw. If nothing changed and there is no `output`, the archive is left untouched.
+
+    Returns the accumulated counts per transform.
+    """
+    _check_output(source, output)
+    counts = [0] * len(transforms)
+    updated_parts: dict[str, bytes] = {}
+    with PackageReader(source) as zfr:
+        # Inflate the matching parts, then run them through the transforms
+        with _span("read", path=_source_name(source)) as span:
+            parts = {
+                ITEM.filename: zfr.read(ITEM) for ITEM in zfr.infolist()
+                if any(re.fullmatch(pattern, ITEM.filename) for pattern, _ in transforms)
+            }
+            span.add(parts_read=len(parts), bytes_read=sum(map(len, parts.values())))
+
+        with _span("replace", path=_source_name(source)):
+            for part_name, contents in parts.items():
+                for idx, (pattern, transform) in enumerate(transforms):
+                    if re.fullmatch(pattern, part_name):
+                        new_contents, count = transform(contents)
+                        counts[idx] += count
+                        if new_contents != contents:
+                            contents = updated_parts[part_name] = new_contents
+
+        if updated_parts or output is not None:
+            _save_package(zfr, source, output, updated_parts)
 
-    print(f"{counts} occurances were replaced.")
     return counts
 
-def _extract_excel_datamashup(datamashup_byte: bytes, output_extract_path: str) -> int:
+class BackupSnapshot(NamedTuple):
+    id: str
+    source: str
+    created: float
+    size: int
+
+def _clone_file(src: str, dst: str) -> None:
     """
-    Given a datamashup from excel containing M queries, extracts the M query portion to extract path specified.
-    Note that the datamashup is by itself an zip file.
+    Copies `src` to `dst` as a reflink (copy on write clone, btrfs / xfs) where the filesystem supports it,
+    falling back to a plain copy otherwise
+    """
+    try:
+        import fcntl
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), 0x40049409, fsrc.fileno())  # FICLONE
+    except (ImportError, OSError):
+        shutil.copyfile(src, dst)
+
+class BackupStore:
+    """
+    Content addressed backup store used by the helpers before modifying a file (see `set_backup_store`).
 
-    Contains logic specific to reading MS-QDEFF format zip
+    Archives are split into their members, each distinct (compressed) member is stored once under its sha256 in
+    'objects/', and the member list of an archive is stored once under the hash of its contents in 'manifests/'.
+    A snapshot is a small ref file in 'refs/<hash of the file path>/' pointing at a manifest, so that backing a
+    file up only reads the refs of that file, and concurrent backups (e.g. `run_batch` workers) never rewrite a
+    shared file. Since most parts are identical between successive versions of a deck, a backup costs about the
+    size of the parts that changed, members unchanged since the previous snapshot of the file are not even read.
+    Files that aren't zip archives are stored whole, as reflinks where the filesystem supports it.
 
-    https://community.fabric.microsoft.com/t5/Desktop/Change-pbix-data-source-programmatically/m-p/422128
+    ```
+    store = BackupStore("C:/Reports/.backups", keep_last=5)
+    snapshot_id = store.backup("C:/Reports/deck.pptx")
+    ...
+    store.restore(store.snapshots("C:/Reports/deck.pptx")[-1])
+    ```
+
+    Retention: the last `keep_last` snapshots of every file are kept and snapshots older than `max_age_days` are
+    evicted (except the latest one of each file), as each file is backed up. If `max_bytes` is set, the oldest
+    snapshots are evicted until the objects fit. The size limit and the deletion of the objects and manifests no
+    longer referenced run as part of a backup at most every `_PRUNE_INTERVAL` seconds, or on calling `prune`.
+    Unreferenced objects and manifests are only deleted after a grace period, so that backups running
+    concurrently in other processes don't lose the ones they are reusing.
+    """
+    _GRACE_SECONDS = 3600
+    _PRUNE_INTERVAL = 300
+
+    def __init__(
+            self, root: str, *, keep_last: int = 10, max_age_days: float | None = None, max_bytes: int | None = None
+        ) -> None:
+        self.root = root
+        self.keep_last = keep_last
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        for folder in ("objects", "manifests", "refs"):
+            os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    # Objects, manifests and refs
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _manifest_path(self, manifest_id: str) -> str:
+        return os.path.join(self.root, "manifests", f"{manifest_id}.json")
+
+    @staticmethod
+    def _source_key(source: str) -> str:
+        return hashlib.sha1(os.path.normcase(source).encode("utf-8")).hexdigest()[:16]
+
+    def _ref_path(self, snapshot_id: str) -> str:
+        # Snapshot ids are '<source key>-<creation time in ns, hex><random suffix>'
+        if not re.fullmatch(r"[0-9a-f]{16}-[0-9a-f]{20}", snapshot_id):
+            raise ValueError(f"invalid snapshot id: {snapshot_id!r}")
+        source_key, _, name = snapshot_id.partition("-")
+        return os.path.join(self.root, "refs", source_key, f"{name}.json")
+
+    def _ref_names(self, source_key: str) -> list[str]:
+        """
+        Ref file names of a source, oldest first
+        """
+        with contextlib.suppress(FileNotFoundError):
+            return sorted(name for name in os.listdir(os.path.join(self.root, "refs", source_key)) if name.endswith(".json"))
+        return []
+
+    @staticmethod
+    def _ref_created(name: str) -> float:
+        return int(name[:16], 16) / 1e9
+
+    def _put_object(self, chunks) -> tuple[str, int]:
+        """
+        Stores a stream under its sha256 unless already present. Returns the digest and the bytes written.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "objects"))
+        hasher = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    f.write(chunk)
+            digest = hasher.hexdigest()
+            object_path = self._object_path(digest)
+            if os.path.exists(object_path):
+                os.remove(tmp_path)
+                os.utime(object_path)
+                return digest, 0
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(tmp_path, object_path)
+            return digest, os.path.getsize(object_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read_json(self, path: str) -> dict:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_json(self, path: str, data: dict) -> None:
+        """
+        Writes `data` to `path` atomically, readers never see a partial file
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _manifest_objects(manifest: dict) -> list[str]:
+        return [manifest["object"]] if "object" in manifest else [member["object"] for member in manifest["members"]]
+
+    # Public API
+    def snapshots(self, source: str | None = None) -> list[BackupSnapshot]:
+        """
+        Snapshots of `source` (or of every file), oldest first
+        """
+        if source:
+            source_keys = [self._source_key(os.path.abspath(source))]
+        else:
+            source_keys = os.listdir(os.path.join(self.root, "refs"))
+
+        snapshots = []
+        for source_key in source_keys:
+            for name in self._ref_names(source_key):
+                with contextlib.suppress(FileNotFoundError, json.JSONDecodeError):
+                    ref = self._read_json(os.path.join(self.root, "refs", source_key, name))
+                    snapshots.append(BackupSnapshot(f"{source_key}-{name[:-5]}", ref["source"], ref["created"], ref["size"]))
+        return sorted(snapshots, key=lambda snapshot: snapshot.created)
+
+    def backup(self, path: str) -> str:
+        """
+        Snapshots the file at `path`, returns the snapshot id
+        """
+        source = os.path.abspath(path)
+        source_key = self._source_key(source)
+        with _span("backup", path=source) as span:
+            # Members unchanged since the previous snapshot of the same file are reused without being read
+            previous_members = {}
+            ref_names = self._ref_names(source_key)
+            if ref_names:
+                with contextlib.suppress(FileNotFoundError, json.JSONDecodeError):
+                    ref = self._read_json(os.path.join(self.root, "refs", source_key, ref_names[-1]))
+                    for member in self._read_json(self._manifest_path(ref["manifest"])).get("members", []):
+                        previous_members[(member["name"], member["crc"], member["compress_size"], member["compress_type"])] = member["object"]
+
+            bytes_written, parts_reused = 0, 0
+            try:
+                with zipfile.ZipFile(source) as zfr:
+                    members = []
+                    for item in zfr.infolist():
+                        zinfo = _copy_zipinfo(item)
+                        digest = previous_members.get((zinfo.filename, zinfo.CRC, zinfo.compress_size, zinfo.compress_type))
+                        if digest is not None and os.path.exists(self._object_path(digest)):
+                            os.utime(self._object_path(digest))
+                            parts_reused += 1
+                        else:
+                            digest, written = self._put_object(_raw_member_chunks(zfr, item))
+                            bytes_written += written
+                        members.append({
+                            "name": zinfo.filename, "object": digest, "date_time": list(zinfo.date_time),
+                            "compress_type": zinfo.compress_type, "crc": zinfo.CRC, "compress_size": zinfo.compress_size,
+                            "file_size": zinfo.file_size, "flag_bits": zinfo.flag_bits, "external_attr": zinfo.external_attr,
+                            "internal_attr": zinfo.internal_attr, "create_system": zinfo.create_system,
+                            "create_version": zinfo.create_version, "extract_version": zinfo.extract_version,
+                            "extra": zinfo.extra.hex(), "comment": zinfo.comment.hex(),
+                        })
+                    content = {"members": members, "comment": zfr.comment.hex()}
+            except zipfile.BadZipFile:
+                # Not an archive, stored whole
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "objects"))
+                os.close(fd)
+                _clone_file(source, tmp_path)
+                hasher = hashlib.sha256()
+                with open(tmp_path, "rb") as f:
+                    while chunk := f.read(1 << 20):
+                        hasher.update(chunk)
+                digest = hasher.hexdigest()
+                if os.path.exists(self._object_path(digest)):
+                    os.remove(tmp_path)
+                    os.utime(self._object_path(digest))
+                else:
+                    os.makedirs(os.path.dirname(self._object_path(digest)), exist_ok=True)
+                    os.replace(tmp_path, self._object_path(digest))
+                    bytes_written += os.path.getsize(self._object_path(digest))
+                content = {"object": digest}
+
+            # Manifests are named after their contents and never modified, backing up the same contents twice
+            # only adds a ref
+            manifest_id = hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+            if os.path.exists(self._manifest_path(manifest_id)):
+                os.utime(self._manifest_path(manifest_id))
+            else:
+                self._write_json(self._manifest_path(manifest_id), content)
+
+            created = time.time_ns()
+            snapshot_id = f"{source_key}-{created:016x}{os.urandom(2).hex()}"
+            self._write_json(self._ref_path(snapshot_id), {
+                "source": source, "created": created / 1e9, "manifest": manifest_id, "size": os.path.getsize(source)
+            })
+            span.add(bytes_copied=bytes_written, parts_reused=parts_reused)
+
+        self._prune_refs(source_key, self._ref_names(source_key))
+        stamp_path = os.path.join(self.root, "pruned")
+        with contextlib.suppress(FileNotFoundError):
+            if time.time() - os.path.getmtime(stamp_path) < self._PRUNE_INTERVAL:
+                return snapshot_id
+        self.prune()
+        return snapshot_id
+
+    def restore(self, snapshot: str | BackupSnapshot, dest_path: str = "", backup: bool = True) -> str:
+        """
+        Restores a snapshot (id or `BackupSnapshot`) to `dest_path`, defaults to the file it was taken from,
+        atomically. The file being replaced is backed up first unless `backup` is False. Returns the restored path.
+        """
+        ref = self._read_json(self._ref_path(snapshot.id if isinstance(snapshot, BackupSnapshot) else snapshot))
+        manifest = self._read_json(self._manifest_path(ref["manifest"]))
+        dest_path = dest_path or ref["source"]
+        if backup and os.path.exists(dest_path):
+            self.backup(dest_path)
+
+        with _output_file(dest_path) as f:
+            if "object" in manifest:
+                with open(self._object_path(manifest["object"]), "rb") as fobj:
+                    shutil.copyfileobj(fobj, f)
+            else:
+                with zipfile.ZipFile(f, "w") as zfw:
+                    for member in manifest["members"]:
+                        zinfo = zipfile.ZipInfo(member["name"], tuple(member["date_time"]))
+                        for key in ("compress_type", "compress_size", "file_size", "flag_bits", "external_attr",
+                                    "internal_attr", "create_system", "create_version", "extract_version"):
+                            setattr(zinfo, key, member[key])
+                        zinfo.CRC = member["crc"]
+                        zinfo.extra = bytes.fromhex(member["extra"])
+                        zinfo.comment = bytes.fromhex(member["comment"])
+                        _write_raw_member(zfw, zinfo, self._verified_chunks(member["object"]))
+                    zfw.comment = bytes.fromhex(manifest["comment"])
+
+        return dest_path
+
+    def _verified_chunks(self, digest: str):
+        hasher = hashlib.sha256()
+        with open(self._object_path(digest), "rb") as f:
+            while chunk := f.read(1 << 20):
+                hasher.update(chunk)
+                yield chunk
+        if hasher.hexdigest() != digest:
+            raise ValueError(f"backup object {digest} is corrupted")
+
+    def _prune_refs(self, source_key: str, ref_names: list[str]) -> list[str]:
+        """
+        Applies the per file retention to the refs of a source (oldest first), the latest one is always kept.
+        Returns the names of the refs kept.
+        """
+        cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days is not None else None
+        kept = []
+        for idx, name in enumerate(ref_names):
+            newer = len(ref_names) - 1 - idx
+            if newer == 0 or (newer < self.keep_last and (cutoff is None or self._ref_created(name) >= cutoff)):
+                kept.append(name)
+            else:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self.root, "refs", source_key, name))
+        return kept
+
+    def prune(self) -> int:
+        """
+        Applies the retention policy to every file, then the size limit, and deletes unreferenced manifests and
+        objects. Returns the number of snapshots evicted.
+        """
+        refs_root = os.path.join(self.root, "refs")
+        evicted, refs = 0, {}
+        for source_key in os.listdir(refs_root):
+            ref_names = self._ref_names(source_key)
+            kept = self._prune_refs(source_key, ref_names)
+            evicted += len(ref_names) - len(kept)
+            for name in kept:
+                with contextlib.suppress(FileNotFoundError, json.JSONDecodeError):
+                    refs[(source_key, name)] = self._read_json(os.path.join(refs_root, source_key, name))["manifest"]
+            if not kept:
+                with contextlib.suppress(OSError):
+                    os.rmdir(os.path.join(refs_root, source_key))
+
+        # Every manifest still on disk keeps its objects, unreferenced ones only go after the grace period
+        grace_cutoff = time.time() - self._GRACE_SECONDS
+        manifests = {}
+        for filename in os.listdir(os.path.join(self.root, "manifests")):
+            if filename.endswith(".json"):
+                with contextlib.suppress(FileNotFoundError, json.JSONDecodeError):
+                    manifests[filename[:-5]] = self._manifest_objects(self._read_json(os.path.join(self.root, "manifests", filename)))
+
+        # Size based eviction, oldest snapshots first, the latest one of every file is always kept
+        if self.max_bytes is not None:
+            object_refs = collections.Counter(
+                digest for manifest_id in refs.values() for digest in set(manifests.get(manifest_id, ()))
+            )
+            object_sizes = {
+                digest: os.path.getsize(self._object_path(digest))
+                for digest in object_refs if os.path.exists(self._object_path(digest))
+            }
+            total = sum(object_sizes.values())
+            latest = {}
+            for source_key, name in refs:
+                latest[source_key] = max(name, latest.get(source_key, name))
+            by_age = sorted((name, source_key) for source_key, name in refs if latest[source_key] != name)
+            for name, source_key in by_age:
+                if total <= self.max_bytes:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(refs_root, source_key, name))
+                evicted += 1
+                for digest in set(manifests.get(refs.pop((source_key, name)), ())):
+                    object_refs[digest] -= 1
+                    if object_refs[digest] == 0:
+                        total -= object_sizes.get(digest, 0)
+
+        referenced_manifests = set(refs.values())
+        for manifest_id in list(manifests):
+            manifest_path = self._manifest_path(manifest_id)
+            with contextlib.suppress(FileNotFoundError):
+                if manifest_id not in referenced_manifests and os.path.getmtime(manifest_path) < grace_cutoff:
+                    os.remove(manifest_path)
+                    del manifests[manifest_id]
+
+        referenced_objects = {digest for digests in manifests.values() for digest in digests}
+        for dirpath, dirnames, filenames in os.walk(os.path.join(self.root, "objects")):
+            for filename in filenames:
+                object_path = os.path.join(dirpath, filename)
+                with contextlib.suppress(FileNotFoundError):
+                    if filename not in referenced_objects and os.path.getmtime(object_path) < grace_cutoff:
+                        os.remove(object_path)
+
+        with open(os.path.join(self.root, "pruned"), "w"):
+            pass
+        return evicted
+
+# Store used by `_create_file_backup`, None for a '.backups' store next to each file
+_BACKUP_STORE: BackupStore | None = None
+
+def set_backup_store(store: BackupStore | None) -> BackupStore | None:
+    """
+    Sets the `BackupStore` the helpers back files up to before modifying them, None for the default of a
+    '.backups' store in the directory of each file. Returns the previous store.
     """
+    global _BACKUP_STORE
+    previous, _BACKUP_STORE = _BACKUP_STORE, store
+    return previous
 
-    byte_dict = {}
-    with io.BytesIO(datamashup_byte) as dmf:
-        # Parse bytes based on the MS-QDEFF documentation
-        byte_dict['version'] = dmf.read(4)
-        byte_dict['pkg_parts_len'] = dmf.read(4)
-        byte_dict['pkg_parts'] = dmf.read(int.from_bytes(byte_dict['pkg_parts_len'], byteorder='little'))
-        byte_dict['perm_len'] = dmf.read(4)
-        byte_dict['perm_var'] = dmf.read(int.from_bytes(byte_dict['perm_len'], byteorder='little'))
-        byte_dict['meta_len'] = dmf.read(4)
-        byte_dict['meta_var'] = dmf.read(int.from_bytes(byte_dict['meta_len'], byteorder='little'))
-        byte_dict['perm_bind_len'] = dmf.read(4)
-        byte_dict['perm_bind_var'] = dmf.read(int.from_bytes(byte_dict['perm_bind_len'], byteorder='little'))
-
-        # Keep track of number of files extracted
-        count = 0
-        with zipfile.ZipFile(io.BytesIO(byte_dict['pkg_parts'])) as zfd:
-            for zfd_item in zfd.infolist():
-                if re.match("Formulas/Section\d+\.m", zfd_item.filename):
-                    zfd_item.filename = os.path.basename(zfd_item.filename)
-                    zfd.extract(zfd_item, output_extract_path)
-                    count += 1
+def backup_store_for(path: str) -> BackupStore:
+    """
+    The `BackupStore` backups of `path` go to
+    """
+    if _BACKUP_STORE is not None:
+        return _BACKUP_STORE
+    return BackupStore(os.path.join(os.path.dirname(os.path.abspath(path)), ".backups"))
 
-        return count
+class _MemoryViewReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a memoryview, so that archives nested inside a buffer can be
+    opened with zipfile without copying them out first.
+    """
 
-def _update_excel_datamashup(datamashup_byte: bytes, mq_paths: dict[str, str]) -> bytes:
+    def __init__(self, buffer: bytes | memoryview) -> None:
+        self._buffer = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunk = self._buffer[self._pos:self._pos + len(b)]
+        b[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: len(self._buffer)}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self) -> None:
+        # Releases the view, so that the buffer (e.g. a memory map) can be closed
+        self._buffer.release()
+        super().close()
+
+class Relationship(NamedTuple):
+    source: str
+    id: str
+    type: str
+    target: str
+    external: bool
+
+# Part kinds indexed by `PackageReader`, a part gets the first kind whose pattern matches its name
+_PART_KINDS = {
+    "slide": r"ppt/slides/slide[^/]*\.xml",
+    "chart": r"(?:ppt|xl)/charts/chart[^/]*\.xml",
+    "chart_rels": r"(?:ppt|xl)/charts/_rels/chart[^/]*\.xml\.rels",
+    "embedding": r"(?:ppt|xl)/embeddings/[^/]+",
+    "custom_xml": r"customXml/item\d+\.xml",
+    "rels": r"(?:[^/]+/)*_rels/[^/]*\.rels",
+    "media": r"(?:ppt|xl)/media/[^/]+",
+    "formula": r"Formulas/Section\d+\.m",
+}
+_PART_KIND_RE = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _PART_KINDS.items()))
+
+def _rels_source_part(rels_name: str) -> str:
     """
-    This function is used by the update M Query function.
-    Contains logic specific to reading the MS-QDEFF format zip and updating existing data mashup.
-    `mq_paths` provided contains the file paths to '.m' files to replace with.
+    Part a relationships part belongs to, e.g. 'ppt/slides/_rels/slide1.xml.rels' -> 'ppt/slides/slide1.xml'
+    ('' for the package relationships '_rels/.rels')
+    """
+    return posixpath.join(posixpath.dirname(posixpath.dirname(rels_name)), posixpath.basename(rels_name)[:-5])
 
-    https://community.fabric.microsoft.com/t5/Desktop/Change-pbix-data-source-programmatically/m-p/422128
+class PackageReader(zipfile.ZipFile):
     """
-    byte_dict = {}
-    with io.BytesIO(datamashup_byte) as dmf:
-        # Parse bytes based on the MS-QDEFF documentation
-        byte_dict['version'] = dmf.read(4)
-        byte_dict['pkg_parts_len'] = dmf.read(4)
-        byte_dict['pkg_parts'] = dmf.read(int.from_bytes(byte_dict['pkg_parts_len'], byteorder='little'))
-        byte_dict['perm_len'] = dmf.read(4)
-        byte_dict['perm_var'] = dmf.read(int.from_bytes(byte_dict['perm_len'], byteorder='little'))
-        byte_dict['meta_len'] = dmf.read(4)
-        byte_dict['meta_var'] = dmf.read(int.from_bytes(byte_dict['meta_len'], byteorder='little'))
-        byte_dict['perm_bind_len'] = dmf.read(4)
-        byte_dict['perm_bind_var'] = dmf.read(int.from_bytes(byte_dict['perm_bind_len'], byteorder='little'))
-
-        # Zip contents would be processed and stored into a temp buffer
+    Zip reader for OPC packages (PPT / excel) with an index of the parts by kind, built from the same single
+    pass over the central directory that zipfile does anyway.
+
+    ```
+    with PackageReader("C:/Reports/deck.pptx") as package:
+        for chart, workbook in package.charts_with_workbooks().items():
+            with package.open_nested(workbook) as embedded:
+                embedded.read("xl/charts/chart1.xml")
+    ```
+
+    Archives given as a path are memory mapped, bytes are read in place, file objects are read through (a file
+    object that can't seek is spooled first, to disk past 64MB). Part kinds are the keys of `_PART_KINDS`
+    (slide, chart, chart_rels, embedding, custom_xml, rels, media, and formula for DataMashup packages), anything else
+    is 'other'. The relationship graph is read from all the
+    '.rels' parts on first use.
+
+    Embedded packages stored uncompressed (see `_part_compression`) are opened by `open_nested` straight
+    from the parent's buffer, without copying them out. Compressed ones are inflated first.
+    """
+
+    def __init__(self, source: str | bytes | BinaryIO) -> None:
+        self._mmap: mmap.mmap | None = None
+        self._buffer: memoryview | None = None
+        self._owner = True
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                if os.fstat(f.fileno()).st_size:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._buffer = memoryview(self._mmap if self._mmap is not None else b"")
+            fp = _MemoryViewReader(self._buffer)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self._buffer = memoryview(source)
+            fp = _MemoryViewReader(self._buffer)
+        elif source.seekable():
+            fp = source
+        else:
+            fp = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+            shutil.copyfileobj(source, fp, 1 << 20)
+            fp.seek(0)
+
+        try:
+            super().__init__(fp)
+        except BaseException:
+            self._release()
+            raise
+        if fp is not source and not isinstance(fp, _MemoryViewReader):
+            self._filePassed = False  # spool is closed along with the reader
+
+        # Shared with the clones, filled on first use
+        self._graph: dict[str, list[Relationship]] = {}
+        self._graph_ready = threading.Event()
+        self._graph_lock = threading.Lock()
+        self._index: dict[str, list[str]] = collections.defaultdict(list)
+        self._positions: dict[str, int] = {}
+        for position, ITEM in enumerate(self.filelist):
+            match = _PART_KIND_RE.fullmatch(ITEM.filename)
+            self._index[match.lastgroup if match else "other"].append(ITEM.filename)
+            self._positions[ITEM.filename] = position
+
+    def clone(self) -> "PackageReader":
+        """
+        Reader sharing the buffer, index and relationship graph, with a file position of its own so that it can
+        be used from another thread. Only for readers over a path or bytes.
+        """
+        assert self._buffer is not None, "only readers over a path or bytes can be cloned"
+        clone = copy.copy(self)
+        clone.fp = _MemoryViewReader(self._buffer)
+        clone._fileRefCnt = 1
+        clone._lock = threading.RLock()
+        clone._owner = False
+        return clone
+
+    def close(self) -> None:
+        super().close()
+        self._release()
+
+    def _release(self) -> None:
+        if isinstance(self.__dict__.get("fp"), _MemoryViewReader):
+            self.fp.close()
+        if self._owner and self._buffer is not None:
+            self._buffer.release()
+            if self._mmap is not None:
+                # Still mapped if a nested reader is left open, unmapped once that one is collected
+                with contextlib.suppress(BufferError):
+                    self._mmap.close()
+
+    # Index
+    def part_names(self, *kinds: str) -> list[str]:
+        """
+        Names of the parts of the given kinds, in archive order
+        """
+        if len(kinds) == 1:
+            return list(self._index.get(kinds[0], ()))
+        return sorted(itertools.chain.from_iterable(self._index.get(kind, ()) for kind in kinds), key=self._positions.__getitem__)
+
+    def relationships(self, part_name: str) -> list[Relationship]:
+        """
+        Relationships of a part ('' for the package), internal targets are resolved to part names
+        """
+        if not self._graph_ready.is_set():
+            with self._graph_lock:
+                if not self._graph_ready.is_set():
+                    for rels_name in self.part_names("chart_rels", "rels"):
+                        source = _rels_source_part(rels_name)
+                        contents = self.read(rels_name)
+                        _count(parts_read=1, bytes_read=len(contents))
+                        self._graph[source] = [
+                            Relationship(
+                                source, rel.attrib["Id"], rel.attrib["Type"],
+                                rel.attrib["Target"] if rel.attrib.get("TargetMode") == "External" else _resolve_part_name(source, rel.attrib["Target"]),
+                                rel.attrib.get("TargetMode") == "External"
+                            )
+                            for rel in _parse_xml(contents).iterfind("pr:Relationship", _NS)
+                        ]
+                    self._graph_ready.set()
+        return self._graph.get(part_name, [])
+
+    def related(self, part_name: str, rel_type: str) -> list[str]:
+        """
+        Part names `part_name` refers to through internal relationships of `rel_type`
+        """
+        return [rel.target for rel in self.relationships(part_name) if rel.type == rel_type and not rel.external]
+
+    def charts_with_workbooks(self) -> dict[str, str | None]:
+        """
+        Chart parts mapped to their embedded workbook part (None for charts without one)
+        """
+        return {
+            chart: next(iter(self.related(chart, _RT_PACKAGE)), None)
+            for chart in self.part_names("chart")
+        }
+
+    # Nested packages
+    def open_nested(self, part_name: str) -> "PackageReader":
+        """
+        Opens an embedded package (e.g. the workbook of a chart), zero copy when it is stored uncompressed
+        """
+        zinfo = self.getinfo(part_name)
+        if self._buffer is None or zinfo.compress_type != zipfile.ZIP_STORED or zinfo.flag_bits & 0x1:
+            return PackageReader(self.read(zinfo))
+
+        fheader = struct.unpack_from(zipfile.structFileHeader, self._buffer, zinfo.header_offset)
+        if fheader[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"Bad magic number for file header: {part_name}")
+        start = zinfo.header_offset + zipfile.sizeFileHeader + fheader[zipfile._FH_FILENAME_LENGTH] + fheader[zipfile._FH_EXTRA_FIELD_LENGTH]
+        _count(parts_mapped=1, bytes_mapped=zinfo.compress_size)
+        return PackageReader(self._buffer[start:start + zinfo.compress_size])
+
+class DataMashup:
+    """
+    MS-QDEFF DataMashup, the binary stream holding the M queries of an excel (base64 encoded in `customXml/item*.xml`).
+
+    Layout is a 4 byte version followed by four length prefixed sections: package parts (itself a zip file
+    containing 'Formulas/Section*.m'), permissions, metadata and permission bindings. Sections are kept as
+    memoryview slices over the original buffer and the package is only opened when the formulas are accessed.
+
+    ```
+    mashup = DataMashup(base64.b64decode(custom_xml.text))
+    mashup.formulas["Section1.m"] = mashup.formulas["Section1.m"].replace("Old Share", "New Share")
+    custom_xml.text = base64.b64encode(mashup.to_bytes()).decode("utf-8")
+    ```
+
+    https://learn.microsoft.com/en-us/openspecs/office_file_formats/ms-qdeff
+    """
+
+    _SECTION_NAMES = ("package parts", "permissions", "metadata", "permission bindings")
+
+    def __init__(self, data: bytes | memoryview) -> None:
+        self._buffer = memoryview(data).cast("B")
+        if len(self._buffer) < 4:
+            raise ValueError(f"DataMashup is truncated, expected a 4 byte version but found {len(self._buffer)} bytes")
+
+        # Parse bytes based on the MS-QDEFF documentation, each section slice includes its length prefix
+        self._sections: list[memoryview] = []
+        pos = 4
+        for name in self._SECTION_NAMES:
+            if pos + 4 > len(self._buffer):
+                raise ValueError(f"DataMashup is truncated, {name} length is missing at offset {pos}")
+            length = int.from_bytes(self._buffer[pos:pos + 4], byteorder="little")
+            if pos + 4 + length > len(self._buffer):
+                raise ValueError(
+                    f"DataMashup is truncated, {name} declares {length} bytes at offset {pos} "
+                    f"but only {len(self._buffer) - pos - 4} bytes are left"
+                )
+            self._sections.append(self._buffer[pos:pos + 4 + length])
+            pos += 4 + length
+
+        # Anything after the permission bindings is carried over as is
+        self._trailer = self._buffer[pos:]
+        self._formulas: dict[str, str] | None = None
+        self._original_formulas: dict[str, str] = {}
+
+    @property
+    def version(self) -> int:
+        return int.from_bytes(self._buffer[:4], byteorder="little")
+
+    @property
+    def package_parts(self) -> memoryview:
+        return self._sections[0][4:]
+
+    @property
+    def permissions(self) -> memoryview:
+        return self._sections[1][4:]
+
+    @property
+    def metadata(self) -> memoryview:
+        return self._sections[2][4:]
+
+    @property
+    def permission_bindings(self) -> memoryview:
+        return self._sections[3][4:]
+
+    @property
+    def formulas(self) -> dict[str, str]:
+        """
+        M query sections keyed by file name (e.g. 'Section1.m'). Values can be modified in place,
+        adding or removing sections is not supported.
+        """
+        if self._formulas is None:
+            with PackageReader(self.package_parts) as zfd:
+                for part_name in zfd.part_names("formula"):
+                    self._original_formulas[posixpath.basename(part_name)] = zfd.read(part_name).decode("utf-8")
+            self._formulas = dict(self._original_formulas)
+
+        return self._formulas
+
+    def changed_formulas(self) -> list[str]:
+        """
+        Names of the sections modified since the mashup was parsed
+        """
+        if self._formulas is None:
+            return []
+
+        unknown = set(self._formulas) ^ set(self._original_formulas)
+        if unknown:
+            raise KeyError(f"adding or removing sections is not supported: {sorted(unknown)}")
+
+        return [name for name, formula in self._formulas.items() if formula != self._original_formulas[name]]
+
+    def _package_parts_bytes(self) -> bytes | memoryview:
+        """
+        Package parts with the modified sections written in, the untouched members are copied raw
+        """
+        changed = self.changed_formulas()
+        if not changed:
+            return self.package_parts
+
         updated_zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(io.BytesIO(byte_dict['pkg_parts'])) as zfr, zipfile.ZipFile(updated_zip_buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zfw:
-            for zfr_item in zfr.infolist():
-                fname = os.path.basename(zfr_item.filename)
-                if re.match('Formulas/Section\d+\.m', zfr_item.filename) and fname in mq_paths:
-                    zfw.writestr(zfr_item, open(mq_paths[fname]).read())
-                else:
-                    zfw.writestr(zfr_item, zfr.open(zfr_item).read())
+        with zipfile.ZipFile(_MemoryViewReader(self.package_parts)) as zfr, \
+                zipfile.ZipFile(updated_zip_buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zfw:
+            _write_package(zfr, zfw, {f"Formulas/{name}": self._formulas[name].encode("utf-8") for name in changed})
+
+        return updated_zip_buffer.getbuffer()
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the mashup, only the package parts section is rebuilt (and only if a formula changed)
+        """
+        pkg_parts = self._package_parts_bytes()
+        return b"".join([
+            self._buffer[:4], len(pkg_parts).to_bytes(4, byteorder="little"), pkg_parts,
+            *self._sections[1:], self._trailer
+        ])
 
-        # Update zip buffer contents to dict we have saved so far
-        updated_zip_buffer.seek(0)
-        byte_dict['pkg_parts'] = updated_zip_buffer.read()
-        byte_dict['pkg_parts_len'] = len(byte_dict['pkg_parts']).to_bytes(4, byteorder='little')
-        updated_zip_buffer.close()
+def _extract_excel_datamashup(datamashup_byte: bytes, output_extract_path: str) -> int:
+    """
+    Given a datamashup from excel containing M queries, extracts the M query portion to extract path specified.
+    Note that the datamashup is by itself an zip file.
 
-        # Write out the revised datamashup file (in correct order, from ordered list)
-        new_mashup_buffer = io.BytesIO()
-        for b in ['version', 'pkg_parts_len', 'pkg_parts', 'perm_len', 'perm_var', 'meta_len', 'meta_var', 'perm_bind_len', 'perm_bind_var']:
-            new_mashup_buffer.write(byte_dict[b])
+    https://community.fabric.microsoft.com/t5/Desktop/Change-pbix-data-source-programmatically/m-p/422128
+    """
+    formulas = DataMashup(datamashup_byte).formulas
+    os.makedirs(output_extract_path, exist_ok=True)
+    for name, formula in formulas.items():
+        with open(os.path.join(output_extract_path, name), "wb") as f:
+            f.write(formula.encode("utf-8"))
 
-        # We would be returning this updated mashup to overwrite the existing mashup content
-        new_mashup_buffer.seek(0)
-        new_mashup = new_mashup_buffer.read()
-        new_mashup_buffer.close()
-        return new_mashup
+    return len(formulas)
 
-def modify_ppt_links(ppt_path: str, search_str: str, replace_with: str, overwrite: bool = False) -> None:
+def _read_mquery_files(mquery_paths: list[str] | Mapping[str, str]) -> dict[str, str]:
     """
-    Helper function to modify PPT links to embedded excel objects.
+    Contents of the '.m' files, keyed by file name. Each file is read once, a mapping of file names to
+    contents is taken as is.
+    """
+    if isinstance(mquery_paths, Mapping):
+        return dict(mquery_paths)
 
-    Please note that `replace_with` must be an absolute path only.
-    If `replace_with` is not provided, the links are "broken".
+    mquery_sources = {}
+    for mquery_path in mquery_paths:
+        with open(mquery_path, encoding="utf-8", newline="") as f:
+            mquery_sources[os.path.basename(mquery_path)] = f.read()
+    return mquery_sources
+
+def _update_excel_datamashup(datamashup_byte: bytes, mquery_sources: dict[str, str]) -> bytes | None:
     """
+    This function is used by the update M Query function.
+    `mquery_sources` provided contains the '.m' file contents to replace with, keyed by file name.
 
-    # Create backup file before proceeding
-    if not overwrite:
-        backup_path = _create_file_backup(ppt_path)
-
-    # Create a temp directory to store our intermediate stuff
-    with tempfile.TemporaryDirectory() as tmpdir:
-        zfw = zipfile.ZipFile(f"{tmpdir}/temp.pptx", "w", compression=zipfile.ZIP_DEFLATED)
-        with zipfile.ZipFile(ppt_path) as zfr:
-            for ITEM in zfr.infolist():
-                if ITEM.filename.startswith("ppt/"):
-                    zfr.extract(ITEM.filename, tmpdir)
-                else:
-                    zfw.writestr(ITEM, zfr.open(ITEM).read(), compress_type=zipfile.ZIP_DEFLATED)
+    Returns None if every section already matches the provided source.
 
-        # Replace all spaces with '%20' in the search and replace strings
-        REL_FILES = glob.glob(f"{tmpdir}/ppt/**/_rels/*.rels")
-        search_str = "file:///" + search_str.replace(" ", "%20").replace("/", "\\")
-        replace_with = "file:///" + replace_with.replace(" ", "%20").replace("/", "\\")
-        _search_and_replace(search_str, replace_with, REL_FILES)
+    https://community.fabric.microsoft.com/t5/Desktop/Change-pbix-data-source-programmatically/m-p/422128
+    """
+    mashup = DataMashup(datamashup_byte)
+    for name in mashup.formulas:
+        if name in mquery_sources:
+            mashup.formulas[name] = mquery_sources[name]
+
+    if not mashup.changed_formulas():
+        return None
+    return mashup.to_bytes()
+
+@_instrumented
+def modify_ppt_links(
+        ppt_path: str | bytes | BinaryIO, search_str: str | Mapping[str, str], replace_with: str = "",
+        overwrite: bool = False, output: str | BinaryIO | None = None
+    ) -> int | dict[str, int]:
+    """
+    Helper function to modify PPT links to embedded excel objects.
 
-        # Add the PPT folder we have updated to the archive
-        for FILE_NAME in glob.glob(f"{tmpdir}\\ppt\\**", recursive=True):
-            if os.path.isfile(FILE_NAME):
-                FNP = FILE_NAME.split("\\")
-                ZFNP = os.path.join(*FNP[FNP.index("ppt"):])
-                zfw.write(FILE_NAME, ZFNP, compress_type=zipfile.ZIP_DEFLATED)
+    Please note that `replace_with` must be an absolute path only.
+    If `replace_with` is not provided, the links are "broken".
 
-        # Close to save it
-        zfw.close()
+    `search_str` can also be a mapping of old paths to new paths (see `read_link_mapping` to load one from a CSV),
+    all of them are replaced in a single pass over each relationship part:
+    ```
+    modify_ppt_links(ppt_path, read_link_mapping("share_migration.csv"))
+    ```
 
-        # Replace the existing PPT
-        shutil.move(f"{tmpdir}/temp.pptx", ppt_path)
+    `ppt_path` can also be the PPT as bytes or a binary file object, in which case the result is written to
+    `output` (a path or a binary file object). When `output` is given the input is left as is.
 
-def toggle_update_links_popup(ppt_path: str, auto_update: bool = False, overwrite: bool = False) -> None:
+    Returns the number of links replaced, or the number of links replaced per mapping entry for a mapping.
+    """
+
+    # Create backup file before proceeding
+    if not overwrite and output is None and isinstance(ppt_path, str):
+        _create_file_backup(ppt_path)
+
+    # Rewrite only the relationship parts that have a match, rest of the archive is copied as is
+    transforms = _link_transforms(search_str, replace_with)
+    counts = _rewrite_zip(ppt_path, transforms, output)
+    if isinstance(search_str, Mapping):
+        return transforms[0][1].hits
+    return counts[0]
+
+@_instrumented
+def toggle_update_links_popup(
+        ppt_path: str | bytes | BinaryIO, auto_update: bool = False, overwrite: bool = False,
+        output: str | BinaryIO | None = None
+    ) -> int:
     """
     Helper function to toggle PPT links update popup
 
     If `auto_update` is set to True, PPT is set to automatic update and the popup comes up whenever PPT is opened.
     If `auto_update` is set to False, PPT is set to manual update and the popup is no longer visible.
+
+    Takes bytes or a binary file object and an `output` as well, see `modify_ppt_links`.
+
+    Returns the number of charts and tables toggled.
     """
 
     # Create a backup before proceeding
-    if not overwrite:
-        backup_path = _create_file_backup(ppt_path)
-
-    # Create a temp directory to store our intermediate stuff
-    with tempfile.TemporaryDirectory() as tmpdir:
-        zfw = zipfile.ZipFile(f"{tmpdir}/temp.pptx", "w", compression=zipfile.ZIP_DEFLATED)
-        with zipfile.ZipFile(ppt_path) as zfr:
-            for ITEM in zfr.infolist():
-                if ITEM.filename.startswith("ppt/"):
-                    zfr.extract(ITEM.filename, tmpdir)
-                else:
-                    zfw.writestr(ITEM, zfr.open(ITEM).read(), compress_type=zipfile.ZIP_DEFLATED)
+    if not overwrite and output is None and isinstance(ppt_path, str):
+        _create_file_backup(ppt_path)
 
-        # Search and replace string - CHARTS
-        XML_FILES = glob.glob(f"{tmpdir}/ppt/charts/*.xml")
-        search_str = f'<c:autoUpdate val="{int(not auto_update)}"/>'
-        replace_with = f'<c:autoUpdate val="{int(auto_update)}"/>'
-        _search_and_replace(search_str, replace_with, XML_FILES)
+    # Rewrite only the chart and slide parts, rest of the archive is copied as is
+    counts = _rewrite_zip(ppt_path, _popup_transforms(auto_update), output)
+    return sum(counts)
 
-        # Search and replace string - TABLES
-        XML_FILES = glob.glob(f"{tmpdir}/ppt/slides/*.xml")
-        search_str = '<p:link' + (' updateAutomatic="1"' if not auto_update else '') + '/>'
-        replace_with = '<p:link' + (' updateAutomatic="1"' if auto_update else '') + '/>'
-        _search_and_replace(search_str, replace_with, XML_FILES)
+class OfficeBackend(abc.ABC):
+    """
+    A single Office application instance, driven by an `OfficeWorkerPool` worker thread.
 
-        # Add the PPT folder we have updated to the archive
-        for FILE_NAME in glob.glob(f"{tmpdir}\\ppt\\**", recursive=True):
-            if os.path.isfile(FILE_NAME):
-                FNP = FILE_NAME.split("\\")
-                ZFNP = os.path.join(*FNP[FNP.index("ppt"):])
-                zfw.write(FILE_NAME, ZFNP, compress_type=zipfile.ZIP_DEFLATED)
+    `start`, `stop` and the jobs all run on the worker thread owning the instance (COM objects are bound to the
+    thread that created them). `kill` is called from the timeout watchdog thread and must unblock a job stuck on
+    the instance, by default the application process (`pid`) is terminated.
+    """
+    app = None
+    pid: int | None = None
+
+    @abc.abstractmethod
+    def start(self) -> None:
+        """
+        Launches the application, sets `app` (passed to the jobs) and `pid`
+        """
+
+    @abc.abstractmethod
+    def stop(self) -> None:
+        """
+        Quits the application
+        """
+
+    def kill(self) -> None:
+        if self.pid:
+            os.kill(self.pid, signal.SIGTERM)
+
+class ExcelBackend(OfficeBackend):
+    """
+    Excel instance via xlwings, jobs get the `xw.App`
+    """
 
-        # Close to save it
-        zfw.close()
+    def __init__(self, visible: bool = False) -> None:
+        self.visible = visible
 
-        # Replace the existing PPT
-        shutil.move(f"{tmpdir}/temp.pptx", ppt_path)
+    def start(self) -> None:
+        xw = _backend("xlwings", "ExcelBackend")
+        _backend("pythoncom", "ExcelBackend").CoInitialize()
+        self.app = xw.App(visible=self.visible, add_book=False)
+        self.pid = self.app.pid
 
-def refresh_excel_external_connections(excel_path: str, debug: bool = False):
+    def stop(self) -> None:
+        pythoncom = _backend("pythoncom", "ExcelBackend")
+        try:
+            self.app.quit()
+        finally:
+            pythoncom.CoUninitialize()
+
+class PowerPointBackend(OfficeBackend):
     """
-    Uses xlwings to open an execl instance, refresh and close the excel file post update.
+    PowerPoint instance via pywin32, jobs get the `PowerPoint.Application` dispatch.
+
+    PowerPoint is a single instance application, every dispatch attaches to the same process, so pools of
+    PowerPoint workers should be of size 1.
+    """
+
+    def start(self) -> None:
+        win32com_client = _backend("win32com.client", "PowerPointBackend")
+        _backend("pythoncom", "PowerPointBackend").CoInitialize()
+        self.app = win32com_client.DispatchEx("PowerPoint.Application")
+        self.pid = _backend("win32process", "PowerPointBackend").GetWindowThreadProcessId(self.app.HWND)[1]
+
+    def stop(self) -> None:
+        pythoncom = _backend("pythoncom", "PowerPointBackend")
+        try:
+            self.app.Quit()
+        finally:
+            pythoncom.CoUninitialize()
+
+class FakeOfficeBackend(OfficeBackend):
+    """
+    In process stand-in for an Office application, to exercise `OfficeWorkerPool` scheduling, recycling and
+    timeouts without Office. The backend is its own `app`: jobs can call `work(seconds)` to simulate a long
+    running call, which raises once the instance is killed, just like a COM call on a terminated process.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, startup_seconds: float = 0.0) -> None:
+        self.startup_seconds = startup_seconds
+        self.instance_id = 0
+        self.jobs_run = 0
+        self.running = False
+        self._killed = threading.Event()
+
+    def start(self) -> None:
+        time.sleep(self.startup_seconds)
+        self.instance_id = next(self._ids)
+        self.running = True
+        self.app = self
+
+    def stop(self) -> None:
+        self.running = False
+
+    def kill(self) -> None:
+        self.running = False
+        self._killed.set()
+
+    def work(self, seconds: float = 0.0) -> int:
+        if self._killed.wait(seconds):
+            raise RuntimeError(f"instance {self.instance_id} was killed")
+        self.jobs_run += 1
+        return self.instance_id
+
+class OfficeWorkerPool:
     """
-    with xw.App(visible=debug, add_book=False) as app:
-        # Open the workbook
+    Keeps `size` Office instances warm and runs queued jobs on them, one job per instance at a time.
+
+    ```
+    with OfficeWorkerPool(ExcelBackend, size=2, max_jobs_per_instance=20, job_timeout=600) as pool:
+        for excel_path in excel_paths:
+            refresh_excel_external_connections(excel_path, pool=pool)
+    ```
+
+    `backend_factory` returns a new (not started) `OfficeBackend`. A job is a callable taking the application as
+    its first argument, `submit` returns a `concurrent.futures.Future` for it. Instances are started ahead of the
+    jobs and recycled (stopped and replaced right away, so the next job finds a warm instance) after
+    `max_jobs_per_instance` jobs or after a job raises. A job running longer than `job_timeout` seconds fails with
+    a TimeoutError, its instance is killed and the worker replaced. If an instance fails to start ahead of time,
+    the start is retried when the next job arrives and that job fails with the error.
+    """
+
+    def __init__(
+            self, backend_factory: Callable[[], OfficeBackend], size: int = 1, *,
+            max_jobs_per_instance: int = 50, job_timeout: float | None = None
+        ) -> None:
+        self.backend_factory = backend_factory
+        self.size = size
+        self.max_jobs_per_instance = max_jobs_per_instance
+        self.job_timeout = job_timeout
+        self._jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._workers: set[threading.Thread] = set()
+        self._closed = False
+        for _ in range(size):
+            self._spawn_worker()
+
+    def __enter__(self) -> "OfficeWorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def submit(self, job: Callable[..., object], *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Queues `job(app, *args, **kwargs)` to run on the next free instance
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot submit to a closed pool")
+            self._jobs.put((future, job, args, kwargs))
+        return future
+
+    def run(self, job: Callable[..., object], *args, **kwargs) -> object:
+        """
+        `submit` and wait for the result
+        """
+        return self.submit(job, *args, **kwargs).result()
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stops accepting jobs, lets the queued ones finish and shuts the instances down
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for _ in self._workers:
+                self._jobs.put(None)
+
+        # Workers drop out of the set as they exit, abandoned (timed out) ones are not waited on
+        while wait:
+            with self._lock:
+                worker = next(iter(self._workers), None)
+            if worker is None:
+                break
+            worker.join(0.1)
+
+    def _spawn_worker(self) -> None:
+        worker = threading.Thread(target=self._work, name="OfficeWorker", daemon=True)
+        self._workers.add(worker)
+        worker.start()
+
+    def _retire_worker(self, worker: threading.Thread) -> None:
+        """
+        Replaces a worker abandoned after a timeout with a fresh one. The replacement takes over the
+        shutdown sentinel of the abandoned worker if the pool is closing.
+        """
+        with self._lock:
+            self._workers.discard(worker)
+            self._spawn_worker()
+
+    def _work(self) -> None:
+        backend, jobs_done = None, 0
+        try:
+            while True:
+                # Warm up the (replacement) instance before waiting for a job
+                if backend is None and not self._closed:
+                    with contextlib.suppress(Exception):
+                        backend, jobs_done = self._start_backend(), 0
+
+                item = self._jobs.get()
+                if item is None:
+                    return
+                future, job, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                if backend is None:
+                    try:
+                        backend, jobs_done = self._start_backend(), 0
+                    except BaseException as e:
+                        future.set_exception(e)
+                        continue
+
+                failed, timed_out = self._run_job(backend, future, job, args, kwargs)
+                jobs_done += 1
+                if timed_out:
+                    # Instance was killed and this worker replaced by the watchdog, which also set the TimeoutError
+                    backend = None
+                    return
+                if failed or jobs_done >= self.max_jobs_per_instance:
+                    self._stop_backend(backend)
+                    backend = None
+        finally:
+            if backend is not None:
+                self._stop_backend(backend)
+            with self._lock:
+                self._workers.discard(threading.current_thread())
+
+    def _start_backend(self) -> OfficeBackend:
+        backend = None
+        try:
+            with _span("com_start"):
+                backend = self.backend_factory()
+                backend.start()
+        except BaseException:
+            if backend is not None:
+                with contextlib.suppress(Exception):
+                    backend.kill()
+            raise
+        return backend
+
+    def _run_job(self, backend: OfficeBackend, future: concurrent.futures.Future, job, args, kwargs) -> tuple[bool, bool]:
+        """
+        Runs the job under the timeout watchdog. Returns whether it failed and whether it timed out.
+        """
+        state = {"done": False, "timed_out": False}
+        state_lock = threading.Lock()
+        worker = threading.current_thread()
+
+        def on_timeout() -> None:
+            with state_lock:
+                if state["done"]:
+                    return
+                state["timed_out"] = True
+            future.set_exception(TimeoutError(f"job didn't complete within {self.job_timeout} seconds"))
+            try:
+                backend.kill()
+            finally:
+                # The stuck worker is replaced right away, it exits on its own if the job ever returns
+                self._retire_worker(worker)
+
+        watchdog = None
+        if self.job_timeout is not None:
+            watchdog = threading.Timer(self.job_timeout, on_timeout)
+            watchdog.daemon = True
+            watchdog.start()
+
+        result, error = None, None
+        try:
+            with _span("com_job"):
+                result = job(backend.app, *args, **kwargs)
+        except BaseException as e:
+            error = e
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+
+        with state_lock:
+            state["done"] = True
+            if state["timed_out"]:
+                return True, True
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+        return error is not None, False
+
+    def _stop_backend(self, backend: OfficeBackend) -> None:
+        try:
+            with _span("com_quit"):
+                backend.stop()
+        except Exception:
+            with contextlib.suppress(Exception):
+                backend.kill()
+
+def _refresh_workbook(app: xw.App, excel_path: str) -> None:
+    """
+    Pool job behind `refresh_excel_external_connections`
+    """
+    # Open the workbook
+    with _span("com_open", path=excel_path):
         wb = app.books.open(excel_path)
 
-        # Refresh all external data connections and wait until completed
+    # Refresh all external data connections and wait until completed
+    with _span("com_refresh", path=excel_path):
         wb.api.RefreshAll()
         app.api.CalculateUntilAsyncQueriesDone()
 
-        # Save the close the worksheet
+    # Save the close the worksheet
+    with _span("com_save", path=excel_path):
         wb.save()
         wb.close()
 
-def refresh_linked_plots_in_ppt(ppt_path: str, debug: bool = False):
+@_instrumented
+def refresh_excel_external_connections(excel_path: str, debug: bool = False, pool: OfficeWorkerPool | None = None):
     """
-    Same as refreshing excel's external data connections, snippet refreshes the PPT plots linked via excel.
-    Setting debug as True helps to see what goes wrong during the update.
+    Uses xlwings to open an execl instance, refresh and close the excel file post update.
+
+    If a `pool` of `ExcelBackend` workers is provided, the refresh runs on one of its warm instances
+    rather than starting (and quitting) Excel for this file alone.
     """
+    if pool is not None:
+        return pool.run(_refresh_workbook, excel_path)
 
-    # Open powerpoint
-    PPTApp = win32com.client.Dispatch("PowerPoint.Application")
-    PPTPresentation = PPTApp.Presentations.Open(ppt_path, WithWindow=debug)
+    xw = _backend("xlwings", "refresh_excel_external_connections")
+    with _span("com_start", path=excel_path):
+        app = xw.App(visible=debug, add_book=False)
+    with app:
+        _refresh_workbook(app, excel_path)
+
+def _update_presentation_links(app, ppt_path: str, debug: bool = False) -> None:
+    """
+    Pool job behind `refresh_linked_plots_in_ppt`
+    """
+    with _span("com_open", path=ppt_path):
+        PPTPresentation = app.Presentations.Open(ppt_path, WithWindow=debug)
 
     # Click on update links button
-    PPTPresentation.UpdateLinks()
+    with _span("com_refresh", path=ppt_path):
+        PPTPresentation.UpdateLinks()
 
     # Save and close the PPT
-    PPTPresentation.Save()
-    PPTPresentation.Close()
+    with _span("com_save", path=ppt_path):
+        PPTPresentation.Save()
+        PPTPresentation.Close()
+
+@_instrumented
+def refresh_linked_plots_in_ppt(ppt_path: str, debug: bool = False, pool: OfficeWorkerPool | None = None):
+    """
+    Same as refreshing excel's external data connections, snippet refreshes the PPT plots linked via excel.
+    Setting debug as True helps to see what goes wrong during the update.
+
+    If a `pool` of `PowerPointBackend` workers is provided, the PPT is refreshed on its warm instance
+    rather than dispatching (and quitting) PowerPoint for this file alone.
+    """
+    if pool is not None:
+        return pool.run(_update_presentation_links, ppt_path, debug)
+
+    # Open powerpoint
+    win32com_client = _backend("win32com.client", "refresh_linked_plots_in_ppt")
+    with _span("com_start", path=ppt_path):
+        PPTApp = win32com_client.Dispatch("PowerPoint.Application")
+
+    _update_presentation_links(PPTApp, ppt_path, debug)
 
     # Close the PPT Application
-    PPTApp.Quit()
+    with _span("com_quit", path=ppt_path):
+        PPTApp.Quit()
 
-def extract_mqueries(excel_path: str, output_path: str) -> int:
+@_instrumented
+def extract_mqueries(excel_path: str | bytes | BinaryIO, output_path: str) -> int:
     """
     Given an input excel, extracts the mqueries contained within, to the output
-    path provided.
+    path provided. The excel can also be passed as bytes or a binary file object,
+    to get the mqueries without writing them out see `read_mqueries`.
     """
     count = 0
-    with zipfile.ZipFile(excel_path) as zfe:
-        for excel_item in zfe.infolist():
-            if re.match("customXml\/item\d+\.xml", excel_item.filename):
-                tree = lxml.etree.fromstring(zfe.read(excel_item.filename))
-                data_mashup_decoded = base64.b64decode(str(tree.text))
-                count += _extract_excel_datamashup(data_mashup_decoded, output_path)
+    with PackageReader(excel_path) as zfe:
+        for part_name in zfe.part_names("custom_xml"):
+            tree = _parse_xml(zfe.read(part_name))
+            data_mashup_decoded = base64.b64decode(str(tree.text))
+            count += _extract_excel_datamashup(data_mashup_decoded, output_path)
 
     return count
 
-def update_mqueries(excel_path: str, mquery_paths: list[str], overwrite: bool = False) -> int:
+@_instrumented
+def read_mqueries(excel_path: str | bytes | BinaryIO) -> dict[str, str]:
+    """
+    M queries of an excel keyed by section file name (e.g. 'Section1.m'), the in memory counterpart of `extract_mqueries`
+    """
+    mqueries = {}
+    with PackageReader(excel_path) as zfe:
+        for part_name in zfe.part_names("custom_xml"):
+            tree = _parse_xml(zfe.read(part_name))
+            mqueries.update(DataMashup(base64.b64decode(str(tree.text))).formulas)
+
+    return mqueries
+
+@_instrumented
+def update_mqueries(
+        excel_path: str | bytes | BinaryIO | list[str], mquery_paths: list[str] | Mapping[str, str],
+        overwrite: bool = False, output: str | BinaryIO | None = None
+    ) -> int | dict[str, int]:
     """
     Given an input excel, list of mquery files ('*.m' filepaths), the function
     updates the excel's datamashup contained within the path `customXml/item*.xml`
+
+    The '.m' files are read once and compared with the embedded sections first, a workbook whose sections
+    all match is left untouched (no backup, no rewrite). `excel_path` can also be a list of workbooks to
+    update with the same files.
+
+    `mquery_paths` can also be a mapping of '.m' file names to their contents. The excel can be passed as
+    bytes or a binary file object as well, the result is then written to `output` (a path or a binary file
+    object), which is written even if nothing changed.
+
+    Returns the number of datamashups updated, or that number per workbook for a list (0 if unchanged).
     """
-    # Create a backup of the file before proceeding
-    if not overwrite:
-        backup_path = _create_file_backup(excel_path)
-
-    # Convert Mquery FP to a dictionary to store our intermediate stuff
-    mquery_fp: dict[str, str] = {os.path.basename(fp_): fp_ for fp_ in mquery_paths}
-
-    # Create a temp directory to store our intermediate stuff
-    touch_count = 0
-    with tempfile.TemporaryDirectory() as tmpdir:
-        zfw = zipfile.ZipFile(os.path.join(tmpdir, "temp.xlsx"), "w", compression=zipfile.ZIP_DEFLATED)
-        with zipfile.ZipFile(excel_path) as zfr:
-            for ITEM in zfr.infolist():
-                if re.match("customXml\/item\d+\.xml", ITEM.filename):
-                    custom_xml = zfr.open(ITEM).read()
-                    tree = lxml.etree.fromstring(custom_xml)
-                    data_mashup_decoded = base64.b64decode(str(tree.text))
-                    data_mashup_updated = _update_excel_datamashup(data_mashup_decoded, mquery_fp)
-                    tree.text = base64.b64encode(data_mashup_updated).decode("utf-8")
-                    zfw.writestr(ITEM, lxml.etree.tostring(tree), compress_type=zipfile.ZIP_DEFLATED)
-                    touch_count += 1
-                else:
-                    zfw.writestr(ITEM, zfr.open(ITEM).read(), compress_type=zipfile.ZIP_DEFLATED)
+    mquery_sources = _read_mquery_files(mquery_paths)
+    if not isinstance(excel_path, (list, tuple)):
+        return _update_workbook_mqueries(excel_path, mquery_sources, overwrite, output)
+
+    assert output is None, "`output` is not supported for a list of workbooks"
+    return {path: _update_workbook_mqueries(path, mquery_sources, overwrite) for path in excel_path}
 
-        # Close to save it
-        zfw.close()
+def _update_workbook_mqueries(
+        excel_path: str | bytes | BinaryIO, mquery_sources: dict[str, str], overwrite: bool,
+        output: str | BinaryIO | None = None
+    ) -> int:
+    """
+    `update_mqueries` for a single workbook
+    """
+    _check_output(excel_path, output)
+
+    # Work out the updated DataMashup parts before touching the file
+    updated_parts: dict[str, bytes] = {}
+    with PackageReader(excel_path) as zfr:
+        for part_name in zfr.part_names("custom_xml"):
+            with _span("replace", part=part_name):
+                custom_xml = zfr.read(part_name)
+                tree = _parse_xml(custom_xml)
+                data_mashup_decoded = base64.b64decode(str(tree.text))
+                data_mashup_updated = _update_excel_datamashup(data_mashup_decoded, mquery_sources)
+                if data_mashup_updated is None:
+                    continue
+                tree.text = base64.b64encode(data_mashup_updated).decode("utf-8")
+                updated_parts[part_name] = lxml.etree.tostring(tree)
 
-        # Replace the existing PPT
-        shutil.move(f"{tmpdir}/temp.xlsx", excel_path)
+        if not updated_parts and output is None:
+            return 0
 
-    return touch_count
+        # Only the DataMashup parts are rewritten, the rest of the archive is copied over raw (backed up first
+        # when replacing the file)
+        _save_package(zfr, excel_path, output, updated_parts, overwrite)
 
-def extract_ppt(ppt_path: str, extract_path: str = "") -> int:
+    return len(updated_parts)
+
+@_instrumented
+def extract_ppt(ppt_path: str | bytes | BinaryIO, extract_path: str = "") -> int:
     """
     Extract PPT as a zip to path. If `extract_path` is not provided, creates a 'tmp'
     folder in the same directory as `ppt_path` and extracts there.
+
+    The PPT can also be bytes or a binary file object, `extract_path` is required then.
     """
 
     if not extract_path:
+        assert isinstance(ppt_path, str), "`extract_path` is required when the PPT is bytes or a file object"
         extract_path = os.path.join(os.path.dirname(ppt_path), "tmp")
 
     files_extracted = 0
-    with zipfile.ZipFile(ppt_path) as zfr:
+    with _span("unzip", path=_source_name(ppt_path)) as span, PackageReader(ppt_path) as zfr:
         for ITEM in zfr.infolist():
             files_extracted += 1
             zfr.extract(ITEM.filename, extract_path)
+            span.add(parts_read=1, bytes_read=ITEM.file_size)
 
     return files_extracted
 
-def rezip_ppt(extract_path: str, ppt_path: str) -> None:
+@_instrumented
+def rezip_ppt(extract_path: str, ppt_path: str | BinaryIO) -> None:
     """
     Given a path containing the unzipped PPT contents, zips and generates a PPT
+
+    `ppt_path` is written atomically, it can also be a binary file object.
     """
-    with zipfile.ZipFile(ppt_path, "w", compression=zipfile.ZIP_DEFLATED) as zfw:
-        for dirpath, dirnames, filenames in os.walk(extract_path):
-            relative_dirpath = os.path.relpath(dirpath, extract_path)
-            for filename in filenames:
-                zfw.write(os.path.join(dirpath, filename), os.path.join(relative_dirpath, filename), compress_type=zipfile.ZIP_DEFLATED)
+    # Parts in a deterministic order, '[Content_Types].xml' first as OPC readers expect
+    part_paths = {}
+    for dirpath, dirnames, filenames in os.walk(extract_path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            filepath = os.path.join(dirpath, filename)
+            part_paths[os.path.relpath(filepath, extract_path).replace(os.sep, "/")] = filepath
+
+    with _span("write", path=_source_name(ppt_path)) as span:
+        with _output_file(ppt_path) as fout, zipfile.ZipFile(fout, "w") as zfw, _ArchiveWriter(zfw) as writer:
+            for part_name in sorted(part_paths, key=lambda part_name: part_name != _CONTENT_TYPES_PART):
+                with open(part_paths[part_name], "rb") as f:
+                    contents = f.read()
+                writer.write(zipfile.ZipInfo.from_file(part_paths[part_name], part_name), contents)
+                span.add(parts_deflated=1, bytes_deflated=len(contents))
+        if isinstance(ppt_path, str):
+            span.add(bytes_written=os.path.getsize(ppt_path))
+
+def _replace_chart_caches(ppt_chart_xml: lxml.etree._Element, embed_chart_xml: lxml.etree._Element) -> int:
+    """
+    Replaces the numCache, strCache elements of the PPT chart with the ones from the embedded excel chart.
+
+    Caches are paired by the series reference (`c:f` formula) they belong to, through an index built over the
+    embedded chart in one pass. References missing from the embedded chart are left alone.
 
-def update_ppt_plot_cache(extract_path: str) -> int:
+    Returns the number of caches that actually changed.
+    """
+    def cache_of(formula: lxml.etree._Element) -> lxml.etree._Element | None:
+        return next((elm for elm in formula.itersiblings() if lxml.etree.QName(elm).localname.endswith("Cache")), None)
+
+    embed_caches = {}
+    for formula in embed_chart_xml.iterfind(".//c:f", _NS):
+        cache = cache_of(formula)
+        if cache is not None:
+            embed_caches.setdefault((formula.text or "").strip(), cache)
+
+    changed = 0
+    for formula in ppt_chart_xml.iterfind(".//c:f", _NS):
+        embed_cache = embed_caches.get((formula.text or "").strip())
+        if embed_cache is None:
+            continue
+
+        ppt_cache = cache_of(formula)
+        if ppt_cache is not None and lxml.etree.tostring(ppt_cache) == lxml.etree.tostring(embed_cache):
+            continue
+        if ppt_cache is not None:
+            formula.getparent().replace(ppt_cache, copy.deepcopy(embed_cache))
+        else:
+            formula.addnext(copy.deepcopy(embed_cache))
+        changed += 1
+
+    return changed
+
+class PlotCacheResult(NamedTuple):
+    updated: int
+    skipped: int
+
+def _file_fingerprint(path: str, previous: dict | None = None) -> dict:
+    """
+    Size, mtime and sha1 of a file. The sha1 of `previous` is reused without reading the file if size and mtime match.
+    """
+    stat = os.stat(path)
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+        return previous
+
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha1").hexdigest()
+
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest}
+
+@_instrumented
+def update_ppt_plot_cache(
+        extract_path: str | bytes | BinaryIO, manifest_path: str = "", force: bool = False,
+        overwrite: bool = False, output: str | BinaryIO | None = None
+    ) -> PlotCacheResult:
     """
     Given a PPT extract path containing embedded excel files that are out of sync
     with the numCache, strCache - overwrites the cache directly from embeded
     excel charts.
+
+    Runs are incremental, a manifest of the embedded excel and chart part digests is kept at `manifest_path`
+    (defaults to '<extract_path>.plotcache.json', outside the extract path so it doesn't get rezipped into the PPT).
+    Charts whose embedded excel and chart part haven't changed since the last run are skipped, set `force` to
+    sync every chart regardless. Charts whose caches already match are not rewritten.
+
+    `extract_path` can also be the PPT itself (a path, bytes or a binary file object), the charts are then synced
+    inside the package without extracting it. The PPT is rewritten in place (backed up unless `overwrite`) or
+    written to `output`, see `PPTSession`. There is no manifest in this mode, every chart is compared.
+
+    Returns the number of charts updated and skipped.
     """
-    update_count = 0
+    if not isinstance(extract_path, str) or os.path.isfile(extract_path):
+        session = PPTSession(extract_path, overwrite, output)
+        with session:
+            chart_count = len(session._zfr.part_names("chart"))
+            session.update_ppt_plot_cache()
+            updated_count = session.commit()[0]
+
+        return PlotCacheResult(updated_count, chart_count - updated_count)
+
+    if not manifest_path:
+        manifest_path = os.path.normpath(extract_path) + ".plotcache.json"
+
+    manifest = {}
+    if os.path.isfile(manifest_path) and not force:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    updated_count, skipped_count = 0, 0
+    new_manifest = {}
     chart_xml_path = os.path.join(extract_path, "ppt", "charts")
-    rel_xml_path = os.path.join(extract_path, "ppt", "charts", "_rels")
-    for filename in os.listdir(chart_xml_path):
+    for filename in sorted(os.listdir(chart_xml_path)):
         if filename.startswith("chart") and filename.endswith(".xml"):
-            update_count += 1
-            filepath = os.path.join(extract_path, "ppt", "charts", filename)
-            rel_filepath = os.path.join(extract_path, "ppt", "charts", "_rels", f"{filename}.rels")
+            filepath = os.path.join(chart_xml_path, filename)
+            rel_filepath = os.path.join(chart_xml_path, "_rels", f"{filename}.rels")
 
             # Get the embedded excel path from .rels file
             rel_filepath_xml = lxml.etree.parse(rel_filepath)
-            relationship_element = rel_filepath_xml.find("*[@Type='http://schemas.openxmlformats.org/officeDocument/2006/relationships/package']")
+            relationship_element = rel_filepath_xml.find(f"*[@Type='{_RT_PACKAGE}']")
             embed_excel_path = ""
             if relationship_element is not None:
-                embed_excel_path = os.path.normpath(os.path.join(extract_path, "ppt", str(relationship_element.attrib['Target'])[3:]))
+                embed_excel_path = os.path.join(extract_path, *_resolve_part_name(f"ppt/charts/{filename}", relationship_element.attrib["Target"]).split("/"))
             assert embed_excel_path, f"{embed_excel_path} doesn't exist for {filepath}"
 
+            # Skip if neither the source excel nor the chart changed since the last sync. The contents are compared,
+            # size and mtime only spare rehashing, so that files rewritten as is (e.g. extracted again) are skipped too
+            previous = manifest.get(filename, {})
+            workbook_fingerprint = _file_fingerprint(embed_excel_path, previous.get("workbook"))
+            chart_fingerprint = _file_fingerprint(filepath, previous.get("chart"))
+            if (
+                previous.get("workbook", {}).get("sha1") == workbook_fingerprint["sha1"]
+                and previous.get("chart", {}).get("sha1") == chart_fingerprint["sha1"]
+            ):
+                new_manifest[filename] = {"workbook": workbook_fingerprint, "chart": chart_fingerprint}
+                skipped_count += 1
+                continue
+
             # Read embed file chart xml and ppt xml side by side
             with zipfile.ZipFile(embed_excel_path, "r") as zfr:
-                embed_chart_xml = lxml.etree.fromstring(zfr.read("xl/charts/chart1.xml"))
-            ppt_chart_xml = lxml.etree.parse(filepath)
+                embed_chart_xml = _parse_xml(zfr.read("xl/charts/chart1.xml"))
+            with open(filepath, "rb") as f:
+                ppt_chart_xml = _parse_xml(f.read())
+
+            # Replace the cache in current file from the embed excel cache, overwrite only if anything changed
+            if _replace_chart_caches(ppt_chart_xml, embed_chart_xml):
+                with open(filepath, "wb") as f:
+                    f.write(_serialize_xml(ppt_chart_xml))
+                chart_fingerprint = _file_fingerprint(filepath)
+                updated_count += 1
+            else:
+                skipped_count += 1
 
-            # Replace the cache in current file from the embed excel cache
-            for ppt_cache, embed_cache in zip(
-                    ppt_chart_xml.xpath("//*[contains(local-name(), 'Cache')]"),
-                    embed_chart_xml.xpath("//*[contains(local-name(), 'Cache')]")
-                ):
-                ppt_cache.getparent().replace(ppt_cache, embed_cache)
+            new_manifest[filename] = {"workbook": workbook_fingerprint, "chart": chart_fingerprint}
 
-            # Overwrite the file changes
-            ppt_chart_xml.write(filepath)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(new_manifest, f, indent=1)
 
-    return update_count
+    return PlotCacheResult(updated_count, skipped_count)
 
+@_instrumented
 def update_embedded_excel(
         excel_instance: xw.App, embed_file_path: str, data_df: pd.DataFrame, *,
         sheet_name: str = 'data', fill_range: str = 'A1', file_sensitivity_id: str = '',
@@ -402,7 +2176,8 @@ def update_embedded_excel(
     in real time (cannot do with pandas or openpyxl)
     """
     # Open the excel file
-    wb = excel_instance.books.open(embed_file_path)
+    with _span("com_open", path=embed_file_path):
+        wb = excel_instance.books.open(embed_file_path)
 
     # Add label before saving (optional)
     if file_sensitivity_id:
@@ -413,14 +2188,17 @@ def update_embedded_excel(
         wb.api.SensitibityLabel.SetLabel(labelinfo, labelinfo)
 
     # Write the data to sheet 'data', starting from 1st cell
-    wb.sheets[sheet_name].range(fill_range).options(index=False).value = data_df
-    wb.save()
-    wb.close()
+    with _span("com_write", path=embed_file_path):
+        wb.sheets[sheet_name].range(fill_range).options(index=False).value = data_df
+    with _span("com_save", path=embed_file_path):
+        wb.save()
+        wb.close()
 
+@_instrumented
 def update_ppt_table(
-        ppt_path: str, table_df: pd.DataFrame, *,
+        ppt_path: str | bytes | BinaryIO, table_df: pd.DataFrame, *,
         slide_id: int, shape_id: int, start_coord: tuple[int, int],
-        strides: tuple[int, int] = (1, 1), include_df_header: bool = True
+        strides: tuple[int, int] = (1, 1), include_df_header: bool = True, output: str | BinaryIO | None = None
     ) -> None:
     """
     Starts writing to the PPT table from start_coord provided.
@@ -438,42 +2216,1329 @@ def update_ppt_table(
     Stride is useful when the cells we are filling in spans across multiple rows / columns.
     Only useful when the stride is fixed for a specific range that we are trying to fill.
     For variable srides, it is better to manually use pptx to fill the table.
-    """
 
-    # Read the PPT file
-    prs = pptx.Presentation(ppt_path)
+    To fill several tables in one go, use `update_ppt_tables`. For bytes / file object input and `output`, see `PPTSession`.
+    """
+    update_ppt_tables(ppt_path, [{
+        "table_df": table_df, "slide_id": slide_id, "shape_id": shape_id, "start_coord": start_coord,
+        "strides": strides, "include_df_header": include_df_header
+    }], output=output)
+
+@_instrumented
+def update_ppt_tables(
+        ppt_path: str | bytes | BinaryIO, tables: list[dict], overwrite: bool = True, output: str | BinaryIO | None = None
+    ) -> int:
+    """
+    Bulk version of `update_ppt_table`, fills several tables (across slides) with a single write of the PPT.
 
-    # Write to PPT Table
-    table = prs.slides[slide_id].shapes[shape_id].table
-    i_start, j_start = start_coord
+    Each item of `tables` holds the keyword arguments of `update_ppt_table`, i.e.
+    ```
+    {"table_df": df, "slide_id": 1, "shape_id": 4, "start_coord": (1, 0), "strides": (1, 1), "include_df_header": True}
+    ```
 
-    for i in range(table_df.shape[0] + (1 if include_df_header else 0)):
-        for j in range(table_df.shape[1]):
-            # Replace to make sure formatting is unaffected
-            if include_df_header:
-                replace = table_df.iloc[i - 1, j] if i > 0 else table_df.columns[j]
-            else:
-                replace = table_df.iloc[i, j]
+    Coordinates are validated for all the tables before anything is written, every coordinate landing on a
+    spanned (hidden) cell or outside a table is reported in one go.
 
-            # Translate pandsa cell coord to PPT table cell coord
-            ppt_cell_coord: tuple[int, int] = (i_start + (i * strides[0]), j_start + (j * strides[1]))
-            assert not table.cell(*ppt_cell_coord).is_spanned, "tried to fill a hidden cell, please check `strides` and `start_coord` values provided."
+    For bytes / file object input and `output`, see `PPTSession`.
 
-            # Replace run text
-            table.cell(*ppt_cell_coord).text_frame.paragraphs[0].runs[0].text = replace
+    Returns the number of cells filled.
+    """
+    session = PPTSession(ppt_path, overwrite, output)
+    with session:
+        session.update_ppt_tables(tables)
+        counts = session.commit()
 
-    # Save PPT, overwrite existing
-    prs.save(ppt_path)
+    return counts[0]
 
-def update_ppt_textboxes(ppt_path: str, textboxes: list[tuple[int, int, int, int, str]]) -> None:
+@_instrumented
+def update_ppt_textboxes(
+        ppt_path: str | bytes | BinaryIO, textboxes: list[tuple[int, int, int, int, str]],
+        output: str | BinaryIO | None = None
+    ) -> None:
     """
     Given a tuple of slide_ids, shape_ids, paragraph_ids, run_ids and text_content:
         Updates the text of these textboxes
 
     Some trial and error is required to figure out the correct_ids pointing to the text content
     we desire to update.
+
+    The PPT can also be bytes or a (seekable) binary file object, written to `output` then. The PPT is
+    replaced atomically when written back to its path.
     """
-    prs = pptx.Presentation(ppt_path)
+    _check_output(ppt_path, output)
+    pptx = _backend("pptx", "update_ppt_textboxes")
+    prs = pptx.Presentation(io.BytesIO(ppt_path) if isinstance(ppt_path, (bytes, bytearray, memoryview)) else ppt_path)
     for slide_id, shape_id, para_id, run_id, text in textboxes:
         prs.slides[slide_id].shapes[shape_id].text_frame.paragraphs[para_id].runs[run_id].text = text
-    prs.save(ppt_path)
+    with _output_file(ppt_path if output is None else output) as f:
+        prs.save(f)
+
+def _rels_part_name(part_name: str) -> str:
+    """
+    Name of the relationships part belonging to `part_name`, e.g. 'ppt/slides/slide1.xml' -> 'ppt/slides/_rels/slide1.xml.rels'
+    """
+    return posixpath.join(posixpath.dirname(part_name), "_rels", f"{posixpath.basename(part_name)}.rels")
+
+def _resolve_part_name(part_name: str, target: str) -> str:
+    """
+    Resolves a relationship target relative to the part it belongs to, e.g.
+    ('ppt/charts/chart1.xml', '../embeddings/Microsoft_Excel_Worksheet.xlsx') -> 'ppt/embeddings/Microsoft_Excel_Worksheet.xlsx'
+    """
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part_name), target))
+
+def _parse_xml(contents: bytes) -> lxml.etree._Element:
+    """
+    `lxml.etree.fromstring`, the parse time and bytes parsed are added to the current span.
+    """
+    if _SINK is None:
+        return lxml.etree.fromstring(contents)
+
+    start = time.perf_counter()
+    tree = lxml.etree.fromstring(contents)
+    _count(parts_parsed=1, bytes_parsed=len(contents), parse_seconds=time.perf_counter() - start)
+    return tree
+
+def _serialize_xml(tree: lxml.etree._Element) -> bytes:
+    """
+    Serializes an OOXML part the way Office writes them out.
+    """
+    if _SINK is None:
+        return lxml.etree.tostring(tree, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+    start = time.perf_counter()
+    contents = lxml.etree.tostring(tree, xml_declaration=True, encoding="UTF-8", standalone=True)
+    _count(parts_serialized=1, serialize_seconds=time.perf_counter() - start)
+    return contents
+
+def _slide_shape_elements(slide_xml: lxml.etree._Element) -> list[lxml.etree._Element]:
+    """
+    Shape elements of a slide in the same order as `pptx.Presentation(...).slides[i].shapes`
+    """
+    shape_tags = {f"{{{_NS['p']}}}{tag}" for tag in ("sp", "grpSp", "graphicFrame", "cxnSp", "pic", "contentPart")}
+    sp_tree = slide_xml.find("p:cSld/p:spTree", _NS)
+    return [elm for elm in sp_tree.iterchildren() if elm.tag in shape_tags]
+
+def _run_text_element(paragraphs: list[lxml.etree._Element], para_id: int, run_id: int) -> lxml.etree._Element:
+    """
+    Returns the `a:t` element holding the text for the given paragraph, run ids. Like python-pptx, only `a:r`
+    elements count as runs.
+    """
+    run = paragraphs[para_id].findall("a:r", _NS)[run_id]
+    text = run.find("a:t", _NS)
+    if text is None:
+        text = lxml.etree.SubElement(run, f"{{{_NS['a']}}}t")
+    return text
+
+def _plan_table_fill(
+        tbl: lxml.etree._Element, table_df: pd.DataFrame, start_coord: tuple[int, int],
+        strides: tuple[int, int], include_df_header: bool
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Lays `table_df` out onto the `a:tbl` element. Returns the values to write as a 2-D array, the (row, col)
+    table cell each value goes to, and masks flagging the values that land on a spanned cell or outside of
+    the table.
+    """
+    np = _backend("numpy", "update_ppt_tables")
+    values = table_df.astype(object).to_numpy()
+    if include_df_header:
+        values = np.vstack([np.asarray(table_df.columns, dtype=object)[np.newaxis, :], values])
+
+    # Strided coordinate grid, shape (n_rows, n_cols, 2)
+    i_start, j_start = start_coord
+    row_idx = i_start + np.arange(values.shape[0]) * strides[0]
+    col_idx = j_start + np.arange(values.shape[1]) * strides[1]
+    cell_grid = np.stack(np.meshgrid(row_idx, col_idx, indexing="ij"), axis=-1)
+
+    # Spanned cell mask of the whole table, cells missing from ragged rows count as out of range
+    rows = [row.findall("a:tc", _NS) for row in tbl.iterfind("a:tr", _NS)]
+    n_cols = max((len(cells) for cells in rows), default=0)
+    table_spanned = np.zeros((len(rows), n_cols), dtype=bool)
+    table_exists = np.zeros((len(rows), n_cols), dtype=bool)
+    for i, cells in enumerate(rows):
+        table_exists[i, :len(cells)] = True
+        table_spanned[i, :len(cells)] = [cell.get("hMerge") in ("1", "true") or cell.get("vMerge") in ("1", "true") for cell in cells]
+
+    in_bounds = (cell_grid[..., 0] < len(rows)) & (cell_grid[..., 1] < n_cols) & (cell_grid[..., 0] >= 0) & (cell_grid[..., 1] >= 0)
+    safe_rows, safe_cols = np.where(in_bounds, cell_grid[..., 0], 0), np.where(in_bounds, cell_grid[..., 1], 0)
+    out_of_range = ~in_bounds | ~table_exists[safe_rows, safe_cols] if table_exists.size else ~in_bounds
+    spanned = ~out_of_range & table_spanned[safe_rows, safe_cols] if table_spanned.size else np.zeros_like(out_of_range)
+
+    return values, cell_grid, spanned, out_of_range
+
+def _column_index(column: str) -> int:
+    """
+    'A' -> 1, 'AB' -> 28
+    """
+    index = 0
+    for char in column:
+        index = index * 26 + ord(char) - ord("A") + 1
+    return index
+
+def _column_letter(index: int) -> str:
+    """
+    1 -> 'A', 28 -> 'AB'
+    """
+    column = ""
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        column = chr(ord("A") + rem) + column
+    return column
+
+def _parse_cell_range(formula: str) -> tuple[str, str, int, int, int, int] | None:
+    """
+    Parses a chart series reference such as `'My Sheet'!$A$2:$A$5` into
+    (sheet_prefix, sheet_name, first_row, first_col, last_row, last_col). Returns None for anything else.
+    """
+    match = re.fullmatch(r"((?:'((?:[^']|'')+)'|([^!']+))!)\$?([A-Z]+)\$?(\d+)(?::\$?([A-Z]+)\$?(\d+))?", formula.strip())
+    if match is None:
+        return None
+
+    prefix, quoted_name, name, col1, row1, col2, row2 = match.groups()
+    sheet_name = quoted_name.replace("''", "'") if quoted_name else name
+    return prefix, sheet_name, int(row1), _column_index(col1), int(row2 or row1), _column_index(col2 or col1)
+
+def _is_missing(value) -> bool:
+    # NaN and NaT are the only values not equal to themselves
+    return value is None or (isinstance(value, (float, dt.date)) and value != value)
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not _is_missing(value)
+
+# Day 0 of the 1900 date system, shifted by Excel's phantom 1900-02-29 (serials are exact from March 1900 on)
+_EXCEL_EPOCH = dt.datetime(1899, 12, 30)
+
+def _excel_serial(value: dt.date) -> int | float:
+    """
+    Excel serial number of a date / datetime (`pd.Timestamp` included), e.g. 2024-01-31 -> 45322,
+    2024-01-31 12:00 -> 45322.5. Timezones are dropped, the wall clock time is kept.
+    """
+    if not isinstance(value, dt.datetime):
+        return (value - _EXCEL_EPOCH.date()).days
+
+    delta = value.replace(tzinfo=None) - _EXCEL_EPOCH
+    serial = delta.days + (delta.seconds + delta.microseconds / 1e6) / 86400
+    return int(serial) if serial.is_integer() else serial
+
+def _numeric_value(value) -> int | float | None:
+    """
+    Number a cell value is stored / plotted as: numbers as is, dates and datetimes as Excel serials, bools as
+    1 / 0. None for text and missing values.
+    """
+    if _is_missing(value):
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, dt.date):
+        return _excel_serial(value)
+    return value if _is_number(value) else None
+
+def _text_value(value) -> str:
+    """
+    Text a cell value shows as in a string cache, e.g. for a date category
+    """
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, dt.datetime) and value.time() == dt.time(0):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, dt.date):
+        return value.isoformat(sep=" ") if isinstance(value, dt.datetime) else value.isoformat()
+    return _format_number(value) if _is_number(value) else str(value)
+
+def _format_number(value: int | float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+def _dataframe_grid(data_df: pd.DataFrame) -> list[list]:
+    """
+    DataFrame as it would be laid out on a sheet by `update_embedded_excel`, i.e. header row followed by values.
+    """
+    return [list(data_df.columns)] + data_df.astype(object).to_numpy().tolist()
+
+def _series_in_rows(chart_xml: lxml.etree._Element, sheet_name: str, origin: tuple[int, int]) -> bool:
+    """
+    Whether the series of the chart are laid out along the rows of the sheet rather than the columns (the
+    default), judging by where the series names sit: in the header row for columns, in the first column for
+    rows. Falls back to the shape of the multi cell ranges when the series have no name reference.
+    """
+    row0, col0 = origin
+    in_rows = in_columns = 0
+    for formula in chart_xml.iterfind(".//c:ser//c:f", _NS):
+        parsed = _parse_cell_range(formula.text or "")
+        if parsed is None or parsed[1] != sheet_name:
+            continue
+        _, _, r1, c1, r2, c2 = parsed
+        if formula.getparent().getparent().tag == f"{{{_NS['c']}}}tx":
+            in_columns += r1 == row0 and c1 > col0
+            in_rows += c1 == col0 and r1 > row0
+        elif (r1, c1) != (r2, c2):
+            in_columns += c1 == c2
+            in_rows += r1 == r2
+    return in_rows > in_columns
+
+def _update_chart_caches(
+        chart_xml: lxml.etree._Element, grid: list[list], sheet_name: str, origin: tuple[int, int]
+    ) -> int:
+    """
+    Regenerates `c:numCache` / `c:strCache` of every series reference pointing at `sheet_name` from `grid`,
+    `origin` being the (row, col) of the sheet cell `grid[0][0]` is written to.
+
+    Category and value ranges starting below (or right of, for series in rows) the header are resized to cover
+    all the rows (or columns) of `grid`, so that the point counts follow the DataFrame, down to a single cell
+    and back.
+
+    Returns the number of references updated.
+    """
+    row0, col0 = origin
+    last_row, last_col = row0 + len(grid) - 1, col0 + len(grid[0]) - 1
+    in_rows = _series_in_rows(chart_xml, sheet_name, origin)
+    count = 0
+    for ref in chart_xml.xpath(".//c:numRef | .//c:strRef", namespaces=_NS):
+        formula = ref.find("c:f", _NS)
+        parsed = _parse_cell_range(formula.text or "") if formula is not None else None
+        if parsed is None or parsed[1] != sheet_name:
+            continue
+
+        prefix, _, r1, c1, r2, c2 = parsed
+        if ref.getparent().tag != f"{{{_NS['c']}}}tx":
+            if not in_rows and c1 == c2 and r1 > row0:
+                r2 = last_row
+            elif in_rows and r1 == r2 and c1 > col0:
+                c2 = last_col
+        cells = [f"${_column_letter(c1)}${r1}"] + ([f"${_column_letter(c2)}${r2}"] if (r1, c1) != (r2, c2) else [])
+        formula.text = prefix + ":".join(cells)
+
+        # Values in the range, row major
+        values = []
+        for r in range(r1, r2 + 1):
+            for c in range(c1, c2 + 1):
+                i, j = r - row0, c - col0
+                values.append(grid[i][j] if 0 <= i < len(grid) and 0 <= j < len(grid[i]) else None)
+
+        # Rebuild the cache, retaining the number format
+        is_num = ref.tag == f"{{{_NS['c']}}}numRef"
+        cache_tag = f"{{{_NS['c']}}}{'numCache' if is_num else 'strCache'}"
+        cache = ref.find(cache_tag)
+        format_code = cache.findtext("c:formatCode", "General", _NS) if cache is not None else "General"
+        new_cache = lxml.etree.Element(cache_tag)
+        if is_num:
+            lxml.etree.SubElement(new_cache, f"{{{_NS['c']}}}formatCode").text = format_code
+        lxml.etree.SubElement(new_cache, f"{{{_NS['c']}}}ptCount").set("val", str(len(values)))
+        for idx, value in enumerate(values):
+            # Like Excel, text in a numeric range and blank cells are left out of the cache as gaps
+            number = _numeric_value(value) if is_num else None
+            if _is_missing(value) or (is_num and number is None):
+                continue
+            pt = lxml.etree.SubElement(new_cache, f"{{{_NS['c']}}}pt")
+            pt.set("idx", str(idx))
+            lxml.etree.SubElement(pt, f"{{{_NS['c']}}}v").text = _format_number(number) if is_num else _text_value(value)
+
+        if cache is not None:
+            ref.replace(cache, new_cache)
+        else:
+            formula.addnext(new_cache)
+        count += 1
+
+    return count
+
+def _set_sheet_cell(cell: lxml.etree._Element, value) -> bool:
+    """
+    Overwrites a worksheet `c` element with `value`, retaining its style. Dates are written as serial numbers,
+    shown as dates by the (date) number format of the cell style. Returns True if a formula was dropped.
+    """
+    had_formula = cell.find("x:f", _NS) is not None
+    for child in list(cell):
+        cell.remove(child)
+    cell.attrib.pop("t", None)
+
+    if isinstance(value, bool):
+        cell.set("t", "b")
+        lxml.etree.SubElement(cell, f"{{{_NS['x']}}}v").text = str(int(value))
+    elif _numeric_value(value) is not None:
+        lxml.etree.SubElement(cell, f"{{{_NS['x']}}}v").text = _format_number(_numeric_value(value))
+    elif not _is_missing(value):
+        cell.set("t", "inlineStr")
+        inline_str = lxml.etree.SubElement(cell, f"{{{_NS['x']}}}is")
+        text = lxml.etree.SubElement(inline_str, f"{{{_NS['x']}}}t")
+        text.text = str(value)
+        if text.text != text.text.strip():
+            text.set("{http://www.w3.org/XML/1998/namespace}space", "preserve")
+
+    return had_formula
+
+def _update_sheet_xml(sheet_xml: lxml.etree._Element, grid: list[list], origin: tuple[int, int]) -> bool:
+    """
+    Writes `grid` into the worksheet starting at `origin` (row, col). Cells of the grid columns below the
+    grid (left over from a longer previous table) are cleared. Returns True if any formula was dropped.
+    """
+    row0, col0 = origin
+    last_row, last_col = row0 + len(grid) - 1, col0 + len(grid[0]) - 1
+    sheet_data = sheet_xml.find("x:sheetData", _NS)
+    rows = {int(row.get("r")): row for row in sheet_data.iterfind("x:row", _NS)}
+    formulas_dropped = False
+
+    # Clear left over cells below the grid
+    for r, row in rows.items():
+        if r > last_row:
+            for cell in row.findall("x:c", _NS):
+                if col0 <= _column_index(re.match("[A-Z]+", cell.get("r")).group()) <= last_col:
+                    formulas_dropped |= cell.find("x:f", _NS) is not None
+                    row.remove(cell)
+            if len(row) == 0 and set(row.attrib) <= {"r", "spans"}:
+                sheet_data.remove(row)
+
+    prev_styles: dict[int, str] = {}
+    for i, grid_row in enumerate(grid):
+        r = row0 + i
+        if r not in rows:
+            rows[r] = lxml.etree.Element(f"{{{_NS['x']}}}row", r=str(r))
+            following = [row for row_r, row in rows.items() if row_r > r and row.getparent() is not None]
+            if following:
+                min(following, key=lambda row: int(row.get("r"))).addprevious(rows[r])
+            else:
+                sheet_data.append(rows[r])
+        row = rows[r]
+        row.attrib.pop("spans", None)
+        cells = {_column_index(re.match("[A-Z]+", cell.get("r")).group()): cell for cell in row.iterfind("x:c", _NS)}
+
+        for j, value in enumerate(grid_row):
+            c = col0 + j
+            if c not in cells:
+                cells[c] = lxml.etree.Element(f"{{{_NS['x']}}}c", r=f"{_column_letter(c)}{r}")
+                if c in prev_styles:
+                    cells[c].set("s", prev_styles[c])
+                following = [cell for cell_c, cell in cells.items() if cell_c > c and cell.getparent() is not None]
+                if following:
+                    min(following, key=lambda cell: _column_index(re.match("[A-Z]+", cell.get("r")).group())).addprevious(cells[c])
+                else:
+                    row.append(cells[c])
+            formulas_dropped |= _set_sheet_cell(cells[c], value)
+            if cells[c].get("s") is not None:
+                prev_styles[c] = cells[c].get("s")
+
+    # Keep the used range in sync
+    dimension = sheet_xml.find("x:dimension", _NS)
+    if dimension is not None:
+        refs = [re.match(r"([A-Z]+)(\d+)", cell.get("r")).groups() for cell in sheet_data.iterfind("x:row/x:c", _NS)]
+        if refs:
+            max_col = max(_column_index(col) for col, _ in refs)
+            max_row = max(int(row) for _, row in refs)
+            dimension.set("ref", f"A1:{_column_letter(max_col)}{max_row}")
+
+    return formulas_dropped
+
+def _update_embedded_workbook(
+        workbook_bytes: bytes, grid: list[list], sheet_name: str, origin: tuple[int, int]
+    ) -> bytes:
+    """
+    Excel free counterpart to `update_embedded_excel`. Writes `grid` into `sheet_name` of the workbook and
+    regenerates the caches of the charts inside the workbook so that they agree with the data written.
+
+    If any formula cells get overwritten, the calculation chain is dropped as Excel rebuilds it on load
+    (and treats a stale one as corruption).
+    """
+    updated_parts: dict[str, bytes | None] = {}
+    with PackageReader(workbook_bytes) as zfr:
+        names = zfr.namelist()
+
+        # Resolve the sheet part from the workbook relationships
+        workbook_xml = _parse_xml(zfr.read("xl/workbook.xml"))
+        sheet = next((sheet for sheet in workbook_xml.iterfind("x:sheets/x:sheet", _NS) if sheet.get("name") == sheet_name), None)
+        assert sheet is not None, f"sheet '{sheet_name}' doesn't exist in the embedded excel"
+        workbook_rels = _parse_xml(zfr.read("xl/_rels/workbook.xml.rels"))
+        rel_targets = {rel.get("Id"): rel.get("Target") for rel in workbook_rels.iterfind("pr:Relationship", _NS)}
+        sheet_name_part = _resolve_part_name("xl/workbook.xml", rel_targets[sheet.get(f"{{{_NS['r']}}}id")])
+
+        sheet_xml = _parse_xml(zfr.read(sheet_name_part))
+        formulas_dropped = _update_sheet_xml(sheet_xml, grid, origin)
+        updated_parts[sheet_name_part] = _serialize_xml(sheet_xml)
+
+        # Excel's own copies of the chart caches
+        for name in zfr.part_names("chart"):
+            chart_xml = _parse_xml(zfr.read(name))
+            if _update_chart_caches(chart_xml, grid, sheet_name, origin):
+                updated_parts[name] = _serialize_xml(chart_xml)
+
+        # Drop the calculation chain along with the references to it
+        if formulas_dropped and "xl/calcChain.xml" in names:
+            updated_parts["xl/calcChain.xml"] = None
+            for rel in workbook_rels.findall("pr:Relationship", _NS):
+                if _resolve_part_name("xl/workbook.xml", rel.get("Target")) == "xl/calcChain.xml":
+                    workbook_rels.remove(rel)
+            updated_parts["xl/_rels/workbook.xml.rels"] = _serialize_xml(workbook_rels)
+            content_types = _parse_xml(zfr.read("[Content_Types].xml"))
+            for override in content_types.findall("ct:Override[@PartName='/xl/calcChain.xml']", _NS):
+                content_types.remove(override)
+            updated_parts["[Content_Types].xml"] = _serialize_xml(content_types)
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zfw:
+            _write_package(zfr, zfw, updated_parts)
+
+    return buffer.getvalue()
+
+class PPTSession:
+    """
+    Opens a PPT once, queues up edits and commits all of them in a single write.
+
+    ```
+    with PPTSession(ppt_path) as session:
+        session.modify_ppt_links("C:/Old Share/data.xlsx", "C:/New Share/data.xlsx")
+        session.toggle_update_links_popup(auto_update=False)
+        session.update_ppt_table(table_df, slide_id=1, shape_id=4, start_coord=(1, 0))
+        session.update_ppt_textboxes([(0, 2, 0, 0, "Monthly Report")])
+        session.update_ppt_plot_cache()
+    ```
+
+    Edits are applied in the order they were queued when the `with` block exits cleanly (or when `commit` is
+    called). Parts are parsed lazily and cached for the lifetime of the session, parts left untouched by the
+    edits are copied over raw. Nothing is written if an exception is raised inside the `with` block.
+
+    The PPT can also be read from bytes or a binary file object, the result is then written to `output` (a path
+    or a binary file object). With an `output`, the PPT itself is left as is and the output is written even if
+    the edits didn't change anything.
+    """
+
+    def __init__(
+            self, ppt_path: str | bytes | BinaryIO, overwrite: bool = False, output: str | BinaryIO | None = None
+        ) -> None:
+        _check_output(ppt_path, output)
+        self.ppt_path = ppt_path
+        self.overwrite = overwrite
+        self.output = output
+        self._saved = False
+        self._zfr: zipfile.ZipFile | None = None
+        self._edits: list[tuple[str, Callable[[], int]]] = []
+        self._parts: dict[str, bytes] = {}
+        self._trees: dict[str, lxml.etree._Element] = {}
+        self._dirty: set[str] = set()
+
+    def __enter__(self) -> "PPTSession":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self.close()
+
+    def open(self) -> None:
+        if self._zfr is None:
+            self._zfr = PackageReader(self.ppt_path)
+
+    def close(self) -> None:
+        if self._zfr is not None:
+            self._zfr.close()
+            self._zfr = None
+        self._parts.clear()
+        self._trees.clear()
+        self._dirty.clear()
+
+    # Part access
+    def _part_names(self) -> list[str]:
+        self.open()
+        return self._zfr.namelist()
+
+    def _read(self, part_name: str) -> bytes:
+        """
+        Current contents of the part, including edits applied so far
+        """
+        if part_name in self._dirty:
+            self._parts[part_name] = _serialize_xml(self._trees.pop(part_name))
+            self._dirty.discard(part_name)
+        if part_name in self._parts:
+            return self._parts[part_name]
+
+        self.open()
+        contents = self._zfr.read(part_name)
+        _count(parts_read=1, bytes_read=len(contents))
+        return contents
+
+    def _write(self, part_name: str, contents: bytes) -> None:
+        self._parts[part_name] = contents
+        self._trees.pop(part_name, None)
+        self._dirty.discard(part_name)
+
+    def _tree(self, part_name: str) -> lxml.etree._Element:
+        """
+        Parsed part, cached. Call `_mark_dirty` after modifying it.
+        """
+        if part_name not in self._trees:
+            self._trees[part_name] = _parse_xml(self._read(part_name))
+        return self._trees[part_name]
+
+    def _mark_dirty(self, part_name: str) -> None:
+        self._dirty.add(part_name)
+
+    def _related_part_names(self, part_name: str, rel_type: str) -> list[str]:
+        rels_name = _rels_part_name(part_name)
+        # Relationships the edits haven't touched come from the package's relationship graph
+        if rels_name not in self._parts and rels_name not in self._trees:
+            self.open()
+            return self._zfr.related(part_name, rel_type)
+
+        return [
+            _resolve_part_name(part_name, rel.attrib["Target"])
+            for rel in self._tree(rels_name).iterfind("pr:Relationship", _NS)
+            if rel.attrib["Type"] == rel_type and rel.attrib.get("TargetMode") != "External"
+        ]
+
+    def _slide_part_name(self, slide_id: int) -> str:
+        """
+        Part name of the slide at index `slide_id`, in presentation order
+        """
+        presentation = self._tree("ppt/presentation.xml")
+        rel_ids = [sld.attrib[f"{{{_NS['r']}}}id"] for sld in presentation.iterfind("p:sldIdLst/p:sldId", _NS)]
+        rels = {rel.attrib["Id"]: rel.attrib["Target"] for rel in self._tree("ppt/_rels/presentation.xml.rels").iterfind("pr:Relationship", _NS)}
+        return _resolve_part_name("ppt/presentation.xml", rels[rel_ids[slide_id]])
+
+    def _apply_transforms(self, transforms: list[tuple[str, Callable[[bytes], tuple[bytes, int]]]]) -> int:
+        count = 0
+        for part_name in self._part_names():
+            for pattern, transform in transforms:
+                if re.fullmatch(pattern, part_name):
+                    contents = self._read(part_name)
+                    new_contents, part_count = transform(contents)
+                    count += part_count
+                    if new_contents != contents:
+                        self._write(part_name, new_contents)
+
+        return count
+
+    # Queued edits
+    def modify_ppt_links(self, search_str: str | Mapping[str, str], replace_with: str = "") -> None:
+        """
+        Queues a link update, see `modify_ppt_links`
+        """
+        def edit() -> int | dict[str, int]:
+            transforms = _link_transforms(search_str, replace_with)
+            count = self._apply_transforms(transforms)
+            return transforms[0][1].hits if isinstance(search_str, Mapping) else count
+
+        self._edits.append(("modify_ppt_links", edit))
+
+    def toggle_update_links_popup(self, auto_update: bool = False) -> None:
+        """
+        Queues a links update popup toggle, see `toggle_update_links_popup`
+        """
+        self._edits.append(("toggle_update_links_popup", lambda: self._apply_transforms(_popup_transforms(auto_update))))
+
+    def update_ppt_table(
+            self, table_df: pd.DataFrame, *,
+            slide_id: int, shape_id: int, start_coord: tuple[int, int],
+            strides: tuple[int, int] = (1, 1), include_df_header: bool = True
+        ) -> None:
+        """
+        Queues a table update, see `update_ppt_table`
+        """
+        self.update_ppt_tables([{
+            "table_df": table_df, "slide_id": slide_id, "shape_id": shape_id, "start_coord": start_coord,
+            "strides": strides, "include_df_header": include_df_header
+        }])
+
+    def update_ppt_tables(self, tables: list[dict]) -> None:
+        """
+        Queues a bulk table update, see `update_ppt_tables`
+        """
+        def edit() -> int:
+            np = _backend("numpy", "update_ppt_tables")
+            fills = []
+            errors = []
+            for table in tables:
+                slide_name = self._slide_part_name(table["slide_id"])
+                graphic_frame = _slide_shape_elements(self._tree(slide_name))[table["shape_id"]]
+                tbl = graphic_frame.find(".//a:tbl", _NS)
+                values, cell_grid, spanned, out_of_range = _plan_table_fill(
+                    tbl, table["table_df"], table["start_coord"], table.get("strides", (1, 1)), table.get("include_df_header", True)
+                )
+                for label, mask in (("hidden cell", spanned), ("outside of the table", out_of_range)):
+                    coords = [tuple(int(v) for v in cell_grid[i, j]) for i, j in zip(*np.nonzero(mask))]
+                    if coords:
+                        errors.append(f"slide {table['slide_id']}, shape {table['shape_id']} ({label}): {coords}")
+                fills.append((slide_name, tbl, values, cell_grid))
+
+            # Report every offending coordinate before writing anything
+            if errors:
+                raise ValueError(
+                    "invalid target cells, please check `strides` and `start_coord` values provided.\n" + "\n".join(errors)
+                )
+
+            count = 0
+            for slide_name, tbl, values, cell_grid in fills:
+                rows = [row.findall("a:tc", _NS) for row in tbl.iterfind("a:tr", _NS)]
+                for (i, j), value in np.ndenumerate(values):
+                    cell = rows[cell_grid[i, j, 0]][cell_grid[i, j, 1]]
+                    _run_text_element(cell.findall("a:txBody/a:p", _NS), 0, 0).text = "" if _is_missing(value) else str(value)
+                count += values.size
+                self._mark_dirty(slide_name)
+
+            return count
+
+        self._edits.append(("update_ppt_tables", edit))
+
+    def update_ppt_textboxes(self, textboxes: list[tuple[int, int, int, int, str]]) -> None:
+        """
+        Queues a textbox update, see `update_ppt_textboxes`
+        """
+        def edit() -> int:
+            for slide_id, shape_id, para_id, run_id, text in textboxes:
+                slide_name = self._slide_part_name(slide_id)
+                shape = _slide_shape_elements(self._tree(slide_name))[shape_id]
+                _run_text_element(shape.findall("p:txBody/a:p", _NS), para_id, run_id).text = text
+                self._mark_dirty(slide_name)
+
+            return len(textboxes)
+
+        self._edits.append(("update_ppt_textboxes", edit))
+
+    def update_ppt_plot_cache(self) -> None:
+        """
+        Queues a plot cache sync from the embedded excel charts, see `update_ppt_plot_cache`
+        """
+        def edit() -> int:
+            self.open()
+            update_count = 0
+            for part_name in self._zfr.part_names("chart"):
+                embed_names = self._related_part_names(part_name, _RT_PACKAGE)
+                assert embed_names, f"embedded excel doesn't exist for {part_name}"
+
+                # Embedded excels not rewritten by an earlier edit are opened in place
+                if embed_names[0] in self._parts:
+                    embed_zfr = PackageReader(self._parts[embed_names[0]])
+                else:
+                    embed_zfr = self._zfr.open_nested(embed_names[0])
+                with embed_zfr:
+                    embed_chart_xml = _parse_xml(embed_zfr.read("xl/charts/chart1.xml"))
+
+                if _replace_chart_caches(self._tree(part_name), embed_chart_xml):
+                    self._mark_dirty(part_name)
+                    update_count += 1
+
+            return update_count
+
+        self._edits.append(("update_ppt_plot_cache", edit))
+
+    def update_ppt_chart_data(
+            self, chart_data: dict[int, pd.DataFrame], *, sheet_name: str = "", fill_range: str = "A1"
+        ) -> None:
+        """
+        Queues an Excel free chart data update, see `update_ppt_chart_data`
+        """
+        def edit() -> int:
+            row0, col0 = int(re.search(r"\d+", fill_range).group()), _column_index(re.match("[A-Z]+", fill_range.replace("$", "")).group())
+            update_count = 0
+            for chart_id, data_df in chart_data.items():
+                part_name = f"ppt/charts/chart{chart_id}.xml"
+                chart_xml = self._tree(part_name)
+                grid = _dataframe_grid(data_df)
+
+                # Default to the sheet the chart series point at
+                chart_sheet = sheet_name
+                if not chart_sheet:
+                    parsed = [_parse_cell_range(f.text or "") for f in chart_xml.iterfind(".//c:ser//c:f", _NS)]
+                    chart_sheet = next((p[1] for p in parsed if p is not None), "")
+                assert chart_sheet, f"couldn't figure out the sheet {part_name} refers to, please provide `sheet_name`"
+
+                embed_names = self._related_part_names(part_name, _RT_PACKAGE)
+                assert embed_names, f"embedded excel doesn't exist for {part_name}"
+                self._write(embed_names[0], _update_embedded_workbook(self._read(embed_names[0]), grid, chart_sheet, (row0, col0)))
+
+                _update_chart_caches(chart_xml, grid, chart_sheet, (row0, col0))
+                self._mark_dirty(part_name)
+                update_count += 1
+
+            return update_count
+
+        self._edits.append(("update_ppt_chart_data", edit))
+
+    def commit(self) -> list[int]:
+        """
+        Applies the queued edits and writes the PPT out once. Returns the counts reported by each edit,
+        in the order they were queued.
+        """
+        if not self._edits and not self._parts and not self._dirty and (self.output is None or self._saved):
+            return []
+
+        with _span("commit", path=_source_name(self.ppt_path)):
+            counts = []
+            for name, edit in self._edits:
+                with _span(name):
+                    counts.append(edit())
+            self._edits.clear()
+
+            with _span("serialize"):
+                for part_name in list(self._dirty):
+                    self._read(part_name)
+
+            # An output is written even if nothing changed
+            if self._parts or self.output is not None:
+                self.open()
+                _save_package(self._zfr, self.ppt_path, self.output, self._parts, self.overwrite)
+                self._saved = True
+                self.close()
+
+        return counts
+
+@_instrumented
+def update_ppt_chart_data(
+        ppt_path: str | bytes | BinaryIO, chart_data: dict[int, pd.DataFrame], *,
+        sheet_name: str = "", fill_range: str = "A1", overwrite: bool = False, output: str | BinaryIO | None = None
+    ) -> int:
+    """
+    Excel free alternative to `update_embedded_excel` followed by `update_ppt_plot_cache`.
+
+    `chart_data` maps the N in 'ppt/charts/chartN.xml' to the DataFrame to plot. Each DataFrame is written
+    (header included, index excluded) into `sheet_name` of the chart's embedded excel starting at `fill_range`,
+    and the chart's numCache / strCache are regenerated from the same data. If `sheet_name` is not provided, the
+    sheet the chart series point at is used.
+
+    Series ranges are resized to the number of rows in the DataFrame, existing number formats are retained.
+    For bytes / file object input and `output`, see `PPTSession`.
+
+    Returns the number of charts updated.
+    """
+    session = PPTSession(ppt_path, overwrite, output)
+    with session:
+        session.update_ppt_chart_data(chart_data, sheet_name=sheet_name, fill_range=fill_range)
+        counts = session.commit()
+
+    return counts[0]
+
+class RenderResult(NamedTuple):
+    cells: int
+    textboxes: int
+    charts: int
+
+class PPTTemplate:
+    """
+    Loads a template PPT once to render many decks from it, e.g. one per client:
+
+    ```
+    template = PPTTemplate("C:/Reports/template.pptx")
+    template.render(
+        "C:/Reports/Client A.pptx",
+        tables=[{"table_df": df, "slide_id": 1, "shape_id": 4, "start_coord": (1, 0)}],
+        textboxes=[(0, 2, 0, 0, "Client A")],
+        chart_data={1: chart_df},
+    )
+    ```
+
+    `tables`, `textboxes` and `chart_data` take the same arguments as `update_ppt_tables`, `update_ppt_textboxes`
+    and `update_ppt_chart_data`. `output` is a path (written atomically) or a binary file object, which doesn't
+    need to be seekable.
+
+    The template archive is held in memory and shared by every render. Parts are read and parsed once, a render
+    works on copies of only the parts its edits touch, all the other members are streamed raw from the shared
+    template bytes. Renders are thread safe, `render_many` runs them on a thread pool.
+    """
+
+    def __init__(self, template: str | bytes) -> None:
+        if isinstance(template, str):
+            self.name = template
+            with open(template, "rb") as f:
+                self._data = f.read()
+        else:
+            self.name = "<bytes>"
+            self._data = bytes(template)
+
+        # Read into memory rather than mapped, so that the template file can change while rendering
+        self._zfr = PackageReader(self._data)
+        self._lock = threading.Lock()
+        self._parts: dict[str, bytes] = {}
+        self._trees: dict[str, lxml.etree._Element] = {}
+
+    def _open(self) -> PackageReader:
+        """
+        Reader over the shared template bytes for a render, see `PackageReader.clone`
+        """
+        return self._zfr.clone()
+
+    def _part(self, part_name: str) -> bytes:
+        """
+        Decompressed contents of a template part, cached. Must not be modified.
+        """
+        with self._lock:
+            if part_name not in self._parts:
+                self._parts[part_name] = self._zfr.read(part_name)
+                _count(parts_read=1, bytes_read=len(self._parts[part_name]))
+            return self._parts[part_name]
+
+    def _tree(self, part_name: str) -> lxml.etree._Element:
+        """
+        Parsed template part, cached. Must not be modified, renders work on a copy.
+        """
+        contents = self._part(part_name)
+        with self._lock:
+            if part_name not in self._trees:
+                self._trees[part_name] = _parse_xml(contents)
+            return self._trees[part_name]
+
+    def render(
+            self, output: str | BinaryIO, *,
+            tables: list[dict] | None = None, textboxes: list[tuple[int, int, int, int, str]] | None = None,
+            chart_data: dict[int, pd.DataFrame] | None = None, sheet_name: str = "", fill_range: str = "A1"
+        ) -> RenderResult:
+        """
+        Renders the template with the given data into `output`. Returns the number of table cells, textboxes and
+        charts updated.
+        """
+        with _span("render", path=output if isinstance(output, str) else None):
+            session = _TemplateSession(self, output)
+            try:
+                if tables:
+                    session.update_ppt_tables(tables)
+                if textboxes:
+                    session.update_ppt_textboxes(textboxes)
+                if chart_data:
+                    session.update_ppt_chart_data(chart_data, sheet_name=sheet_name, fill_range=fill_range)
+                counts = iter(session.commit())
+            finally:
+                session.close()
+
+            return RenderResult(
+                next(counts) if tables else 0, next(counts) if textboxes else 0, next(counts) if chart_data else 0
+            )
+
+    @_instrumented
+    def render_many(self, renders: list[dict], max_workers: int | None = None) -> list[dict]:
+        """
+        Renders several decks in parallel on a thread pool. Each item of `renders` holds the arguments of `render`:
+        ```
+        template.render_many([{"output": f"C:/Reports/{client}.pptx", "textboxes": [(0, 2, 0, 0, client)]} for client in clients])
+        ```
+
+        Like `run_batch`, returns one dict per render (in input order) with the `RenderResult`, the time taken and
+        the error if it failed. A failing render doesn't stop the rest.
+        """
+        def render_item(render_kwargs: dict) -> dict:
+            start = time.perf_counter()
+            result, error = None, None
+            try:
+                result = self.render(**render_kwargs)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            return {"output": render_kwargs.get("output"), "result": result, "seconds": time.perf_counter() - start, "error": error}
+
+        # Each render runs in a copy of the current context so that its spans nest under this one
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, render_item, render_kwargs) for render_kwargs in renders]
+            results = [future.result() for future in futures]
+
+        _count(files=len(results), errors=sum(1 for result in results if result["error"]))
+        return results
+
+class _TemplateSession(PPTSession):
+    """
+    `PPTSession` rendering a `PPTTemplate` into `output`. Parts are read from the template's shared cache and
+    copied on first access, the template is never modified.
+    """
+
+    def __init__(self, template: PPTTemplate, output: str | BinaryIO) -> None:
+        super().__init__(template.name, overwrite=True, output=output)
+        self.template = template
+
+    def open(self) -> None:
+        if self._zfr is None:
+            self._zfr = self.template._open()
+
+    def _read(self, part_name: str) -> bytes:
+        if part_name in self._dirty or part_name in self._parts:
+            return super()._read(part_name)
+        return self.template._part(part_name)
+
+    def _tree(self, part_name: str) -> lxml.etree._Element:
+        if part_name not in self._trees:
+            if part_name in self._parts:
+                self._trees[part_name] = _parse_xml(self._parts[part_name])
+            else:
+                self._trees[part_name] = copy.deepcopy(self.template._tree(part_name))
+        return self._trees[part_name]
+
+# Operations that can be run over many files with `run_batch`, the file path is passed as the first argument
+_BATCH_OPERATIONS: dict[str, Callable[..., object]] = {
+    "modify_ppt_links": modify_ppt_links,
+    "toggle_update_links_popup": toggle_update_links_popup,
+    "update_mqueries": update_mqueries,
+    "update_ppt_plot_cache": update_ppt_plot_cache,
+}
+
+def _expand_batch_paths(paths: str | list[str]) -> list[str]:
+    """
+    `paths` can be a list of file paths, a glob pattern or a manifest file listing one path per line
+    (blank lines and lines starting with '#' are ignored, relative paths are relative to the manifest).
+    """
+    if not isinstance(paths, str):
+        return list(paths)
+
+    if os.path.isfile(paths) and not re.search(r"\.(pptx|xlsx|xlsm)$", paths, re.IGNORECASE):
+        manifest_dir = os.path.dirname(paths)
+        with open(paths, encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+        return [os.path.join(manifest_dir, line) for line in lines if line and not line.startswith("#")]
+
+    return sorted(glob.glob(paths, recursive=True))
+
+def _limit_worker_memory(max_memory_mb: int) -> None:
+    """
+    Process pool initializer capping the address space of each worker, so that a single huge file
+    fails with a MemoryError rather than taking the host down. Only supported on POSIX.
+    """
+    if max_memory_mb:
+        import resource
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _run_batch_item(operation: str, path: str, operation_kwargs: dict, instrumented: bool = False) -> dict:
+    """
+    Runs a single batch operation, never raises. Errors are reported as part of the result.
+    If `instrumented`, the span records of the run are collected and sent back under 'phases'.
+    """
+    start = time.perf_counter()
+    result, error = None, None
+    with instrument() if instrumented else contextlib.nullcontext() as sink:
+        try:
+            result = _BATCH_OPERATIONS[operation](path, **operation_kwargs)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+    item = {"path": path, "result": result, "seconds": time.perf_counter() - start, "error": error}
+    if instrumented:
+        item["phases"] = sink.records
+    return item
+
+@_instrumented
+def run_batch(
+        paths: str | list[str], operation: str, operation_kwargs: dict | None = None, *,
+        max_workers: int | None = None, max_tasks_per_child: int | None = 50, max_memory_mb: int = 0
+    ) -> list[dict]:
+    """
+    Runs one of the helpers (see `_BATCH_OPERATIONS`) over many files using a process pool.
+
+    `paths` is a list of files, a glob pattern (`**` is supported) or a manifest file, see `_expand_batch_paths`.
+    `operation_kwargs` are passed on to the helper along with each file path, for example:
+    ```
+    run_batch("decks/**/*.pptx", "modify_ppt_links", {"search_str": "C:/Old Share", "replace_with": "C:/New Share"})
+    ```
+
+    Workers are recycled after `max_tasks_per_child` files to keep their memory in check and if `max_memory_mb`
+    is set, the address space of each worker is capped to it as well (POSIX only).
+
+    Returns one dict per file (in input order) with the helper's return value, the time taken and the
+    error if it failed. A failing file doesn't stop the rest of the batch. If instrumentation is enabled, the
+    span records of every worker are passed on to the sink (see `set_instrumentation_sink`).
+    """
+    assert operation in _BATCH_OPERATIONS, f"unknown operation '{operation}', expected one of {list(_BATCH_OPERATIONS)}"
+    file_paths = _expand_batch_paths(paths)
+    results: list[dict] = [{}] * len(file_paths)
+
+    pool_kwargs = {"max_tasks_per_child": max_tasks_per_child} if max_tasks_per_child else {}
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers, initializer=_limit_worker_memory, initargs=(max_memory_mb,), **pool_kwargs
+        ) as executor:
+        futures = {
+            executor.submit(_run_batch_item, operation, path, operation_kwargs or {}, _SINK is not None): idx
+            for idx, path in enumerate(file_paths)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+                # Span records of the worker are replayed into the sink of this process
+                for record in results[idx].pop("phases", ()):
+                    _SINK(record)
+            except Exception as e:
+                # Worker died (e.g. killed by the OS), the rest of the pool is still usable
+                results[idx] = {"path": file_paths[idx], "result": None, "seconds": None, "error": f"{type(e).__name__}: {e}"}
+
+    _count(files=len(results), errors=sum(1 for result in results if result["error"]))
+    return results
+
+class LinkRecord(NamedTuple):
+    file: str
+    part: str
+    kind: str
+    source: str
+    target: str
+    target_path: str
+
+class LinkIndexUpdate(NamedTuple):
+    scanned: int
+    unchanged: int
+    removed: int
+    failed: dict[str, str]
+
+# Relationship types recorded by `LinkIndex`, by the last segment of the type URI
+_INDEXED_REL_TYPES = {"oleObject": "ole", "package": "embedded", "externalLinkPath": "external_link"}
+
+# M functions whose first (string) argument is a data source, the remote ones are not checked by `missing_links`
+_MQUERY_SOURCE_RE = re.compile(
+    r'\b(File\.Contents|Folder\.Files|Folder\.Contents|Web\.Contents|SharePoint\.Files|SharePoint\.Contents'
+    r'|Sql\.Database|Odbc\.DataSource)\s*\(\s*"((?:[^"]|"")*)"'
+)
+_MQUERY_REMOTE_SOURCES = ("Web.", "SharePoint.", "Sql.", "Odbc.")
+
+def _link_target_path(target: str, base_dir: str) -> str:
+    """
+    Local (or UNC) path an external link target points at, e.g.
+    'file:///C:\\My%20Share\\Book1.xlsx!Sheet1!R1C1' -> 'C:\\My Share\\Book1.xlsx'. Relative targets are resolved against `base_dir`.
+    """
+    path = target.split("!", 1)[0]
+    if path.lower().startswith("file:///"):
+        path = path[8:]
+    elif path.lower().startswith("file:"):
+        path = path[5:]
+    path = urllib.parse.unquote(path)
+    if re.match(r"[a-z]+://", path, re.IGNORECASE):
+        return path
+    if not (os.path.isabs(path) or re.match(r"[a-zA-Z]:[\\/]|[\\/]{2}", path)):
+        path = os.path.join(base_dir, path)
+    return path
+
+def _link_key(path: str) -> str:
+    """
+    Case and separator insensitive form of a path used for lookups
+    """
+    return path.replace("\\", "/").rstrip("/").lower()
+
+class LinkIndex:
+    """
+    Persistent SQLite index of the external dependencies of decks and workbooks, so that the files affected by a
+    change can be found without opening every archive.
+
+    ```
+    with LinkIndex("links.db") as index:
+        index.update("decks/**/*.pptx")
+        index.update("workbooks/**/*.xlsx")
+        decks = index.files_depending_on("C:/Shared Drive/Reports/Book1.xlsx")
+    run_batch(decks, "modify_ppt_links", {"search_str": "C:/Shared Drive", "replace_with": "D:/New Drive"})
+    ```
+
+    Recorded per file and part: OLE links and embedded / linked chart packages from the `.rels` parts, external
+    workbook links of excels, and the data sources (`File.Contents(...)`, `Web.Contents(...)`, ...) of the M queries
+    in customXml DataMashups.
+
+    Updates are incremental, files whose size and mtime are unchanged are skipped without being opened, files whose
+    relevant parts have the same CRCs in the central directory are skipped without reading any part.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, parts_digest TEXT
+                );
+                CREATE TABLE IF NOT EXISTS links (
+                    file TEXT, part TEXT, kind TEXT, source TEXT, target TEXT, target_path TEXT,
+                    target_key TEXT, target_name TEXT
+                );
+                CREATE INDEX IF NOT EXISTS links_file ON links (file);
+                CREATE INDEX IF NOT EXISTS links_target_key ON links (target_key);
+                CREATE INDEX IF NOT EXISTS links_target_name ON links (target_name);
+            """)
+
+    def __enter__(self) -> "LinkIndex":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def update(self, paths: str | list[str]) -> LinkIndexUpdate:
+        """
+        (Re)indexes the decks and workbooks in `paths` (list, glob pattern or manifest, see `_expand_batch_paths`)
+        that changed since the last update. Indexed files that no longer exist are dropped.
+
+        A file that can't be read (e.g. an Office '~$' lock file, or a manifest entry that was deleted) doesn't stop
+        the update, it is reported in `failed` with its error and its previous entries, if any, are kept.
+        """
+        scanned, unchanged, failed = 0, 0, {}
+        with _span("index_update") as span, self._conn:
+            known = {row[0]: row[1:] for row in self._conn.execute("SELECT path, size, mtime_ns, parts_digest FROM files")}
+            for path in _expand_batch_paths(paths):
+                path = os.path.abspath(path)
+                try:
+                    stat = os.stat(path)
+                    previous = known.get(path)
+                    if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                        unchanged += 1
+                        continue
+
+                    with PackageReader(path) as zfr:
+                        relevant = [zfr.getinfo(part_name) for part_name in zfr.part_names("chart_rels", "rels", "custom_xml")]
+                        digest = hashlib.sha1("\n".join(f"{ITEM.filename}:{ITEM.CRC}" for ITEM in relevant).encode("utf-8")).hexdigest()
+                        links = None
+                        if previous is None or previous[2] != digest:
+                            links = list(self._scan(zfr, relevant, os.path.dirname(path)))
+                except (OSError, zipfile.BadZipFile, lxml.etree.XMLSyntaxError) as e:
+                    failed[path] = f"{type(e).__name__}: {e}"
+                    continue
+
+                if links is not None:
+                    self._conn.execute("DELETE FROM links WHERE file = ?", (path,))
+                    self._conn.executemany(
+                        "INSERT INTO links VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (path, part, kind, source, target, target_path, _link_key(target_path), _link_key(target_path).rsplit("/", 1)[-1])
+                            for part, kind, source, target, target_path in links
+                        ]
+                    )
+                    scanned += 1
+                else:
+                    unchanged += 1
+                self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, stat.st_size, stat.st_mtime_ns, digest))
+
+            removed = [path for path in known if not os.path.exists(path)]
+            for path in removed:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                self._conn.execute("DELETE FROM links WHERE file = ?", (path,))
+            span.add(files_scanned=scanned, files_unchanged=unchanged, files_removed=len(removed), files_failed=len(failed))
+
+        return LinkIndexUpdate(scanned, unchanged, len(removed), failed)
+
+    @staticmethod
+    def _scan(zfr: zipfile.ZipFile, items: list[zipfile.ZipInfo], base_dir: str):
+        """
+        Yields (part, kind, source, target, target_path) for the links found in the relevant parts of an archive
+        """
+        for ITEM in items:
+            contents = zfr.read(ITEM)
+            _count(parts_read=1, bytes_read=len(contents))
+            if ITEM.filename.endswith(".rels"):
+                # 'ppt/charts/_rels/chart1.xml.rels' -> 'ppt/charts/chart1.xml'
+                part = posixpath.join(posixpath.dirname(posixpath.dirname(ITEM.filename)), posixpath.basename(ITEM.filename)[:-5])
+                for rel in _parse_xml(contents).iterfind("pr:Relationship", _NS):
+                    kind = _INDEXED_REL_TYPES.get(rel.attrib.get("Type", "").rsplit("/", 1)[-1])
+                    if kind is None:
+                        continue
+                    target = rel.attrib.get("Target", "")
+                    if rel.attrib.get("TargetMode") == "External":
+                        kind = "chart_data" if kind == "ole" and part.startswith("ppt/charts/") else kind
+                        yield part, kind, rel.attrib["Type"], target, _link_target_path(target, base_dir)
+                    else:
+                        yield part, kind, rel.attrib["Type"], target, _resolve_part_name(part, target)
+            else:
+                tree = _parse_xml(contents)
+                if not tree.text or not tree.text.strip():
+                    continue
+                try:
+                    formulas = DataMashup(base64.b64decode(tree.text)).formulas
+                except (ValueError, zipfile.BadZipFile):
+                    continue
+                for name, formula in formulas.items():
+                    for match in _MQUERY_SOURCE_RE.finditer(formula):
+                        function, target = match.group(1), match.group(2).replace('""', '"')
+                        target_path = target if function.startswith(_MQUERY_REMOTE_SOURCES) else _link_target_path(target, base_dir)
+                        yield f"{ITEM.filename}/{name}", "mquery", function, target, target_path
+
+    def _query(self, where: str, params: tuple) -> list[LinkRecord]:
+        rows = self._conn.execute(
+            f"SELECT file, part, kind, source, target, target_path FROM links WHERE {where} ORDER BY file, part", params
+        )
+        return [LinkRecord(*row) for row in rows]
+
+    def dependents(self, target: str) -> list[LinkRecord]:
+        """
+        Links pointing at `target`, a full path (separators and case are ignored) or a bare file name
+        """
+        key = _link_key(target)
+        if "/" not in key:
+            return self._query("target_name = ? AND kind != 'embedded'", (key,))
+        return self._query("target_key = ? AND kind != 'embedded'", (key,))
+
+    def files_depending_on(self, target: str) -> list[str]:
+        """
+        Decks / workbooks with at least one link pointing at `target`, see `dependents`
+        """
+        return sorted({record.file for record in self.dependents(target)})
+
+    def missing_links(self) -> list[LinkRecord]:
+        """
+        Links to local or network paths that don't exist (URLs and databases are not checked). No archive is opened.
+        """
+        exists: dict[str, bool] = {}
+        missing = []
+        for record in self._query("kind != 'embedded'", ()):
+            if record.source.startswith(_MQUERY_REMOTE_SOURCES) or re.match(r"[a-z]+://", record.target_path, re.IGNORECASE):
+                continue
+            if record.target_path not in exists:
+                exists[record.target_path] = os.path.exists(record.target_path)
+            if not exists[record.target_path]:
+                missing.append(record)
+        return missing
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Command line entry point, e.g.
+    ```
+    python PPTAutomationHelper.py batch "decks/**/*.pptx" toggle_update_links_popup --kwargs '{"auto_update": false}' --workers 8
+    python PPTAutomationHelper.py index links.db "decks/**/*.pptx" --dependents "C:/Shared Drive/Reports/Book1.xlsx"
+    ```
+    """
+    parser = argparse.ArgumentParser(prog="PPTAutomationHelper", description="PPT / Excel automation helpers")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="run a helper over many files in parallel")
+    batch_parser.add_argument("paths", help="glob pattern or manifest file listing one path per line")
+    batch_parser.add_argument("operation", choices=sorted(_BATCH_OPERATIONS))
+    batch_parser.add_argument("--kwargs", default="{}", help="JSON object of keyword arguments for the operation")
+    batch_parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    batch_parser.add_argument("--max-tasks-per-child", type=int, default=50, help="recycle workers after this many files")
+    batch_parser.add_argument("--max-memory-mb", type=int, default=0, help="cap the memory of each worker (POSIX only)")
+    batch_parser.add_argument("--output", default="", help="write the results as JSON lines to this file instead of stdout")
+    batch_parser.add_argument("--link-mapping", default="", help="CSV of old,new link paths, passed to modify_ppt_links as `search_str`")
+    batch_parser.add_argument("--trace", default="", help="append per phase timings and counts as JSON lines to this file")
+
+    index_parser = subparsers.add_parser("index", help="update / query the external link index of decks and workbooks")
+    index_parser.add_argument("db", help="SQLite index file, created if missing")
+    index_parser.add_argument("paths", nargs="*", help="glob patterns or manifest files of the decks / workbooks to (re)index")
+    index_parser.add_argument("--dependents", default="", help="list the links pointing at this path or file name")
+    index_parser.add_argument("--missing", action="store_true", help="list the links pointing at paths that don't exist")
+
+    args = parser.parse_args(argv)
+    if args.command == "index":
+        with LinkIndex(args.db) as index:
+            for paths in args.paths:
+                print(json.dumps({"paths": paths, **index.update(paths)._asdict()}))
+            records = index.dependents(args.dependents) if args.dependents else []
+            records += index.missing_links() if args.missing else []
+            for record in records:
+                print(json.dumps(record._asdict()))
+        return 0
+
+    if args.command == "batch":
+        operation_kwargs = json.loads(args.kwargs)
+        if args.link_mapping:
+            operation_kwargs["search_str"] = read_link_mapping(args.link_mapping)
+
+        trace_sink = JsonLinesSink(args.trace) if args.trace else None
+        try:
+            with instrument(trace_sink) if trace_sink else contextlib.nullcontext():
+                results = run_batch(
+                    args.paths, args.operation, operation_kwargs, max_workers=args.workers,
+                    max_tasks_per_child=args.max_tasks_per_child, max_memory_mb=args.max_memory_mb
+                )
+        finally:
+            if trace_sink:
+                trace_sink.close()
+
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        for result in results:
+            out.write(json.dumps(result, default=str) + "\n")
+        if args.output:
+            out.close()
+
+        return int(any(result["error"] for result in results))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
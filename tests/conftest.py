@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PPTAutomationBenchmark as benchmark  # noqa: E402
+
+
+@pytest.fixture
+def deck(tmp_path):
+    """
+    Small synthetic deck: 2 slides, each with a table, a chart with its embedded excel, 2 linked OLE objects and
+    an image
+    """
+    return benchmark.make_deck(str(tmp_path / "deck.pptx"), slides=2, charts_per_slide=1, media_bytes=1 << 16)
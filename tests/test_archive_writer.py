@@ -0,0 +1,77 @@
+import io
+import zipfile
+import zlib
+
+import PPTAutomationHelper as helper
+
+
+def deflate(contents, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(contents) + compressor.flush()
+
+
+def test_part_compression_policy():
+    assert helper._part_compression("ppt/media/image1.PNG") == (zipfile.ZIP_STORED, 0)
+    assert helper._part_compression("ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx") == (zipfile.ZIP_STORED, 0)
+    assert helper._part_compression("ppt/slides/slide1.xml") == (zipfile.ZIP_DEFLATED, helper._XML_COMPRESS_LEVEL)
+    assert helper._part_compression("ppt/slides/_rels/slide1.xml.rels") == (zipfile.ZIP_DEFLATED, helper._XML_COMPRESS_LEVEL)
+    assert helper._part_compression("ppt/embeddings/oleObject1.bin") == (zipfile.ZIP_DEFLATED, zlib.Z_DEFAULT_COMPRESSION)
+
+
+def test_updated_parts_follow_the_policy(deck):
+    slide = b"<p:sld>" + b"<a:t>text</a:t>" * 500 + b"</p:sld>"
+    image = bytes(range(256)) * 64
+    binary = b"\x00\x01" * 4096
+    updated_parts = {
+        "ppt/slides/slide1.xml": slide,
+        "ppt/media/image1.png": image,
+        "ppt/media/image2.png": None,
+        "ppt/charts/chart1.xml": binary,
+        # Not in the package, so not added
+        "ppt/slides/slide9.xml": slide,
+    }
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(deck) as zfr, zipfile.ZipFile(buffer, "w") as zfw:
+        names = [zinfo.filename for zinfo in zfr.infolist()]
+        helper._write_package(zfr, zfw, updated_parts)
+
+    with zipfile.ZipFile(buffer) as zfr:
+        assert zfr.testzip() is None
+        assert zfr.namelist() == [name for name in names if name != "ppt/media/image2.png"]
+        slide_info, image_info = zfr.getinfo("ppt/slides/slide1.xml"), zfr.getinfo("ppt/media/image1.png")
+        assert slide_info.compress_type == zipfile.ZIP_DEFLATED
+        assert b"".join(helper._raw_member_chunks(zfr, slide_info)) == deflate(slide, helper._XML_COMPRESS_LEVEL)
+        assert image_info.compress_type == zipfile.ZIP_STORED
+        assert image_info.compress_size == image_info.file_size == len(image)
+        assert zfr.read("ppt/slides/slide1.xml") == slide
+        assert zfr.read("ppt/media/image1.png") == image
+        assert zfr.read("ppt/charts/chart1.xml") == binary
+
+
+def test_content_types_are_written_first():
+    source = io.BytesIO()
+    with zipfile.ZipFile(source, "w", compression=zipfile.ZIP_DEFLATED) as zfw:
+        zfw.writestr("_rels/.rels", b"<Relationships/>")
+        zfw.writestr(helper._CONTENT_TYPES_PART, b"<Types/>")
+        zfw.writestr("ppt/presentation.xml", b"<p:presentation/>")
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(source) as zfr, zipfile.ZipFile(buffer, "w") as zfw:
+        helper._write_package(zfr, zfw, {"ppt/presentation.xml": b"<p:presentation></p:presentation>"})
+    with zipfile.ZipFile(buffer) as zfr:
+        assert zfr.namelist() == [helper._CONTENT_TYPES_PART, "_rels/.rels", "ppt/presentation.xml"]
+        assert zfr.read("ppt/presentation.xml") == b"<p:presentation></p:presentation>"
+
+
+def test_members_keep_their_order_past_the_window():
+    parts = [(f"ppt/slides/slide{index}.xml", f"<p:sld>{index}</p:sld>".encode() * (index + 1)) for index in range(40)]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zfw:
+        with helper._ArchiveWriter(zfw, max_workers=4, window_bytes=256) as writer:
+            for name, contents in parts:
+                writer.write(zipfile.ZipInfo(name, (2024, 1, 1, 0, 0, 0)), contents)
+
+    with zipfile.ZipFile(buffer) as zfr:
+        assert zfr.testzip() is None
+        assert [(zinfo.filename, zfr.read(zinfo)) for zinfo in zfr.infolist()] == parts
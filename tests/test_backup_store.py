@@ -0,0 +1,85 @@
+import concurrent.futures
+import os
+import shutil
+import zipfile
+
+import PPTAutomationHelper as helper
+
+
+def make_archive(path, parts):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zfw:
+        for name, contents in parts.items():
+            zfw.writestr(name, contents)
+
+
+def read_archive(path):
+    with zipfile.ZipFile(path) as zfr:
+        return {name: zfr.read(name) for name in zfr.namelist()}
+
+
+def test_restore_defaults_to_the_file_of_the_snapshot(tmp_path):
+    store = helper.BackupStore(str(tmp_path / ".backups"))
+    a, b = str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")
+    make_archive(a, {"xl/workbook.xml": b"<workbook/>", "customXml/item1.xml": b"original"})
+    shutil.copyfile(a, b)
+
+    store.backup(a)
+    store.backup(b)
+    assert len(store.snapshots(a)) == len(store.snapshots(b)) == 1
+    assert store.snapshots(a)[0].id != store.snapshots(b)[0].id
+
+    make_archive(a, {"xl/workbook.xml": b"<workbook/>", "customXml/item1.xml": b"changed a"})
+    make_archive(b, {"xl/workbook.xml": b"<workbook/>", "customXml/item1.xml": b"changed b"})
+    assert store.restore(store.snapshots(a)[0]) == os.path.abspath(a)
+    assert read_archive(a)["customXml/item1.xml"] == b"original"
+    assert read_archive(b)["customXml/item1.xml"] == b"changed b"
+
+    # The restored file was backed up first, by id as well
+    assert len(store.snapshots(a)) == 2
+    store.restore(store.snapshots(a)[-1].id, backup=False)
+    assert read_archive(a)["customXml/item1.xml"] == b"changed a"
+
+
+def test_backups_are_deduplicated_and_restored_byte_for_byte(tmp_path):
+    store = helper.BackupStore(str(tmp_path / ".backups"))
+    deck = str(tmp_path / "deck.pptx")
+    make_archive(deck, {"ppt/media/image1.png": os.urandom(1 << 16), "ppt/slides/slide1.xml": b"<sld>1</sld>"})
+    with open(deck, "rb") as f:
+        original = f.read()
+
+    with helper.instrument() as sink:
+        first = store.backup(deck)
+        make_archive(deck, {"ppt/media/image1.png": read_archive(deck)["ppt/media/image1.png"], "ppt/slides/slide1.xml": b"<sld>2</sld>"})
+        store.backup(deck)
+    assert sink.phases("backup")[-1]["bytes_copied"] < 1 << 10
+
+    store.restore(first, backup=False)
+    with open(deck, "rb") as f:
+        assert f.read() == original
+
+
+def test_retention_keeps_the_last_snapshots_of_each_file(tmp_path):
+    store = helper.BackupStore(str(tmp_path / ".backups"), keep_last=2)
+    paths = [str(tmp_path / f"deck{idx}.pptx") for idx in range(2)]
+    for version in range(4):
+        for path in paths:
+            make_archive(path, {"ppt/slides/slide1.xml": f"<sld>{version}</sld>".encode()})
+            store.backup(path)
+
+    for path in paths:
+        assert len(store.snapshots(path)) == 2
+    store.restore(store.snapshots(paths[0])[0], backup=False)
+    assert read_archive(paths[0])["ppt/slides/slide1.xml"] == b"<sld>2</sld>"
+    assert store.prune() == 0
+
+
+def test_concurrent_backups_keep_every_snapshot(tmp_path):
+    store = helper.BackupStore(str(tmp_path / ".backups"), keep_last=100)
+    paths = [str(tmp_path / f"deck{idx}.pptx") for idx in range(8)]
+    for path in paths:
+        make_archive(path, {"ppt/slides/slide1.xml": path.encode()})
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        snapshot_ids = list(executor.map(store.backup, paths * 5))
+
+    assert sorted(snapshot.id for snapshot in store.snapshots()) == sorted(snapshot_ids)
@@ -0,0 +1,106 @@
+import datetime as dt
+import io
+import re
+import zipfile
+
+import lxml.etree
+import pandas as pd
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+def chart_refs(ppt_path, chart_id=1):
+    with zipfile.ZipFile(ppt_path) as zfr:
+        chart_xml = lxml.etree.fromstring(zfr.read(f"ppt/charts/chart{chart_id}.xml"))
+    return [
+        (ref.findtext("c:f", namespaces=helper._NS), int(ref.find(".//c:ptCount", helper._NS).get("val")))
+        for ref in chart_xml.xpath(".//c:val/c:numRef | .//c:cat/c:strRef", namespaces=helper._NS)
+    ]
+
+
+def frame(rows):
+    return pd.DataFrame({"Series 0": [float(i) for i in range(rows)], "Series 1": [2.0 * i for i in range(rows)]},
+                        index=[f"Cat {i}" for i in range(rows)]).reset_index()
+
+
+def test_ranges_grow_back_after_a_single_row_update(tmp_path):
+    deck = benchmark.make_deck(str(tmp_path / "deck.pptx"), slides=1, links_per_slide=0)
+
+    helper.update_ppt_chart_data(deck, {1: frame(1)}, overwrite=True)
+    assert chart_refs(deck)[:2] == [("Sheet1!$A$2", 1), ("Sheet1!$B$2", 1)]
+
+    helper.update_ppt_chart_data(deck, {1: frame(5)}, overwrite=True)
+    assert chart_refs(deck)[:2] == [("Sheet1!$A$2:$A$6", 5), ("Sheet1!$B$2:$B$6", 5)]
+
+
+def test_series_in_rows_are_resized_along_the_columns():
+    chart_xml = lxml.etree.fromstring(
+        f'<c:chartSpace xmlns:c="{helper._NS["c"]}"><c:chart><c:ser>'
+        '<c:tx><c:strRef><c:f>Sheet1!$A$2</c:f></c:strRef></c:tx>'
+        '<c:cat><c:strRef><c:f>Sheet1!$B$1</c:f></c:strRef></c:cat>'
+        '<c:val><c:numRef><c:f>Sheet1!$B$2</c:f></c:numRef></c:val>'
+        '</c:ser></c:chart></c:chartSpace>'
+    )
+    grid = [["Series", "Q1", "Q2", "Q3"], ["Sales", 1, 2, 3]]
+    assert helper._update_chart_caches(chart_xml, grid, "Sheet1", (1, 1)) == 3
+    assert [f.text for f in chart_xml.iterfind(".//c:f", helper._NS)] == ["Sheet1!$A$2", "Sheet1!$B$1:$D$1", "Sheet1!$B$2:$D$2"]
+
+
+def test_date_categories_are_written_as_serial_numbers(tmp_path):
+    deck = str(tmp_path / "deck.pptx")
+    benchmark.make_deck(str(tmp_path / "source.pptx"), slides=1, links_per_slide=0, points=3)
+
+    # Date axis: numeric category reference with a date format
+    with zipfile.ZipFile(str(tmp_path / "source.pptx")) as zfr, zipfile.ZipFile(deck, "w", zipfile.ZIP_DEFLATED) as zfw:
+        for item in zfr.infolist():
+            contents = zfr.read(item)
+            if item.filename == "ppt/charts/chart1.xml":
+                contents = re.sub(
+                    rb"<c:cat>.*?</c:cat>",
+                    b'<c:cat><c:numRef><c:f>Sheet1!$A$2:$A$4</c:f><c:numCache><c:formatCode>m/d/yyyy</c:formatCode>'
+                    b'<c:ptCount val="3"/></c:numCache></c:numRef></c:cat>',
+                    contents
+                )
+            zfw.writestr(item, contents)
+
+    data_df = pd.DataFrame({
+        "Date": [dt.date(2024, 1, 31), pd.Timestamp("2024-02-29 12:00"), pd.NaT],
+        "Series 0": [1.5, True, 3],
+    })
+    helper.update_ppt_chart_data(deck, {1: data_df}, overwrite=True)
+
+    with zipfile.ZipFile(deck) as zfr:
+        chart_xml = lxml.etree.fromstring(zfr.read("ppt/charts/chart1.xml"))
+        with zipfile.ZipFile(io.BytesIO(zfr.read("ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx"))) as embedded:
+            sheet_xml = lxml.etree.fromstring(embedded.read("xl/worksheets/sheet1.xml"))
+
+    cat_cache = chart_xml.find(".//c:ser/c:cat/c:numRef/c:numCache", helper._NS)
+    assert cat_cache.findtext("c:formatCode", namespaces=helper._NS) == "m/d/yyyy"
+    assert cat_cache.find("c:ptCount", helper._NS).get("val") == "3"
+    assert [(pt.get("idx"), pt.findtext("c:v", namespaces=helper._NS)) for pt in cat_cache.iterfind("c:pt", helper._NS)] == [
+        ("0", "45322"), ("1", "45351.5")
+    ]
+    val_cache = chart_xml.find(".//c:ser/c:val/c:numRef/c:numCache", helper._NS)
+    assert [pt.findtext("c:v", namespaces=helper._NS) for pt in val_cache.iterfind("c:pt", helper._NS)] == ["1.5", "1", "3"]
+
+    cells = {cell.get("r"): cell for cell in sheet_xml.iter(f"{{{helper._NS['x']}}}c")}
+    assert [(cells[ref].get("t"), cells[ref].findtext("x:v", namespaces=helper._NS)) for ref in ("A2", "A3")] == [
+        (None, "45322"), (None, "45351.5")
+    ]
+    assert cells["A4"].find("x:v", helper._NS) is None
+    assert (cells["B3"].get("t"), cells["B3"].findtext("x:v", namespaces=helper._NS)) == ("b", "1")
+
+
+def test_date_cells_keep_their_style():
+    sheet_xml = lxml.etree.fromstring(
+        f'<worksheet xmlns="{helper._NS["x"]}"><sheetData>'
+        '<row r="1"><c r="A1" t="inlineStr"><is><t>Date</t></is></c></row>'
+        '<row r="2"><c r="A2" s="3" t="inlineStr"><is><t>old</t></is></c></row>'
+        '</sheetData></worksheet>'
+    )
+    helper._update_sheet_xml(sheet_xml, [["Date"], [dt.datetime(2024, 1, 31)], [dt.datetime(2024, 2, 1)]], (1, 1))
+
+    cells = {cell.get("r"): cell for cell in sheet_xml.iter(f"{{{helper._NS['x']}}}c")}
+    for ref, serial in (("A2", "45322"), ("A3", "45323")):
+        assert (cells[ref].get("s"), cells[ref].get("t"), cells[ref].findtext("x:v", namespaces=helper._NS)) == ("3", None, serial)
@@ -0,0 +1,33 @@
+import pytest
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+def test_truncated_mashups_raise_at_every_offset():
+    data = benchmark._data_mashup(benchmark.mquery_sections(1, queries_per_section=1))
+    for cut in range(len(data)):
+        with pytest.raises(ValueError, match="DataMashup is truncated"):
+            helper.DataMashup(data[:cut])
+
+
+def test_truncation_names_the_section():
+    data = bytearray(benchmark._data_mashup(benchmark.mquery_sections(1)))
+    # Declare more package parts bytes than the stream holds
+    data[4:8] = (len(data)).to_bytes(4, "little")
+    with pytest.raises(ValueError, match="package parts declares"):
+        helper.DataMashup(bytes(data))
+
+
+def test_round_trip_keeps_the_other_sections_and_trailer():
+    data = benchmark._data_mashup(benchmark.mquery_sections(2)) + b"trailer"
+    assert helper.DataMashup(data).to_bytes() == data
+
+    mashup = helper.DataMashup(data)
+    mashup.formulas["Section2.m"] = mashup.formulas["Section2.m"].replace(benchmark.LINK_ROOT, "D:/Moved")
+    updated = helper.DataMashup(mashup.to_bytes())
+    assert mashup.changed_formulas() == ["Section2.m"]
+    assert "D:/Moved" in updated.formulas["Section2.m"]
+    assert updated.formulas["Section1.m"] == mashup.formulas["Section1.m"]
+    assert bytes(updated.metadata) == bytes(mashup.metadata)
+    assert updated.to_bytes().endswith(b"trailer")
@@ -0,0 +1,112 @@
+import io
+import json
+import logging
+
+import pandas as pd
+import pytest
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+def test_disabled_by_default(deck):
+    assert helper._SINK is None
+    assert helper._span("write") is helper._NULL_SPAN
+    # Counters outside a span, or without a sink, go nowhere
+    helper._count(parts_read=1)
+    assert helper.modify_ppt_links(deck, benchmark.LINK_ROOT, "D:/Reports", overwrite=True) == 4
+
+
+def test_spans_nest_and_roll_up_counters(deck):
+    with helper.instrument() as sink:
+        helper.modify_ppt_links(deck, benchmark.LINK_ROOT, "D:/Reports", overwrite=True)
+
+    *phases, outer = sink.records
+    assert [record["phase"] for record in phases] == ["read", "replace", "write"]
+    assert {record["parent"] for record in phases} == {"modify_ppt_links"}
+    assert outer["phase"] == "modify_ppt_links"
+    assert outer["parent"] is None
+    assert outer["path"] == deck
+    assert outer["replacements"] == sink.phases("replace")[0]["replacements"] == 4
+    assert outer["parts_deflated"] == sink.phases("write")[0]["parts_deflated"] == 2
+    assert outer["parts_read"] == sink.phases("read")[0]["parts_read"]
+
+
+def test_errors_are_recorded():
+    with helper.instrument() as sink:
+        with pytest.raises(KeyError):
+            with helper._span("outer", path="deck.pptx"):
+                with helper._span("inner") as span:
+                    span.add(parts_read=2)
+                    raise KeyError("ppt/slides/slide9.xml")
+
+    inner, outer = sink.records
+    assert inner["error"] == outer["error"] == "KeyError: 'ppt/slides/slide9.xml'"
+    assert inner["parent"] == "outer"
+    assert (outer["phase"], outer["parent"], outer["path"], outer["parts_read"]) == ("outer", None, "deck.pptx", 2)
+
+
+def test_instrument_restores_the_previous_sink():
+    outer = helper.MemorySink()
+    previous = helper.set_instrumentation_sink(outer)
+    try:
+        with helper.instrument() as inner:
+            with helper._span("inner"):
+                pass
+        with helper._span("outer"):
+            pass
+        assert helper._SINK is outer
+        assert [record["phase"] for record in inner.records] == ["inner"]
+        assert [record["phase"] for record in outer.records] == ["outer"]
+    finally:
+        helper.set_instrumentation_sink(previous)
+    assert helper._SINK is None
+
+
+def test_json_lines_sink(tmp_path):
+    path = str(tmp_path / "spans.jsonl")
+    sink = helper.JsonLinesSink(path)
+    with helper.instrument(sink):
+        with helper._span("write", path="deck.pptx") as span:
+            span.add(bytes_written=10)
+    sink.close()
+
+    # Open text files are written to as is
+    stream = io.StringIO()
+    with helper.instrument(helper.JsonLinesSink(stream)):
+        with helper._span("read"):
+            pass
+
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [(record["phase"], record["path"], record["bytes_written"]) for record in records] == [("write", "deck.pptx", 10)]
+    assert json.loads(stream.getvalue())["phase"] == "read"
+
+
+def test_logging_sink(caplog):
+    with caplog.at_level(logging.DEBUG, logger="spans"):
+        with helper.instrument(helper.LoggingSink(logging.getLogger("spans"), logging.DEBUG)):
+            with helper._span("write", path=None) as span:
+                span.add(parts_copied=3)
+
+    (record,) = caplog.records
+    assert record.levelno == logging.DEBUG
+    assert record.getMessage().startswith("phase=write seconds=")
+    assert record.getMessage().endswith(" parts_copied=3")
+    assert "parent" not in record.getMessage()
+
+
+def test_render_many_spans_nest_across_threads(deck, tmp_path):
+    template = helper.PPTTemplate(deck)
+    renders = [
+        {"output": str(tmp_path / f"{client}.pptx"), "tables": [{"table_df": pd.DataFrame([[client]]), "slide_id": 0, "shape_id": 0, "start_coord": (0, 0)}]}
+        for client in "ABC"
+    ]
+    with helper.instrument() as sink:
+        template.render_many(renders, max_workers=3)
+
+    (outer,) = sink.phases("render_many")
+    assert outer["files"] == 3 and outer["errors"] == 0
+    assert sorted(record["path"] for record in sink.phases("render")) == sorted(render["output"] for render in renders)
+    assert {record["parent"] for record in sink.phases("render")} == {"render_many"}
+    assert {record["parent"] for record in sink.phases("commit")} == {"render"}
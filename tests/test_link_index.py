@@ -0,0 +1,26 @@
+import os
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+def test_unreadable_files_are_reported_without_rolling_back_the_update(tmp_path):
+    deck = benchmark.make_deck(str(tmp_path / "deck.pptx"), slides=2)
+    lock_file = tmp_path / "~$deck.pptx"
+    lock_file.write_bytes(b"\x00" * 165)
+    manifest = tmp_path / "decks.txt"
+    manifest.write_text("\n".join([deck, str(lock_file), str(tmp_path / "deleted.pptx")]))
+
+    with helper.LinkIndex(str(tmp_path / "links.db")) as index:
+        result = index.update(str(manifest))
+        assert (result.scanned, result.unchanged, result.removed) == (1, 0, 0)
+        assert sorted(result.failed) == sorted([str(lock_file), str(tmp_path / "deleted.pptx")])
+        assert result.failed[str(lock_file)].startswith("BadZipFile")
+        assert index.files_depending_on(f"{benchmark.LINK_ROOT}/Book1-0.xlsx") == [os.path.abspath(deck)]
+
+        # Previously indexed files that become unreadable keep their entries
+        with open(deck, "r+b") as f:
+            f.truncate(100)
+        result = index.update(str(manifest))
+        assert str(deck) in result.failed
+        assert index.files_depending_on(f"{benchmark.LINK_ROOT}/Book1-0.xlsx") == [os.path.abspath(deck)]
@@ -0,0 +1,59 @@
+import pytest
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+def rels(*targets):
+    return "".join(f'<Relationship Target="{target}" TargetMode="External"/>' for target in targets).encode("utf-8")
+
+
+def test_longest_key_wins():
+    remapper = helper._LinkRemapper({"C:/Share": "D:/Root", "C:/Share/Sub": "E:/Sub", "C:/Shared": "F:/Other"})
+    contents, count = remapper(rels(
+        "file:///C:\\Share\\Sub\\a.xlsx", "file:///C:\\Share\\b.xlsx", "file:///C:\\Shared\\c.xlsx"
+    ))
+
+    assert count == 3
+    assert contents == rels("file:///E:\\Sub\\a.xlsx", "file:///D:\\Root\\b.xlsx", "file:///F:\\Other\\c.xlsx")
+    assert remapper.hits == {"C:/Share": 1, "C:/Share/Sub": 1, "C:/Shared": 1}
+
+
+def test_keys_are_matched_as_written_in_the_links():
+    remapper = helper._LinkRemapper({"C:/My Share": "D:/New Share"})
+    # Spaces and separators are normalized like PowerPoint writes them, case is not
+    assert remapper(rels("file:///C:\\My%20Share\\a.xlsx")) == (rels("file:///D:\\New%20Share\\a.xlsx"), 1)
+    assert remapper(rels("file:///c:\\my%20share\\a.xlsx"))[1] == 0
+    assert remapper.hits == {"C:/My Share": 1}
+
+
+def test_keys_normalizing_to_the_same_link():
+    # Same replacement, the first spelling collects the hits
+    remapper = helper._LinkRemapper({"C:/My Share": "D:/New", "C:\\My Share": "D:/New"})
+    assert remapper(rels("file:///C:\\My%20Share\\a.xlsx"))[1] == 1
+    assert remapper.hits == {"C:/My Share": 1, "C:\\My Share": 0}
+
+    with pytest.raises(ValueError, match="conflicting replacements"):
+        helper._LinkRemapper({"C:/My Share": "D:/New", "C:\\My Share": "E:/Other"})
+
+
+def test_empty_mapping_is_a_no_op():
+    contents = rels("file:///C:\\Share\\a.xlsx")
+    assert helper._LinkRemapper({})(contents) == (contents, 0)
+
+
+def test_mapping_through_modify_ppt_links(deck, tmp_path):
+    mapping_path = tmp_path / "mapping.csv"
+    mapping_path.write_text(
+        "old,new\n# moved drives\n"
+        f"{benchmark.LINK_ROOT},D:/Reports\n{benchmark.LINK_ROOT}/Book1-0.xlsx,E:/Pinned/Book.xlsx\nC:/Unused,D:/Unused\n",
+        encoding="utf-8"
+    )
+    mapping = helper.read_link_mapping(str(mapping_path))
+    assert list(mapping) == [benchmark.LINK_ROOT, f"{benchmark.LINK_ROOT}/Book1-0.xlsx", "C:/Unused"]
+
+    hits = helper.modify_ppt_links(deck, mapping, overwrite=True)
+    assert hits == {benchmark.LINK_ROOT: 3, f"{benchmark.LINK_ROOT}/Book1-0.xlsx": 1, "C:/Unused": 0}
+    with helper.PackageReader(deck) as package:
+        targets = {rel.target for rel in package.relationships("ppt/slides/slide1.xml") if rel.external}
+    assert targets == {"file:///E:\\Pinned\\Book.xlsx!Sheet1!R1C1:R10C5", "file:///D:\\Reports\\Book1-1.xlsx!Sheet1!R1C1:R10C5"}
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+import PPTAutomationHelper as helper
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+class Factory:
+    """
+    Records the backends handed out to the pool
+    """
+
+    def __init__(self):
+        self.backends = []
+
+    def __call__(self):
+        self.backends.append(helper.FakeOfficeBackend())
+        return self.backends[-1]
+
+
+def test_instances_are_recycled_after_max_jobs():
+    factory = Factory()
+    with helper.OfficeWorkerPool(factory, size=1, max_jobs_per_instance=2) as pool:
+        instance_ids = [pool.run(lambda app: app.work()) for _ in range(5)]
+
+    assert instance_ids[0] == instance_ids[1] != instance_ids[2] == instance_ids[3] != instance_ids[4]
+    assert [backend.jobs_run for backend in factory.backends[:3]] == [2, 2, 1]
+    assert not any(backend.running for backend in factory.backends)
+
+
+def test_instances_are_recycled_after_an_error():
+    factory = Factory()
+
+    def fail(app):
+        app.work()
+        raise ValueError("bad workbook")
+
+    with helper.OfficeWorkerPool(factory, size=1) as pool:
+        first = pool.run(lambda app: app.work())
+        with pytest.raises(ValueError, match="bad workbook"):
+            pool.run(fail)
+        assert not factory.backends[0].running
+        assert pool.run(lambda app: app.work()) != first
+
+
+def test_replacement_instances_are_started_before_the_next_job():
+    factory = Factory()
+    with helper.OfficeWorkerPool(factory, size=1, max_jobs_per_instance=1) as pool:
+        wait_until(lambda: len(factory.backends) == 1 and factory.backends[0].running)
+        pool.run(lambda app: app.work())
+        wait_until(lambda: len(factory.backends) == 2 and factory.backends[1].running)
+        assert not factory.backends[0].running
+
+
+def test_timed_out_jobs_kill_the_instance_and_replace_the_worker():
+    factory = Factory()
+    with helper.OfficeWorkerPool(factory, size=1, job_timeout=0.2) as pool:
+        future = pool.submit(lambda app: app.work(30))
+        with pytest.raises(TimeoutError):
+            future.result(timeout=5)
+        assert factory.backends[0]._killed.is_set()
+
+        assert pool.run(lambda app: app.work()) == factory.backends[1].instance_id
+        wait_until(lambda: len(pool._workers) == 1)
+
+
+def test_close_does_not_wait_on_abandoned_workers():
+    factory = Factory()
+    release = threading.Event()
+    pool = helper.OfficeWorkerPool(factory, size=1, job_timeout=0.1)
+    try:
+        # A job stuck outside of the instance, killing it doesn't unblock the worker
+        future = pool.submit(lambda app: release.wait(30))
+        with pytest.raises(TimeoutError):
+            future.result(timeout=5)
+        assert pool.run(lambda app: app.work()) == factory.backends[1].instance_id
+
+        start = time.monotonic()
+        pool.close()
+        assert time.monotonic() - start < 2
+        assert not factory.backends[1].running
+        with pytest.raises(RuntimeError):
+            pool.submit(lambda app: app.work())
+    finally:
+        release.set()
+
+
+def test_start_failures_fail_the_job_and_are_retried():
+    attempts = []
+
+    def factory():
+        attempts.append(None)
+        if len(attempts) <= 2:
+            raise OSError("Office is not installed")
+        return helper.FakeOfficeBackend()
+
+    with helper.OfficeWorkerPool(factory, size=1) as pool:
+        wait_until(lambda: len(attempts) >= 1)
+        with pytest.raises(OSError, match="not installed"):
+            pool.run(lambda app: app.work())
+        assert pool.run(lambda app: app.work()) > 0
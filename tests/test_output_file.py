@@ -0,0 +1,43 @@
+import os
+import stat
+
+import pytest
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_in_place_rewrites_keep_the_file_mode(tmp_path):
+    deck = benchmark.make_deck(str(tmp_path / "deck.pptx"), slides=2)
+    os.chmod(deck, 0o664)
+
+    assert helper.modify_ppt_links(deck, benchmark.LINK_ROOT, "D:/Moved Drive/Reports", overwrite=True) > 0
+    assert stat.S_IMODE(os.stat(deck).st_mode) == 0o664
+    helper.toggle_update_links_popup(deck, auto_update=True, overwrite=True)
+    with helper.PPTSession(deck, overwrite=True) as session:
+        session.update_ppt_plot_cache()
+    assert stat.S_IMODE(os.stat(deck).st_mode) == 0o664
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_new_outputs_get_the_default_mode(tmp_path):
+    deck = benchmark.make_deck(str(tmp_path / "deck.pptx"), slides=1)
+    umask = os.umask(0o022)
+    try:
+        helper.modify_ppt_links(deck, benchmark.LINK_ROOT, "D:/Moved", output=str(tmp_path / "out.pptx"))
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(tmp_path / "out.pptx").st_mode) == 0o644
+    assert sorted(os.listdir(tmp_path)) == ["deck.pptx", "out.pptx"]
+
+
+def test_failed_writes_leave_the_file_and_no_temp_file(tmp_path):
+    path = tmp_path / "deck.pptx"
+    path.write_bytes(b"original")
+    with pytest.raises(RuntimeError):
+        with helper._output_file(str(path)) as f:
+            f.write(b"partial")
+            raise RuntimeError
+    assert path.read_bytes() == b"original"
+    assert os.listdir(tmp_path) == ["deck.pptx"]
@@ -0,0 +1,125 @@
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+class Unseekable(io.RawIOBase):
+    """
+    Read-only stream that can't seek, like a pipe or an HTTP response
+    """
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self._stream.readinto(b)
+
+
+def ole_target(name):
+    return helper._normalize_link(f"{benchmark.LINK_ROOT}/{name}") + "!Sheet1!R1C1:R10C5"
+
+
+def test_parts_are_indexed_by_kind(deck):
+    with helper.PackageReader(deck) as package:
+        assert package.part_names("slide") == ["ppt/slides/slide1.xml", "ppt/slides/slide2.xml"]
+        assert package.part_names("chart") == ["ppt/charts/chart1.xml", "ppt/charts/chart2.xml"]
+        assert package.part_names("embedding") == [
+            "ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx", "ppt/embeddings/Microsoft_Excel_Worksheet2.xlsx"
+        ]
+        assert package.part_names("media") == ["ppt/media/image1.png", "ppt/media/image2.png"]
+        assert package.part_names("other") == ["[Content_Types].xml", "ppt/presentation.xml"]
+        # Several kinds come back in archive order
+        assert package.part_names("chart_rels", "slide") == [
+            "ppt/charts/_rels/chart1.xml.rels", "ppt/slides/slide1.xml",
+            "ppt/charts/_rels/chart2.xml.rels", "ppt/slides/slide2.xml",
+        ]
+        assert package.part_names("custom_xml") == []
+
+
+def test_relationship_graph(deck):
+    with helper.PackageReader(deck) as package:
+        assert [rel.target for rel in package.relationships("")] == ["ppt/presentation.xml"]
+        assert package.charts_with_workbooks() == {
+            "ppt/charts/chart1.xml": "ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx",
+            "ppt/charts/chart2.xml": "ppt/embeddings/Microsoft_Excel_Worksheet2.xlsx",
+        }
+
+        rels = package.relationships("ppt/slides/slide1.xml")
+        assert [(rel.id, rel.target, rel.external) for rel in rels] == [
+            ("rId1", "ppt/charts/chart1.xml", False),
+            ("rId2", ole_target("Book1-0.xlsx"), True),
+            ("rId3", ole_target("Book1-1.xlsx"), True),
+            ("rId4", "ppt/media/image1.png", False),
+        ]
+        # External targets aren't parts
+        assert package.related("ppt/slides/slide1.xml", rels[1].type) == []
+        assert package.relationships("ppt/media/image1.png") == []
+
+
+def test_stored_embeddings_are_opened_in_place(deck, tmp_path):
+    # Rewritten embedded excels are stored uncompressed
+    output = str(tmp_path / "out.pptx")
+    helper.update_ppt_chart_data(deck, {1: pd.DataFrame({"Category": ["A", "B"], "Series 0": [1, 2]})}, output=output)
+
+    with helper.instrument() as sink, helper.PackageReader(output) as package:
+        stored, deflated = "ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx", "ppt/embeddings/Microsoft_Excel_Worksheet2.xlsx"
+        assert package.getinfo(stored).compress_type == zipfile.ZIP_STORED
+        assert package.getinfo(deflated).compress_type == zipfile.ZIP_DEFLATED
+
+        with helper._span("nested"), package.open_nested(stored) as embedded:
+            assert embedded._buffer.obj is package._mmap
+            assert embedded.part_names("chart") == ["xl/charts/chart1.xml"]
+            assert embedded.testzip() is None
+        with helper._span("nested"), package.open_nested(deflated) as embedded:
+            assert embedded._buffer.obj is not package._mmap
+            assert embedded.part_names("chart") == ["xl/charts/chart1.xml"]
+
+    stored_span, deflated_span = sink.phases("nested")
+    assert stored_span["parts_mapped"] == 1
+    assert stored_span["bytes_mapped"] == package.getinfo(stored).compress_size
+    assert "parts_mapped" not in deflated_span
+
+
+def test_sources(deck):
+    with open(deck, "rb") as f:
+        data = f.read()
+    with helper.PackageReader(deck) as package:
+        expected = {name: package.read(name) for name in package.namelist()}
+
+    for source in (data, bytearray(data), io.BytesIO(data), Unseekable(data)):
+        with helper.PackageReader(source) as package:
+            assert {name: package.read(name) for name in package.namelist()} == expected
+            assert package.charts_with_workbooks()["ppt/charts/chart1.xml"] == "ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx"
+            # Only buffers can hand out nested packages in place, the rest inflate
+            with package.open_nested("ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx") as embedded:
+                assert embedded.part_names("chart") == ["xl/charts/chart1.xml"]
+
+
+def test_clones_share_the_graph(deck):
+    with helper.PackageReader(deck) as package:
+        package.relationships("")
+        clone = package.clone()
+        assert clone._graph is package._graph
+        assert clone.fp is not package.fp
+        with clone:
+            assert clone.read("ppt/presentation.xml") == package.read("ppt/presentation.xml")
+        # Closing a clone leaves the buffer to its owner
+        assert not package._mmap.closed
+        assert package.read("ppt/presentation.xml")
+
+
+def test_close_unmaps_the_file(deck):
+    package = helper.PackageReader(deck)
+    package.read("ppt/presentation.xml")
+    package.close()
+    assert package._mmap.closed
+    with pytest.raises(ValueError):
+        package._buffer.tobytes()
@@ -0,0 +1,42 @@
+import os
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+def test_extract_sync_rezip_cycles_skip_unchanged_charts(tmp_path, monkeypatch):
+    deck = benchmark.make_deck(str(tmp_path / "deck.pptx"), slides=3, links_per_slide=0)
+    extract_path = str(tmp_path / "extract")
+
+    helper.extract_ppt(deck, extract_path)
+    assert helper.update_ppt_plot_cache(extract_path) == helper.PlotCacheResult(3, 0)
+    helper.rezip_ppt(extract_path, deck)
+
+    # Extracting again gives every file a new mtime, the contents are the same
+    helper.extract_ppt(deck, extract_path)
+    for dirpath, _, filenames in os.walk(extract_path):
+        for filename in filenames:
+            os.utime(os.path.join(dirpath, filename), ns=(0, 10 ** 18))
+    compared = []
+    replace_chart_caches = helper._replace_chart_caches
+    monkeypatch.setattr(helper, "_replace_chart_caches", lambda *args: compared.append(args) or replace_chart_caches(*args))
+    assert helper.update_ppt_plot_cache(extract_path) == helper.PlotCacheResult(0, 3)
+    assert compared == []
+
+    # A changed chart is synced again
+    chart_path = os.path.join(extract_path, "ppt", "charts", "chart2.xml")
+    with open(chart_path, "rb") as f:
+        contents = f.read()
+    with open(chart_path, "wb") as f:
+        f.write(contents.replace(b"<c:v>Cat 0</c:v>", b"<c:v>Stale</c:v>", 1))
+    assert helper.update_ppt_plot_cache(extract_path) == helper.PlotCacheResult(1, 2)
+    assert len(compared) == 1
+
+
+def test_package_mode_and_batch_return_plot_cache_results(tmp_path):
+    decks = [benchmark.make_deck(str(tmp_path / f"deck{idx}.pptx"), slides=2, links_per_slide=0) for idx in range(2)]
+
+    assert helper.update_ppt_plot_cache(decks[0], overwrite=True) == helper.PlotCacheResult(2, 0)
+    results = helper.run_batch(decks, "update_ppt_plot_cache", {"overwrite": True}, max_workers=1)
+    assert [result["error"] for result in results] == [None, None]
+    assert [result["result"] for result in results] == [helper.PlotCacheResult(0, 2), helper.PlotCacheResult(2, 0)]
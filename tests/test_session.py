@@ -0,0 +1,120 @@
+import io
+import os
+import zipfile
+
+import lxml.etree
+import pandas as pd
+import pytest
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def table_texts(path, slide_name="ppt/slides/slide1.xml"):
+    with zipfile.ZipFile(path) as zfr:
+        slide = lxml.etree.fromstring(zfr.read(slide_name))
+    return [
+        [cell.findtext(".//a:t", namespaces=helper._NS) for cell in row.iterfind("a:tc", helper._NS)]
+        for row in slide.iterfind(".//a:tbl/a:tr", helper._NS)
+    ]
+
+
+@pytest.fixture
+def saves(monkeypatch):
+    """
+    Records the packages written through `_save_package`
+    """
+    calls = []
+    save_package = helper._save_package
+
+    def record(zfr, ppt_path, output, updated_parts, overwrite):
+        calls.append(sorted(updated_parts))
+        return save_package(zfr, ppt_path, output, updated_parts, overwrite)
+
+    monkeypatch.setattr(helper, "_save_package", record)
+    return calls
+
+
+def test_queued_edits_are_committed_in_a_single_write(deck, saves):
+    with helper.PPTSession(deck, overwrite=True) as session:
+        session.modify_ppt_links(benchmark.LINK_ROOT, "D:/Reports")
+        session.update_ppt_table(pd.DataFrame([["a", "b"], ["c", "d"]]), slide_id=0, shape_id=0, start_coord=(1, 1))
+        session.update_ppt_plot_cache()
+        # Nothing is written until the block exits
+        assert saves == []
+
+    assert saves == [[
+        "ppt/charts/chart1.xml", "ppt/charts/chart2.xml",
+        "ppt/slides/_rels/slide1.xml.rels", "ppt/slides/_rels/slide2.xml.rels", "ppt/slides/slide1.xml",
+    ]]
+    assert table_texts(deck)[1][1:3] == ["0", "1"]
+    assert table_texts(deck)[3][1:3] == ["c", "d"]
+    assert not os.path.exists(os.path.join(os.path.dirname(deck), ".backups"))
+
+
+def test_commit_returns_counts_in_queue_order(deck, saves):
+    session = helper.PPTSession(deck, overwrite=True)
+    session.update_ppt_plot_cache()
+    session.modify_ppt_links({benchmark.LINK_ROOT: "D:/Reports", "C:/Unused": "D:/Unused"})
+    session.modify_ppt_links("D:\\Reports", "E:\\Reports")
+    assert session.commit() == [2, {benchmark.LINK_ROOT: 4, "C:/Unused": 0}, 4]
+    assert len(saves) == 1
+
+    # Later edits on the same session see the committed deck
+    session.modify_ppt_links("E:\\Reports", "F:\\Reports")
+    assert session.commit() == [4]
+    assert b"F:\\Reports" in zipfile.ZipFile(deck).read("ppt/slides/_rels/slide1.xml.rels")
+
+
+def test_nothing_is_written_when_the_block_raises(deck, saves):
+    original = read_file(deck)
+    with pytest.raises(RuntimeError):
+        with helper.PPTSession(deck) as session:
+            session.modify_ppt_links(benchmark.LINK_ROOT, "D:/Reports")
+            session.update_ppt_plot_cache()
+            raise RuntimeError("stop")
+
+    assert saves == []
+    assert read_file(deck) == original
+    assert not os.path.exists(os.path.join(os.path.dirname(deck), ".backups"))
+
+
+def test_edits_without_changes_write_nothing(deck, saves):
+    original = read_file(deck)
+    with helper.PPTSession(deck) as session:
+        session.modify_ppt_links("C:/Nowhere", "D:/Elsewhere")
+
+    assert saves == []
+    assert read_file(deck) == original
+
+
+def test_failing_edit_leaves_the_deck_as_is(deck):
+    original = read_file(deck)
+    with pytest.raises(ValueError, match="invalid target cells"):
+        with helper.PPTSession(deck) as session:
+            session.modify_ppt_links(benchmark.LINK_ROOT, "D:/Reports")
+            session.update_ppt_table(pd.DataFrame([["a", "b"]]), slide_id=0, shape_id=0, start_coord=(10, 10))
+
+    assert read_file(deck) == original
+
+
+def test_output_leaves_the_input_untouched(deck, tmp_path):
+    original = read_file(deck)
+    output = str(tmp_path / "out.pptx")
+    with helper.PPTSession(deck, output=output) as session:
+        session.modify_ppt_links(benchmark.LINK_ROOT, "D:/Reports")
+
+    assert read_file(deck) == original
+    assert b"D:\\Reports" in zipfile.ZipFile(output).read("ppt/slides/_rels/slide1.xml.rels")
+    assert not os.path.exists(os.path.join(os.path.dirname(deck), ".backups"))
+
+    # Bytes in, file object out, written even without changes
+    buffer = io.BytesIO()
+    with helper.PPTSession(original, output=buffer):
+        pass
+    assert zipfile.ZipFile(buffer).namelist() == zipfile.ZipFile(deck).namelist()
@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+def test_invalid_cells_are_all_reported_before_writing(tmp_path):
+    deck = benchmark.make_deck(str(tmp_path / "deck.pptx"), slides=2, table_shape=(4, 3))
+    with open(deck, "rb") as f:
+        original = f.read()
+
+    table_df = pd.DataFrame([["a", "b"], ["c", "d"]])
+    with pytest.raises(ValueError) as excinfo:
+        helper.update_ppt_tables(deck, [
+            {"table_df": table_df, "slide_id": 0, "shape_id": 0, "start_coord": (0, 0)},
+            {"table_df": table_df, "slide_id": 1, "shape_id": 0, "start_coord": (2, 2)},
+        ])
+
+    header, *lines = str(excinfo.value).splitlines()
+    assert header.startswith("invalid target cells")
+    assert lines == ["slide 1, shape 0 (outside of the table): [(2, 3), (3, 3), (4, 2), (4, 3)]"]
+    with open(deck, "rb") as f:
+        assert f.read() == original
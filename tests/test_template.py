@@ -0,0 +1,70 @@
+import io
+import os
+import zipfile
+
+import lxml.etree
+import pandas as pd
+
+import PPTAutomationHelper as helper
+
+
+def table_texts(package, slide_name="ppt/slides/slide1.xml"):
+    with zipfile.ZipFile(package) as zfr:
+        slide = lxml.etree.fromstring(zfr.read(slide_name))
+    return [
+        [cell.findtext(".//a:t", namespaces=helper._NS) for cell in row.iterfind("a:tc", helper._NS)]
+        for row in slide.iterfind(".//a:tbl/a:tr", helper._NS)
+    ]
+
+
+def read_parts(package):
+    with zipfile.ZipFile(package) as zfr:
+        return {name: zfr.read(name) for name in zfr.namelist()}
+
+
+def table(client):
+    return {"table_df": pd.DataFrame([[client, f"{client} total"]]), "slide_id": 0, "shape_id": 0, "start_coord": (1, 0)}
+
+
+def test_renders_dont_modify_the_template(deck, tmp_path):
+    template = helper.PPTTemplate(deck)
+    data = template._data
+    parts = read_parts(deck)
+
+    a, b = str(tmp_path / "a.pptx"), str(tmp_path / "b.pptx")
+    assert template.render(a, tables=[table("A")], chart_data={1: pd.DataFrame({"Category": ["X"], "Series 0": [1]})}) == (4, 0, 1)
+    cached = {name: lxml.etree.tostring(tree) for name, tree in template._trees.items()}
+    assert "ppt/slides/slide1.xml" in cached and "ppt/charts/chart1.xml" in cached
+    assert template.render(b, tables=[table("B")]) == (4, 0, 0)
+
+    assert template._data is data
+    assert {name: lxml.etree.tostring(tree) for name, tree in template._trees.items()} == cached
+    assert all(template._parts[name] == parts[name] for name in template._parts)
+    assert table_texts(a)[2][:2] == ["A", "A total"]
+    assert table_texts(b)[2][:2] == ["B", "B total"]
+    assert read_parts(b)["ppt/charts/chart1.xml"] == parts["ppt/charts/chart1.xml"]
+
+    # Nothing to render gives the template back
+    buffer = io.BytesIO()
+    assert template.render(buffer) == (0, 0, 0)
+    assert read_parts(buffer) == parts
+
+
+def test_render_many_isolates_failures(deck, tmp_path):
+    template = helper.PPTTemplate(deck)
+    clients = ["A", "B", "C", "D"]
+    renders = [{"output": str(tmp_path / f"{client}.pptx"), "tables": [table(client)]} for client in clients]
+    renders[1]["textboxes"] = [(999, 0, 0, 0, "missing slide")]
+
+    results = template.render_many(renders, max_workers=2)
+    assert [result["output"] for result in results] == [render["output"] for render in renders]
+    assert [result["error"] is None for result in results] == [True, False, True, True]
+    assert results[1]["error"].startswith("IndexError")
+    assert results[1]["result"] is None
+    assert not os.path.exists(renders[1]["output"])
+
+    for client, render, result in zip(clients, renders, results):
+        if result["error"] is None:
+            assert result["result"] == helper.RenderResult(4, 0, 0)
+            assert table_texts(render["output"])[2][:2] == [client, f"{client} total"]
+    assert read_parts(io.BytesIO(template._data)) == read_parts(deck)
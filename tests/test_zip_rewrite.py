@@ -0,0 +1,67 @@
+import struct
+import zipfile
+
+import PPTAutomationBenchmark as benchmark
+import PPTAutomationHelper as helper
+
+
+def raw_members(path):
+    """
+    Compressed stream and header fields of every member, as stored in the archive
+    """
+    with zipfile.ZipFile(path) as zfr:
+        return {
+            zinfo.filename: (
+                b"".join(helper._raw_member_chunks(zfr, zinfo)),
+                zinfo.date_time, zinfo.compress_type, zinfo.CRC, zinfo.file_size, zinfo.external_attr,
+            )
+            for zinfo in zfr.infolist()
+        }
+
+
+def test_untouched_members_are_copied_byte_for_byte(deck, tmp_path):
+    before = raw_members(deck)
+    output = str(tmp_path / "out.pptx")
+    assert helper.modify_ppt_links(deck, benchmark.LINK_ROOT, "D:/Moved Drive/Reports", output=output) == 4
+
+    after = raw_members(output)
+    assert list(after) == list(before)
+    changed = {name for name in before if after[name] != before[name]}
+    assert changed == {"ppt/slides/_rels/slide1.xml.rels", "ppt/slides/_rels/slide2.xml.rels"}
+    with zipfile.ZipFile(output) as zfr:
+        assert zfr.testzip() is None
+        assert b"D:\\Moved%20Drive\\Reports" in zfr.read("ppt/slides/_rels/slide1.xml.rels")
+
+
+def test_archives_without_changes_are_left_untouched(deck):
+    with open(deck, "rb") as f:
+        original = f.read()
+    assert helper.modify_ppt_links(deck, "C:/Nowhere", "D:/Elsewhere", overwrite=True) == 0
+    with open(deck, "rb") as f:
+        assert f.read() == original
+
+
+def test_copy_zipinfo_drops_zip64_extras_and_data_descriptors():
+    zinfo = zipfile.ZipInfo("ppt/media/image1.png", (2024, 1, 31, 12, 0, 0))
+    zinfo.flag_bits = 0x08 | 0x800
+    zinfo.extra = struct.pack("<HHQ", 0x0001, 8, 1 << 33) + struct.pack("<HH", 0xCAFE, 2) + b"ok"
+    zinfo.CRC, zinfo.compress_size, zinfo.file_size = 1234, 10, 20
+
+    clone = helper._copy_zipinfo(zinfo)
+    assert clone.extra == struct.pack("<HH", 0xCAFE, 2) + b"ok"
+    assert clone.flag_bits == 0x800
+    assert (clone.filename, clone.date_time, clone.CRC, clone.compress_size, clone.file_size) == (
+        zinfo.filename, zinfo.date_time, 1234, 10, 20
+    )
+
+
+def test_raw_members_round_trip_through_a_new_archive(deck, tmp_path):
+    output = str(tmp_path / "copy.pptx")
+    with zipfile.ZipFile(deck) as zfr, zipfile.ZipFile(output, "w") as zfw:
+        for zinfo in zfr.infolist():
+            helper._write_raw_member(zfw, helper._copy_zipinfo(zinfo), helper._raw_member_chunks(zfr, zinfo))
+
+    assert raw_members(output) == raw_members(deck)
+    with zipfile.ZipFile(deck) as original, zipfile.ZipFile(output) as copy:
+        assert copy.testzip() is None
+        assert all(copy.read(name) == original.read(name) for name in original.namelist())